@@ -0,0 +1,380 @@
+"""
+Banco de pruebas de rendimiento de Acreditate.
+
+Mide la construcción y validación de PersonaAcreditada, evaluar() en días
+laborables, fines de semana, fuera de horario y feriados, Evaluador.comprobar(),
+evaluar() y comprobar() repartidos entre varios hilos, la generación de
+feriados de HolidayEcuador por año, la carga de una instantánea de feriados
+de once años, la búsqueda del siguiente turno y la consulta de feriados en
+línea contra un servidor local.
+Los casos evaluar* y comprobar* vacían la caché de decisiones en cada
+llamada para medir las reglas; los *_memo miden la respuesta desde la caché.
+Cada caso se repite varias veces y se reporta el mínimo y la mediana en
+nanosegundos por operación, que son comparables entre ejecuciones. En los
+casos *_hilos cada operación es una evaluación y el tiempo es el total de los
+HILOS hilos, así que su inverso es el rendimiento conjunto.
+
+El caso arranque importa src.Acreditate en un proceso nuevo y falla si supera
+el presupuesto de tiempo (--presupuesto-arranque) o si carga alguno de los
+MODULOS_DIFERIDOS.
+
+    python bench.py                         # imprime los resultados
+    python bench.py --json actual.json      # guarda los resultados
+    python bench.py --base base.json        # falla si algún caso empeora más del umbral
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.Acreditate import Evaluador, HolidayEcuador, PersonaAcreditada
+from src.api_feriados import ClienteFeriados, LimitadorTokens
+from src.decisiones import memo_decisiones
+from src.instantanea import Instantanea, exportar_reglas
+from src.turnos import siguiente_turno
+
+CEDULA = '1713375143'  # último dígito 3, restringido los martes
+
+# Presupuesto en milisegundos para importar src.Acreditate en un proceso nuevo
+PRESUPUESTO_ARRANQUE_MS = 50
+
+# Módulos que no deben cargarse al importar src.Acreditate
+MODULOS_DIFERIDOS = ('requests', 'numpy', 'holidays', 'dateutil', 'asyncio')
+
+# Hilos de los casos *_hilos y evaluaciones que reparten en cada llamada
+HILOS = 4
+LOTE_HILOS = 20000
+
+_CODIGO_ARRANQUE = '''
+import json, sys, time
+inicio = time.perf_counter_ns()
+import src.Acreditate
+fin = time.perf_counter_ns()
+print(json.dumps({'ns': fin - inicio, 'modulos': [m for m in %r if m in sys.modules]}))
+''' % (MODULOS_DIFERIDOS,)
+
+
+class _ServidorFeriados:
+    """Servidor HTTP local que responde como la API de feriados sin feriados"""
+
+    def __init__(self):
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', '2')
+                self.end_headers()
+                self.wfile.write(b'[]')
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.url = 'http://127.0.0.1:{}/v1/'.format(self.httpd.server_address[1])
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def cerrar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _evaluar(fecha, hora, memo=False):
+    """Caso de evaluar(); sin memo la caché de decisiones se vacía antes de cada llamada"""
+    if memo:
+        def caso():
+            PersonaAcreditada(CEDULA, fecha, hora).evaluar()
+    else:
+        def caso():
+            memo_decisiones.invalidar()
+            PersonaAcreditada(CEDULA, fecha, hora).evaluar()
+    return caso
+
+
+def _comprobar(memo=False):
+    evaluador = Evaluador()
+    if memo:
+        def caso():
+            evaluador.comprobar(CEDULA, '2021/04/27', '14:00')
+    else:
+        def caso():
+            memo_decisiones.invalidar()
+            evaluador.comprobar(CEDULA, '2021/04/27', '14:00')
+    return caso, None
+
+
+def _en_hilos(evaluar):
+    """Caso que reparte LOTE_HILOS llamadas a evaluar entre HILOS hilos"""
+    fechas = ['2021/04/{:02d}'.format(dia) for dia in range(19, 31)]
+    horas = ['07:45', '10:00', '12:30', '14:00', '16:15', '18:00']
+    filas = [(fecha, hora) for fecha in fechas for hora in horas]
+    por_hilo = LOTE_HILOS // HILOS
+
+    def trabajo():
+        for i in range(por_hilo):
+            fecha, hora = filas[i % len(filas)]
+            evaluar(fecha, hora)
+
+    def caso():
+        hilos = [threading.Thread(target=trabajo) for _ in range(HILOS)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+    return caso, None
+
+
+def _evaluar_hilos(memo=False):
+    if memo:
+        return _en_hilos(lambda fecha, hora: PersonaAcreditada(CEDULA, fecha, hora).evaluar())
+
+    def evaluar(fecha, hora):
+        memo_decisiones.invalidar()
+        PersonaAcreditada(CEDULA, fecha, hora).evaluar()
+    return _en_hilos(evaluar)
+
+
+def _comprobar_hilos(memo=False):
+    evaluador = Evaluador()
+    if memo:
+        return _en_hilos(lambda fecha, hora: evaluador.comprobar(CEDULA, fecha, hora))
+
+    def comprobar(fecha, hora):
+        memo_decisiones.invalidar()
+        evaluador.comprobar(CEDULA, fecha, hora)
+    return _en_hilos(comprobar)
+
+
+def _construir():
+    PersonaAcreditada(CEDULA, '2021/04/27', '14:00')
+
+
+def _poblar():
+    HolidayEcuador(prov='EC-P', years=2021)
+
+
+def _cargar_instantanea():
+    datos = exportar_reglas(2020, 2030).a_bytes()
+
+    def caso():
+        Instantanea.desde_bytes(datos)
+    return caso, None
+
+
+def _siguiente_turno():
+    desde = datetime.datetime(2021, 4, 27, 9, 0)  # dentro de la restricción: la ventana empieza a las 12:00
+
+    def caso():
+        siguiente_turno(CEDULA, desde)
+    return caso, None
+
+
+def _feriado_online():
+    servidor = _ServidorFeriados()
+    cliente = ClienteFeriados('clave', servidor.url, limitador=LimitadorTokens(tasa=1e9, capacidad=10 ** 9,
+                                                                             max_mensual=None))
+    cliente.cache.ttl = -1  # cada consulta llega al servidor
+    dia = datetime.date(2021, 4, 27)
+
+    def caso():
+        cliente.es_feriado(dia)
+
+    def cerrar():
+        cliente.cerrar()
+        servidor.cerrar()
+    return caso, cerrar
+
+
+def medir_arranque(repeticiones):
+    """
+    Importa src.Acreditate en procesos nuevos
+
+     RETORNA
+     -------
+         Tupla (nanosegundos de cada importación, módulos diferidos que se cargaron)
+    """
+    tiempos, modulos = [], set()
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, '-c', _CODIGO_ARRANQUE], capture_output=True, text=True,
+                                check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+        medida = json.loads(salida)
+        tiempos.append(medida['ns'])
+        modulos.update(medida['modulos'])
+    return tiempos, sorted(modulos)
+
+
+# nombre: (fábrica que devuelve (función, cierre), iteraciones por repetición);
+# arranque se mide con medir_arranque
+CASOS = {
+    'arranque': (None, 1),
+    'construccion': (lambda: (_construir, None), 20000),
+    'evaluar_laborable': (lambda: (_evaluar('2021/04/27', '14:00'), None), 20000),
+    'evaluar_fin_de_semana': (lambda: (_evaluar('2021/04/25', '14:00'), None), 20000),
+    'evaluar_fuera_de_horario': (lambda: (_evaluar('2021/04/27', '20:00'), None), 20000),
+    'evaluar_feriado': (lambda: (_evaluar('2021/12/25', '14:00'), None), 20000),
+    'evaluar_laborable_memo': (lambda: (_evaluar('2021/04/27', '14:00', True), None), 20000),
+    'evaluar_fin_de_semana_memo': (lambda: (_evaluar('2021/04/25', '14:00', True), None), 20000),
+    'evaluar_fuera_de_horario_memo': (lambda: (_evaluar('2021/04/27', '20:00', True), None), 20000),
+    'evaluar_feriado_memo': (lambda: (_evaluar('2021/12/25', '14:00', True), None), 20000),
+    'comprobar': (_comprobar, 20000),
+    'comprobar_memo': (lambda: _comprobar(True), 20000),
+    'evaluar_hilos': (_evaluar_hilos, 5),
+    'evaluar_hilos_memo': (lambda: _evaluar_hilos(True), 5),
+    'comprobar_hilos': (_comprobar_hilos, 5),
+    'comprobar_hilos_memo': (lambda: _comprobar_hilos(True), 5),
+    'poblar_anio': (lambda: (_poblar, None), 500),
+    'cargar_instantanea': (_cargar_instantanea, 20000),
+    'siguiente_turno': (_siguiente_turno, 20000),
+    'feriado_online': (_feriado_online, 300),
+}
+
+# Operaciones que realiza cada llamada de los casos que no miden una sola operación
+OPERACIONES = {'evaluar_hilos': LOTE_HILOS, 'evaluar_hilos_memo': LOTE_HILOS, 'comprobar_hilos': LOTE_HILOS,
+               'comprobar_hilos_memo': LOTE_HILOS}
+
+
+def medir(funcion, iteraciones, repeticiones):
+    """
+    Mide una función
+
+     RETORNA
+     -------
+         Lista con los nanosegundos por operación de cada repetición
+    """
+    for _ in range(min(iteraciones, 100)):  # calentamiento
+        funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter_ns()
+        for _ in range(iteraciones):
+            funcion()
+        tiempos.append((time.perf_counter_ns() - inicio) / iteraciones)
+    return tiempos
+
+
+def ejecutar(nombres=None, repeticiones=5, escala=1.0):
+    """
+    Ejecuta los casos del banco de pruebas
+
+     Parámetros
+     ----------
+         nombres: list de str, opcional
+             Casos a ejecutar, por defecto todos
+         repeticiones: int, opcional
+             Repeticiones de cada caso
+         escala: float, opcional
+             Factor que multiplica las iteraciones de cada caso
+
+     RETORNA
+     -------
+         Diccionario {caso: {'min_ns', 'mediana_ns', 'iteraciones', 'repeticiones'}};
+         arranque incluye además 'modulos', los módulos diferidos que se cargaron
+    """
+    resultados = {}
+    for nombre in nombres or CASOS:
+        fabrica, iteraciones = CASOS[nombre]
+        if fabrica is None:
+            tiempos, modulos = medir_arranque(repeticiones)
+            resultados[nombre] = {'min_ns': min(tiempos), 'mediana_ns': statistics.median(tiempos),
+                                  'iteraciones': iteraciones, 'repeticiones': repeticiones, 'modulos': modulos}
+            continue
+        iteraciones = max(1, int(iteraciones * escala))
+        funcion, cerrar = fabrica()
+        try:
+            tiempos = medir(funcion, iteraciones, repeticiones)
+        finally:
+            if cerrar is not None:
+                cerrar()
+        operaciones = OPERACIONES.get(nombre, 1)
+        tiempos = [tiempo / operaciones for tiempo in tiempos]
+        resultados[nombre] = {'min_ns': min(tiempos), 'mediana_ns': statistics.median(tiempos),
+                              'iteraciones': iteraciones * operaciones, 'repeticiones': repeticiones}
+    return resultados
+
+
+def comparar(actual, base, umbral):
+    """
+    Compara los resultados con una ejecución base usando el mínimo de cada caso
+
+     RETORNA
+     -------
+         Lista de (caso, proporción actual/base) de los casos que empeoraron más del umbral
+    """
+    regresiones = []
+    for nombre, medida in actual.items():
+        if nombre in base:
+            proporcion = medida['min_ns'] / base[nombre]['min_ns']
+            if proporcion > 1 + umbral:
+                regresiones.append((nombre, proporcion))
+    return regresiones
+
+
+def presupuesto_arranque(resultados, presupuesto_ms):
+    """
+    Comprueba el caso arranque contra su presupuesto
+
+     RETORNA
+     -------
+         Lista de mensajes con los incumplimientos, vacía si no hay
+    """
+    medida = resultados.get('arranque')
+    if medida is None:
+        return []
+    fallas = []
+    if medida['min_ns'] > presupuesto_ms * 1e6:
+        fallas.append('importar src.Acreditate tomó {:.1f} ms, el presupuesto es {} ms'.format(
+            medida['min_ns'] / 1e6, presupuesto_ms))
+    if medida['modulos']:
+        fallas.append('importar src.Acreditate cargó ' + ', '.join(medida['modulos']))
+    return fallas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Banco de pruebas de rendimiento de Acreditate')
+    parser.add_argument('casos', nargs='*', help='casos a ejecutar, por defecto todos: ' + ', '.join(CASOS))
+    parser.add_argument('--repeticiones', type=int, default=5)
+    parser.add_argument('--escala', type=float, default=1.0, help='factor de iteraciones por caso')
+    parser.add_argument('--json', help='archivo donde guardar los resultados')
+    parser.add_argument('--base', help='resultados JSON de referencia')
+    parser.add_argument('--umbral', type=float, default=0.2,
+                        help='empeoramiento máximo permitido respecto de la base (0.2 = 20%%)')
+    parser.add_argument('--presupuesto-arranque', type=float, default=PRESUPUESTO_ARRANQUE_MS,
+                        help='milisegundos máximos para importar src.Acreditate')
+    args = parser.parse_args(argv)
+    desconocidos = set(args.casos) - set(CASOS)
+    if desconocidos:
+        parser.error('casos desconocidos: ' + ', '.join(sorted(desconocidos)))
+
+    resultados = ejecutar(args.casos, args.repeticiones, args.escala)
+    for nombre, medida in resultados.items():
+        print('{:<28} {:>12.0f} ns/op (mediana {:.0f})'.format(nombre, medida['min_ns'], medida['mediana_ns']))
+
+    if args.json:
+        with open(args.json, 'w') as archivo:
+            json.dump({'python': platform.python_version(), 'plataforma': platform.platform(),
+                       'resultados': resultados}, archivo, indent=2)
+    fallas = presupuesto_arranque(resultados, args.presupuesto_arranque)
+    for falla in fallas:
+        print('PRESUPUESTO: ' + falla, file=sys.stderr)
+    if args.base:
+        with open(args.base) as archivo:
+            base = json.load(archivo)['resultados']
+        regresiones = comparar(resultados, base, args.umbral)
+        for nombre, proporcion in regresiones:
+            print('REGRESIÓN {}: {:.2f} veces la base'.format(nombre, proporcion), file=sys.stderr)
+        if regresiones:
+            return 1
+    return 1 if fallas else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,146 +1,139 @@
 import datetime
-import requests
-import os
 import re
-import json
-from dateutil.easter import easter
-from dateutil.relativedelta import relativedelta as rd, FR
-from holidays.constants import JAN, MAY, AUG, OCT, NOV, DEC, JUL
-from holidays.holiday_base import HolidayBase
-
-
-class HolidayEcuador(HolidayBase):
+import threading
+# requests, asyncio, numpy, holidays y dateutil se importan solo cuando se usan:
+# la evaluación sin conexión de una persona no necesita ninguno de ellos
+from .calendario import calendarios
+from .decisiones import clave, memo_decisiones, versiones_vigentes
+from .horario import compilar_planes, horario_activo
+from .instantanea import instantanea_activa
+from .metricas import metricas, reloj
+from .tabla_dias import tabla_activa
+
+
+def __getattr__(nombre):
+    # HolidayEcuador vive en src/feriados_ecuador.py y se importa bajo demanda
+    if nombre == 'HolidayEcuador':
+        from .feriados_ecuador import HolidayEcuador
+        return HolidayEcuador
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, nombre))
+
+
+
+# Expresiones regulares compiladas una sola vez para la validación de entradas
+_RE_CEDULA = re.compile('^[0-9]{10}$')
+_RE_FECHA = re.compile('^([0-9]{4})/([0-9]{2})/([0-9]{2})$')
+_RE_HORA = re.compile('^([01][0-9]|2[0-3]):([0-5][0-9])$')
+
+_ERROR_CEDULA = ('La cédula debe tener el siguiente formato: XXXXXXXXXX, donde X son los diez números '
+                 'correspondientes a la cédula de cuidadanía')
+_ERROR_FECHA = 'La fecha debe tener el siguiente formato: AAAA-MM-DD (por ejemplo: 2021/04/02)'
+_ERROR_HORA = 'La hora debe tener el siguiente formato: HH:MM (por ejemplo, 08:31, 14:22, 00:01)'
+
+
+# Cédula ecuatoriana: los dos primeros dígitos son la provincia (01-24, o 30 para
+# los ecuatorianos registrados en el exterior) y el décimo es el dígito verificador
+# módulo 10 de los nueve primeros con coeficientes 2, 1, 2, 1, ... (los productos
+# mayores que 9 se reducen restando 9)
+_COEFICIENTES = (2, 1, 2, 1, 2, 1, 2, 1, 2)
+_PROVINCIAS = tuple(range(1, 25)) + (30,)
+
+# Motivos de rechazo de una cédula, en orden de prioridad
+CEDULA_VALIDA = 0
+CEDULA_FORMATO = 1
+CEDULA_PROVINCIA = 2
+CEDULA_VERIFICADOR = 3
+MOTIVOS_CEDULA = ('valida', 'formato', 'provincia', 'digito_verificador')
+
+_ERRORES_CEDULA = {
+    CEDULA_FORMATO: _ERROR_CEDULA,
+    CEDULA_PROVINCIA: 'La cédula debe comenzar con un código de provincia válido (01 a 24 o 30)',
+    CEDULA_VERIFICADOR: 'El dígito verificador de la cédula no es válido',
+}
+
+
+def _motivo_cedula(value):
+    """Devuelve el motivo de rechazo de una cédula (CEDULA_*) o CEDULA_VALIDA"""
+    if not isinstance(value, str) or not _RE_CEDULA.match(value):
+        return CEDULA_FORMATO
+    if (ord(value[0]) - 48) * 10 + ord(value[1]) - 48 not in _PROVINCIAS:
+        return CEDULA_PROVINCIA
+    suma = 0
+    for coeficiente, caracter in zip(_COEFICIENTES, value):
+        producto = coeficiente * (ord(caracter) - 48)
+        suma += producto - 9 if producto > 9 else producto
+    if -suma % 10 != ord(value[9]) - 48:
+        return CEDULA_VERIFICADOR
+    return CEDULA_VALIDA
+
+
+def _parsear_cedula(value):
+    """Valida la cédula y devuelve su último dígito como entero"""
+    motivo = _motivo_cedula(value)
+    if motivo != CEDULA_VALIDA:
+        raise ValueError(_ERRORES_CEDULA[motivo])
+    return ord(value[9]) - 48
+
+
+def _parsear_fecha(value):
+    """Valida la fecha AAAA/MM/DD y devuelve su ordinal (datetime.date.toordinal)"""
+    coincidencia = _RE_FECHA.match(value) if isinstance(value, str) else None
+    if coincidencia is None:
+        raise ValueError(_ERROR_FECHA)
+    try:
+        return datetime.date(*map(int, coincidencia.groups())).toordinal()
+    except ValueError:
+        raise ValueError(_ERROR_FECHA) from None
+
+
+def _parsear_hora(value):
+    """Valida la hora HH:MM y devuelve los minutos desde la medianoche"""
+    coincidencia = _RE_HORA.match(value) if isinstance(value, str) else None
+    if coincidencia is None:
+        raise ValueError(_ERROR_HORA)
+    return int(coincidencia.group(1)) * 60 + int(coincidencia.group(2))
+
+
+class RegistroEntrada:
     """
-    Una clase para representar un feriado en Ecuador por provincia (HolidayEcuador)
-    Su objetivo es determinar si un
-    fecha específica es u nas vacaciones lo más rápido y flexible posible.
-    https://www.turismo.gob.ec/wp-content/uploads/2020/03/CALENDARIO-DE-FERIADOS.pdf
+    Registro compacto de una entrada validada. Cada valor se analiza una sola
+    vez y todas las etapas de la evaluación usan los campos ya convertidos.
     ...
-    Atributos (Hereda la clase HolidayBase)
-    ----------
-    prov: str
-        código de provincia según ISO3166-2
-    Métodos
-    -------
-    __init__(self, plate, fecha, tiempo, online=False):
-        Construye todos los atributos necesarios para el objeto HolidayEcuador.
-    _poblar(uno mismo, año):
-        Devoluciones si una fecha es feriado o no
-    """     
-    # Códigos ISO 3166-2 para las principales subdivisiones,
-    # provincias llamadas
-    # https://es.wikipedia.org/wiki/ISO_3166-2:EC
-    PROVINCES = ["EC-P"]  # TODO añadir más provincias
-
-    def __init__(self, **kwargs):
-        """
-        Construye todos los atributos necesarios para el objeto HolidayEcuador
-        """         
-        self.country = "ECU"
-        self.prov = kwargs.pop("prov", "ON")
-        HolidayBase.__init__(self, **kwargs)
 
-    def _populate(self, year):
+     ATRIBUTOS
+     -----------
+             cedula, fecha, hora: str
+                 Valores originales
+             digito: int
+                 Último dígito de la cédula
+             ordinal: int
+                 Fecha como ordinal (datetime.date.toordinal)
+             minutos: int
+                 Hora como minutos desde la medianoche
+    """
+    __slots__ = ('cedula', 'fecha', 'hora', 'digito', 'ordinal', 'minutos')
+
+    def __init__(self, cedula, fecha, hora):
         """
-        Comprueba si una fecha es feriado o no
-        
-         Parámetros
-         ----------
-             año: str
-                 año de una fecha
-         Devoluciones
+        Valida y analiza los valores de la entrada
+
+         Errores
          -------
-             Devuelve verdadero si una fecha es un día festivo, de lo contrario, se muestra como verdadero.
+             ValueError
+                 Si algún valor no tiene el formato esperado
         """
-        # Festividades santo domingo
-        self[datetime.date(year, JUL, 3)] = "Cantonalización de Santo Domingo" 
-        self[datetime.date(year, NOV, 6)] = "Provincialización de Santo Domingo"
+        self.digito = _parsear_cedula(cedula)
+        self.cedula = cedula
+        self.ordinal = _parsear_fecha(fecha)
+        self.fecha = fecha
+        self.minutos = _parsear_hora(hora)
+        self.hora = hora
 
-        # Festividades parroquiales 'Luz de américa'
-        self[datetime.date(year, AUG, 2)] = "Fiestas patronales"
+    @property
+    def dia_semana(self):
+        """Día de la semana de la fecha, 0 = lunes"""
+        return (self.ordinal - 1) % 7  # el ordinal 1 (0001-01-01) fue lunes
 
-        # Día de Año Nuevo 
-        self[datetime.date(year, JAN, 1)] = "Año Nuevo [New Year's Day]"
-        
-        # Navidad
-        self[datetime.date(year, DEC, 25)] = "Navidad [Christmas]"
-        
-        # semana Santa
-        self[easter(year) + rd(weekday=FR(-1))] = "Semana Santa (Viernes Santo) [Good Friday)]"
-        self[easter(year)] = "Día de Pascuas [Easter Day]"
-        
-        # Carnaval
-        total_lent_days = 46
-        self[easter(year) - datetime.timedelta(days=total_lent_days+2)] = "Lunes de carnaval [Carnival of Monday)]"
-        self[easter(year) - datetime.timedelta(days=total_lent_days+1)] = "Martes de carnaval [Tuesday of Carnival)]"
-        
-        # Día laboral
-        trabajo = "Día Nacional del Trabajo [Labour Day]"
-        # (Ley 858/Ley de Reforma a la LOSEP (vigente desde el 21 de diciembre de 2016 /R.O # 906)) Si el feriado cae en sábado o martes
-        # el descanso obligatorio irá al viernes o lunes inmediato anterior
-        # respectivamente
-        if year > 2015 and datetime.date(year, MAY, 1).weekday() in (5,1):
-            self[datetime.date(year, MAY, 1) - datetime.timedelta(days=1)] = trabajo
-        # (Ley 858/Ley de Reforma a la LOSEP (vigente desde el 21 de diciembre de 2016 /R.O # 906)) si el feriado cae en domingo
-        # el descanso obligatorio sera para el lunes siguiente
-        elif year > 2015 and datetime.date(year, MAY, 1).weekday() == 6:
-            self[datetime.date(year, MAY, 1) + datetime.timedelta(days=1)] = trabajo
-        # (Ley 858/Ley de Reforma a la LOSEP (vigente desde el 21 de diciembre de 2016 /R.O # 906)) Feriados que sean en miércoles o jueves
-        # se moverá al viernes de esa semana
-        elif year > 2015 and  datetime.date(year, MAY, 1).weekday() in (2,3):
-            self[datetime.date(year, MAY, 1) + rd(weekday=FR)] = trabajo
-        else:
-            self[datetime.date(year, MAY, 1)] = trabajo      
-        
-        # Primer Grito de Independencia, las reglas son las mismas que el día del trabajo
-        grito = "Primer Grito de la Independencia [First Cry of Independence]"
-        if year > 2015 and datetime.date(year, AUG, 10).weekday() in (5,1):
-            self[datetime.date(year, AUG, 10)- datetime.timedelta(days=1)] = grito
-        elif year > 2015 and datetime.date(year, AUG, 10).weekday() == 6:
-            self[datetime.date(year, AUG, 10) + datetime.timedelta(days=1)] = grito
-        elif year > 2015 and  datetime.date(year, AUG, 10).weekday() in (2,3):
-            self[datetime.date(year, AUG, 10) + rd(weekday=FR)] = grito
-        else:
-            self[datetime.date(year, AUG, 10)] = grito       
-        
-        # Independencia de Guayaquil, las reglas son las mismas que el día del trabajo
-        independencia = "Independencia de Guayaquil [Guayaquil's Independence]"
-        if year > 2015 and datetime.date(year, OCT, 9).weekday() in (5,1):
-            self[datetime.date(year, OCT, 9) - datetime.timedelta(days=1)] = independencia
-        elif year > 2015 and datetime.date(year, OCT, 9).weekday() == 6:
-            self[datetime.date(year, OCT, 9) + datetime.timedelta(days=1)] = independencia
-        elif year > 2015 and  datetime.date(year, MAY, 1).weekday() in (2,3):
-            self[datetime.date(year, OCT, 9) + rd(weekday=FR)] = independencia
-        else:
-            self[datetime.date(year, OCT, 9)] = independencia        
-        
-        # Día de Muertos
-        fieles = "Día de los difuntos [Day of the Dead]" 
-        if (datetime.date(year, NOV, 2).weekday() == 5 and  datetime.date(year, NOV, 3).weekday() == 6):
-            self[datetime.date(year, NOV, 2) - datetime.timedelta(days=1)] = fieles    
-        elif (datetime.date(year, NOV, 3).weekday() == 2):
-            self[datetime.date(year, NOV, 2)] = fieles
-        elif (datetime.date(year, NOV, 3).weekday() == 3):
-            self[datetime.date(year, NOV, 2) + datetime.timedelta(days=2)] = fieles
-        elif (datetime.date(year, NOV, 3).weekday() == 5):
-            self[datetime.date(year, NOV, 2)] =  fieles
-        elif (datetime.date(year, NOV, 3).weekday() == 0):
-            self[datetime.date(year, NOV, 2) + datetime.timedelta(days=2)] = fieles
-        else:
-            self[datetime.date(year, NOV, 2)] = fieles
-            
-        # Fundación de Quito, aplica solo para la provincia de Pichincha,
-        # las reglas son las mismas que el día del trabajo
-        Fundacion = "Fundación de Quito [Foundation of Quito]"        
-        if self.prov in ("EC-P"):
-            if year > 2015 and datetime.date(year, DEC, 6).weekday() in (5,1):
-                self[datetime.date(year, DEC, 6) - datetime.timedelta(days=1)] = Fundacion
-            elif year > 2015 and datetime.date(year, DEC, 6).weekday() == 6:
-                self[(datetime.date(year, DEC, 6).weekday()) + datetime.timedelta(days=1)] =Fundacion
-            elif year > 2015 and  datetime.date(year, DEC, 6).weekday() in (2,3):
-                self[datetime.date(year, DEC, 6) + rd(weekday=FR)] = Fundacion
-            else:
-                self[datetime.date(year, DEC, 6)] = Fundacion
 
 class PersonaAcreditada:
     """
@@ -181,13 +174,6 @@ class PersonaAcreditada:
          Obtiene el valor del atributo de hora
      hora(self, value):
          Establece el valor del atributo de la hora
-     encontrar_día(self, fecha):
-         Devuelve el día a partir de la fecha: por ejemplo, Jueves
-     es_tiempo_descanso(self, check_time):
-         Returns True if provided time is inside the forbidden peak hours, otherwise False
-     esFeriado:
-         Devuelve True si la fecha marcada (en formato ISO 8601 AAAA-MM-DD) es un día festivo
-         en Ecuador, de lo contrario, False
      evaluar(self):
          Devuelve True si una persona cumple con todos los prámetros para la adquisición
          del crédito al bono de desarrollo humano.
@@ -195,7 +181,9 @@ class PersonaAcreditada:
     # Dias de la semana
     days = ["LUNES","MARTES","MIERCOLES","JUEVES","VIERNES","SABADO","DOMINGO"]
 
-    # Restricciones para los día segun el ultimo dígito de la cédula.
+    # Restricciones para los día segun el ultimo dígito de la cédula. Son los valores
+    # del horario por defecto; para cambiarlos sin tocar el código se carga un
+    # horario con src.horario.activar_horario
     restrictions = {
      "LUNES": [1, 2],
      "MARTES": [3, 4],
@@ -205,6 +193,15 @@ class PersonaAcreditada:
      "SABADO": [],
      "DOMINGO": []}
 
+    # Motivos del resultado de evaluar_con_motivo
+    MOTIVO_FERIADO = "feriado"
+    MOTIVO_FUERA_DE_HORARIO = "fuera_de_horario"
+    MOTIVO_DIGITO_SIN_RESTRICCION = "digito_sin_restriccion"
+    MOTIVO_DIGITO_RESTRINGIDO = "digito_restringido"
+
+    # Los valores se guardan ya analizados en un RegistroEntrada
+    __slots__ = ('_registro', 'online')
+
 
     def __init__(self, cedula, fecha, hora, online=False):
         """
@@ -224,16 +221,52 @@ class PersonaAcreditada:
              online: booleano, opcional
                  si en línea == Verdadero, se utilizará la API de días festivos abstractos              
         """                
+        self._registro = RegistroEntrada.__new__(RegistroEntrada)
+        self.online = online
+        if metricas.activo:
+            self.__asignar_instrumentado(cedula, fecha, hora)
+            return
         self.cedula = cedula
         self.fecha = fecha
         self.hora = hora
-        self.online = online
+
+
+    def __asignar_instrumentado(self, cedula, fecha, hora):
+        """Asigna los atributos registrando la latencia del análisis y las entradas inválidas"""
+        inicio = reloj()
+        try:
+            self.cedula = cedula
+            self.fecha = fecha
+            self.hora = hora
+        except ValueError:
+            metricas.contar_motivo('entrada_invalida')
+            raise
+        finally:
+            metricas.observar('analisis', reloj() - inicio)
+
+
+    @classmethod
+    def desde_registro(cls, registro, online=False):
+        """
+        Construye una persona a partir de un RegistroEntrada ya validado, sin
+        volver a analizar sus valores
+        """
+        persona = cls.__new__(cls)
+        persona._registro = registro
+        persona.online = online
+        return persona
+
+
+    @property
+    def registro(self):
+        """Obtiene el RegistroEntrada con los valores ya analizados"""
+        return self._registro
 
 
     @property
     def cedula(self):
         """Obtiene el valor del atributo de cedula"""
-        return self._cedula
+        return self._registro.cedula
 
     @cedula.setter
     def cedula(self, value):
@@ -251,18 +284,18 @@ class PersonaAcreditada:
              ValorError 
                  Si la cadena de valor cédula no tiene el siguiete 
                  formato: XXXXXXXXXX.
-                 Donde X son los diez numeros correspondientes a la cédula de cuidadanía
+                 Donde X son los diez numeros correspondientes a la cédula de cuidadanía,
+                 si los dos primeros no son un código de provincia válido o si el
+                 último no es el dígito verificador
         """
-        if not re.match('^[0-9]{10}$', value):
-            raise ValueError(
-                'La cédula debe tener el siguiente formato: XXXXXXXXXX, donde X son los diez números correspondientes a la cédula de cuidadanía')
-        self._cedula = value
+        self._registro.digito = _parsear_cedula(value)
+        self._registro.cedula = value
 
 
     @property
     def fecha(self):
         """Obtiene el valor del atributo de fecha"""
-        return self._fecha
+        return self._registro.fecha
 
     @fecha.setter
     def fecha(self, value):
@@ -279,19 +312,14 @@ class PersonaAcreditada:
              ValorError
                  Si la cadena de valor no tiene el formato AAAA-MM-DD (por ejemplo, 2021/04/02)
         """
-        try:
-            if len(value) != 10:
-                raise ValueError
-            datetime.datetime.strptime(value, "%Y/%m/%d")
-        except ValueError:
-            raise ValueError('La fecha debe tener el siguiente formato: AAAA-MM-DD (por ejemplo: 2021/04/02)') from None
-        self._fecha = value
+        self._registro.ordinal = _parsear_fecha(value)
+        self._registro.fecha = value
         
 
     @property
     def hora(self):
         """Obtiene el valor del atributo hora"""
-        return self._hora
+        return self._registro.hora
 
 
     @hora.setter
@@ -309,127 +337,582 @@ class PersonaAcreditada:
              ValueError
                  Si la cadena de valor no tiene el formato HH:MM (por ejemplo, 08:31, 14:22, 00:01)
         """
-        if not re.match('^([01][0-9]|2[0-3]):([0-5][0-9]|)$', value):
-            raise ValueError(
-                'La hora debe tener el siguiente formato: HH:MM (por ejemplo, 08:31, 14:22, 00:01)')
-        self._hora = value
+        self._registro.minutos = _parsear_hora(value)
+        self._registro.hora = value
 
 
-    def __encontrar_dia(self, fecha):
+    def evaluar(self):
         """
-        Encuentra el día a partir de la fecha: por ejemplo, jueves
-        
-         Parámetros
-         ----------
-             fecha: str
-                 Está siguiendo el formato ISO 8601 AAAA-MM-DD: por ejemplo, 2020-04-22
-        
+        Comprueba si una persona es beneficiaria al crédito del bono de desarrollo
+        humano según los parametros ingresados.
+        http://www.ecuadorlegalonline.com/consultas/credito-de-desarrollo-humano/
+
          Devoluciones
          -------
-             Devuelve el día a partir de la fecha como una cadena
-        """        
-        dia = datetime.datetime.strptime(fecha, '%Y/%m/%d').weekday()
-        return self.days[dia]
+             Devoluciones Verdadero si el persona es puede recibir el crédito en la
+             hora, fecha y según el ultimo dígito de su cédula, en tal día.
+        """
+        return self.evaluar_con_motivo()[0]
 
 
-    def __es_tiempo_descanso(self, check_hora):
+    def evaluar_con_motivo(self):
         """
-        Método que comprueba si el tiempo proporcionado está dentro de las horas laborables,
-        donde las horas laborales son: 07:30 - 12:00 y 13:00 - 16:30
-        
-         PARAMETRO
+        Igual que evaluar(), pero indica además la regla que decidió el resultado
+
+         Devoluciones
+         -------
+             Tupla (resultado, motivo) donde motivo es uno de MOTIVO_FERIADO,
+             MOTIVO_FUERA_DE_HORARIO, MOTIVO_DIGITO_SIN_RESTRICCION o MOTIVO_DIGITO_RESTRINGIDO
+        """
+        if metricas.activo:
+            return self.__evaluar_instrumentado()
+        # Las reglas las aplica el Evaluador compartido con los valores ya analizados
+        registro = self._registro
+        return evaluador.decidir(registro.digito, registro.ordinal, registro.minutos, self.online)
+
+
+    def __evaluar_instrumentado(self):
+        """evaluar_con_motivo() registrando la latencia de cada etapa y el motivo del resultado"""
+        registro = self._registro
+        resultado = _aplicar_reglas(registro.digito, registro.ordinal, registro.minutos, self.online,
+                                    observar=metricas.observar)
+        metricas.contar_motivo(resultado[1])
+        return resultado
+
+
+    async def evaluar_async(self, consultor=None):
+        """
+        Variante asíncrona de evaluar(). Devuelve el mismo resultado, pero en modo
+        online la consulta del feriado no bloquea el bucle de eventos, se fusiona
+        con otras consultas en curso de la misma fecha y solo se realiza cuando
+        las comprobaciones de hora y dígito no deciden ya el resultado.
+
+         Parámetros
          ----------
-             check_hora : str
-                 Tiempo que se comprobará. Está en formato HH:MM: por ejemplo, 08:35, 19:15
-        
-         RETORNA
+             consultor: ConsultorAsincrono, opcional
+                 Consultor de feriados en línea, por defecto el compartido del proceso
+
+         Devoluciones
          -------
-             Devuelve True si el tiempo proporcionado está dentro de las horas pico prohibidas, de lo contrario, False
-        """          
-        tiempo = datetime.datetime.strptime(check_hora, '%H:%M').time()
-        return ((tiempo >= datetime.time(7, 30) and tiempo <= datetime.time(11, 59)) or
-                (tiempo >= datetime.time(13, 00) and tiempo <= datetime.time(16, 30)))
+             Devoluciones Verdadero en los mismos casos que evaluar()
+        """
+        registro = self._registro
+        plan = horario_activo().plan(registro.ordinal, 'EC-P')
+        laborable = plan.laborable(registro.minutos)
+        feriado = None
+        if self.online:
+            if laborable and plan.restringido(registro.digito):
+                feriado = _es_feriado_conciliado(registro.ordinal)
+                if feriado is None:
+                    if consultor is None:
+                        from .asincrono import consultor_por_defecto
+                        consultor = consultor_por_defecto()
+                    feriado = await consultor.es_feriado(datetime.date.fromordinal(registro.ordinal))
+            else:
+                # La hora o el dígito ya deciden el resultado; el motivo no se devuelve
+                feriado = False
+        return _aplicar_reglas(registro.digito, registro.ordinal, registro.minutos, self.online,
+                               plan, laborable, feriado)[0]
 
 
-    def __es_feriado(self, fecha, online):
+class Evaluador:
+    """
+    Motor de evaluación reutilizable y seguro entre hilos. Aplica las mismas
+    reglas que PersonaAcreditada.evaluar_con_motivo() directamente sobre las
+    cadenas de entrada, sin construir una PersonaAcreditada, un RegistroEntrada
+    ni objetos datetime por consulta: las cédulas, fechas y horas ya validadas
+    se recuerdan ya convertidas a enteros, el plan del día sale del horario en
+    uso y, sin conexión, la decisión se reutiliza desde memo_decisiones.
+    Una misma instancia puede usarse desde cualquier número de hilos: las
+    lecturas de los valores ya analizados no toman bloqueos y las escrituras,
+    que solo ocurren la primera vez que se ve un valor o al vaciar los
+    diccionarios llenos, toman el bloqueo de la instancia. Con las métricas
+    activas cada consulta construye una PersonaAcreditada para medir cada
+    etapa, con el costo de evaluar().
+    ...
+
+     ATRIBUTOS
+     -----------
+             online: booleano
+                 si en línea == Verdadero, se utilizará la API de días festivos abstractos
+                 (o el calendario conciliado activo)
+             max_entradas: int
+                 Número máximo de cédulas y de fechas ya analizadas que se recuerdan
+
+    Métodos
+    -------
+     comprobar(self, cedula, fecha, hora):
+         Devuelve el mismo resultado que PersonaAcreditada(cedula, fecha, hora).evaluar()
+     comprobar_con_motivo(self, cedula, fecha, hora):
+         Igual que comprobar(), pero indica además la regla que decidió el resultado
+     decidir(self, digito, ordinal, minutos, online):
+         Aplica las reglas a valores ya analizados
+     limpiar(self):
+         Olvida las entradas ya analizadas
+    """
+    __slots__ = ('online', 'max_entradas', '_cedulas', '_fechas', '_horas', '_lock')
+
+    def __init__(self, online=False, max_entradas=65536):
         """
-        Comprueba si la fecha (en formato ISO 8601 AAAA-MM-DD) es un día festivo en Ecuador.
-        si online == Verdadero, utilizará una API REST, de lo contrario, generará los días 
-        festivos del año examinado
-        
+        Construye todos los atributos necesarios para el evaluador
+
          Parámetros
          ----------
-             fecha: str
-                 Está siguiendo el formato ISO 8601 AAAA-MM-DD: por ejemplo, 2020-04-22
              online: booleano, opcional
                  si en línea == Verdadero, se utilizará la API de días festivos abstractos
-        
+             max_entradas: int, opcional
+                 Número máximo de cédulas y de fechas ya analizadas que se recuerdan
+        """
+        if max_entradas < 1:
+            raise ValueError('max_entradas debe ser mayor que cero')
+        self.online = online
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self.limpiar()
+
+    def limpiar(self):
+        """Olvida las cédulas, fechas y horas ya analizadas"""
+        self._cedulas = {}
+        self._fechas = {}
+        self._horas = {}  # a lo sumo 1440 horas válidas
+
+    def comprobar(self, cedula, fecha, hora):
+        """
+        Comprueba si una persona puede cobrar con el último dígito de su cédula
+        en la fecha y hora dadas
+
+         Parámetros
+         ----------
+             cedula, fecha, hora: str
+                 Con los mismos formatos que PersonaAcreditada
+
          RETORNA
          -------
-             Devuelve True si la fecha marcada (en formato ISO 8601 AAAA-MM-DD) es un día festivo en Ecuador, de lo contrario, False
-        """          
-        y, m, d = fecha.split('/')
+             El mismo resultado que PersonaAcreditada(cedula, fecha, hora).evaluar()
 
-        if online:
-            # abstractapi Holidays API, free version: 1000 requests per month
-            # 1 request per second
-            # retrieve API key from enviroment variable
-            key = os.environ.get('HOLIDAYS_API_KEY')
-            response = requests.get(
-                "https://holidays.abstractapi.com/v1/?api_key={}&country=EC&year={}&month={}&day={}".format(key, y, m, d))
-            if (response.status_code == 401):
-                # This means there is a missing API key
-                raise requests.HTTPError(
-                    'Missing API key. Store your key in the enviroment variable HOLIDAYS_API_KEY')
-            if response.content == b'[]':  # if there is no holiday we get an empty array
-                return False
-            # Fix Maundy Thursday incorrectly denoted as holiday
-            if json.loads(response.text[1:-1])['name'] == 'Maundy Thursday':
-                return False
-            return True
-        else:
-            ecu_holidays = HolidayEcuador(prov='EC-P')
-            return fecha in ecu_holidays
+         Errores
+         -------
+             ValueError
+                 Si algún valor no tiene el formato esperado
+        """
+        return self.comprobar_con_motivo(cedula, fecha, hora)[0]
 
+    def comprobar_con_motivo(self, cedula, fecha, hora):
+        """
+        Igual que comprobar(), pero indica además la regla que decidió el resultado
 
-    def evaluar(self):
+         RETORNA
+         -------
+             Tupla (resultado, motivo) como PersonaAcreditada.evaluar_con_motivo()
         """
-        Comprueba si una persona es beneficiaria al crédito del bono de desarrollo
-        humano según los parametros ingresados.
-        http://www.ecuadorlegalonline.com/consultas/credito-de-desarrollo-humano/
+        if metricas.activo:
+            # La instrumentación mide cada etapa de PersonaAcreditada
+            return PersonaAcreditada(cedula, fecha, hora, self.online).evaluar_con_motivo()
+        # Se valida en el mismo orden que PersonaAcreditada para reportar el mismo error
+        digito = self._cedulas.get(cedula) if isinstance(cedula, str) else None
+        if digito is None:
+            digito = _parsear_cedula(cedula)
+            with self._lock:
+                _recordar(self._cedulas, cedula, digito, self.max_entradas)
+        ordinal = self._fechas.get(fecha) if isinstance(fecha, str) else None
+        if ordinal is None:
+            ordinal = _parsear_fecha(fecha)
+            with self._lock:
+                _recordar(self._fechas, fecha, ordinal, self.max_entradas)
+        minutos = self._horas.get(hora) if isinstance(hora, str) else None
+        if minutos is None:
+            minutos = _parsear_hora(hora)
+            with self._lock:
+                self._horas[hora] = minutos
+        return self.decidir(digito, ordinal, minutos, self.online)
+
+    def decidir(self, digito, ordinal, minutos, online=False):
+        """
+        Aplica las reglas de evaluar_con_motivo() a valores ya analizados
 
-         Devoluciones
+         Parámetros
+         ----------
+             digito: int
+                 Último dígito de la cédula
+             ordinal: int
+                 Fecha como ordinal (datetime.date.toordinal)
+             minutos: int
+                 Hora como minutos desde la medianoche
+             online: booleano, opcional
+                 si en línea == Verdadero, se utilizará la API de días festivos abstractos
+
+         RETORNA
          -------
-             Devoluciones Verdadero si el persona es puede recibir el crédito en la
-             hora, fecha y según el ultimo dígito de su cédula, en tal día.
+             Tupla (resultado, motivo)
         """
-        # Comprobar si la fecha es un día festivo
-        if self.__encontrar_dia(self.fecha):
-            return True
+        # Las versiones se toman antes de calcular para no guardar una decisión
+        # calculada con un horario o unos feriados que otro hilo ya reemplazó
+        versiones = None if online else versiones_vigentes()
+        # Plan del día según el día de la semana y las excepciones del horario en uso
+        plan = horario_activo().plan(ordinal, 'EC-P')
+        laborable = plan.laborable(minutos)
+        if online:
+            return _aplicar_reglas(digito, ordinal, minutos, True, plan, laborable)
+
+        # Sin conexión la decisión solo depende del dígito, la fecha y si la hora es laborable
+        llave = clave(digito, ordinal, laborable)
+        decision = memo_decisiones.obtener(llave)
+        if decision is None:
+            decision = _aplicar_reglas(digito, ordinal, minutos, False, plan, laborable)
+            memo_decisiones.guardar(llave, decision, versiones)
+        return decision
+
+
+def _recordar(entradas, valor, analizado, maximo):
+    """
+    Guarda un valor ya analizado; al llegar al máximo se olvidan todos. Se
+    llama con el bloqueo del Evaluador tomado; los lectores sin bloqueo ven el
+    valor o no lo encuentran y lo vuelven a analizar.
+    """
+    if len(entradas) >= maximo:
+        entradas.clear()
+    entradas[valor] = analizado
+
+
+def _aplicar_reglas(digito, ordinal, minutos, online, plan=None, laborable=None, feriado=None, observar=None):
+    """
+    Aplica las reglas de evaluar_con_motivo(); es la única implementación de
+    las reglas, que todas las formas de evaluar comparten
+
+     Parámetros
+     ----------
+         digito, ordinal, minutos: int
+             Último dígito de la cédula, fecha como ordinal y hora en minutos
+         online: booleano
+             si en línea == Verdadero, se utilizará la API de días festivos abstractos
+         plan, laborable, feriado: opcional
+             PlanDia del día, si la hora es laborable y si el día es feriado, cuando
+             ya se conocen; los que faltan se calculan
+         observar: callable, opcional
+             Función (etapa, segundos) que recibe la latencia de cada etapa
+
+     RETORNA
+     -------
+         Tupla (resultado, motivo)
+    """
+    if observar is not None:
+        inicio = reloj()
+    # Comprobar si la fecha es un día festivo
+    if feriado is None:
+        feriado = _es_feriado(ordinal, online)
+    if observar is not None:
+        inicio = _medir(observar, 'feriado_online' if online else 'feriado_offline', inicio)
+    if feriado:
+        return True, PersonaAcreditada.MOTIVO_FERIADO
+
+    # Plan del día según el día de la semana y las excepciones del horario en uso
+    if plan is None:
+        plan = horario_activo().plan(ordinal, 'EC-P')
+    if observar is not None:
+        inicio = _medir(observar, 'dia_semana', inicio)
+
+    # Compruebe si el tiempo esta dentro de las horas laborables propuestas.
+    if laborable is None:
+        laborable = plan.laborable(minutos)
+    if observar is not None:
+        inicio = _medir(observar, 'horario', inicio)
+    if not laborable:
+        return True, PersonaAcreditada.MOTIVO_FUERA_DE_HORARIO
+
+    # Verifique si el último dígito de la cédula no está restringido en este día en particular
+    restringido = plan.restringido(digito)
+    if observar is not None:
+        _medir(observar, 'restriccion', inicio)
+    if not restringido:
+        return True, PersonaAcreditada.MOTIVO_DIGITO_SIN_RESTRICCION
+    return False, PersonaAcreditada.MOTIVO_DIGITO_RESTRINGIDO
+
+
+def _medir(observar, etapa, inicio):
+    """Registra la latencia de una etapa y devuelve el instante en que empieza la siguiente"""
+    ahora = reloj()
+    observar(etapa, ahora - inicio)
+    return ahora
+
+
+def _es_feriado(ordinal, online):
+    """
+    Comprueba si el día con el ordinal dado es feriado en EC-P, con la API de
+    feriados si online es Verdadero o con los datos sin conexión si no
+    """
+    if online:
+        # Un calendario conciliado con la API ya responde sin ir a la red
+        feriado = _es_feriado_conciliado(ordinal)
+        if feriado is not None:
+            return feriado
+        # abstractapi Holidays API, con caché en disco y limitación de peticiones
+        from .api_feriados import cliente_por_defecto
+        return cliente_por_defecto().es_feriado(datetime.date.fromordinal(ordinal))
+    return _es_feriado_sin_conexion(ordinal)
+
+
+# Evaluadores compartidos por todo el proceso
+evaluador = Evaluador()
+evaluador_online = Evaluador(online=True)
+
+
+# Ordinal (datetime.date.toordinal) del 1970-01-01, origen de numpy.datetime64
+_ORDINAL_1970 = datetime.date(1970, 1, 1).toordinal()
+
+
+def _codigos(valores, ancho):
+    """
+    Convierte una columna de cadenas en una matriz de códigos Unicode
+
+     Parámetros
+     ----------
+         valores: lista o numpy.ndarray de str
+             Columna de cadenas de carácteres
+         ancho: int
+             Longitud exacta que deben tener las cadenas
+
+     RETORNA
+     -------
+         Una tupla (codigos, valido) donde codigos es una matriz (n, ancho) de
+         uint32 y valido indica las filas que tienen exactamente ancho carácteres
+    """
+    import numpy as np
+
+    valores = np.asarray(valores)
+    if valores.dtype.kind not in 'US':
+        valores = valores.astype(str)
+    valido = np.char.str_len(valores) == ancho
+    codigos = valores.astype('U%d' % ancho).view(np.uint32).reshape(-1, ancho)
+    return codigos, valido
+
+
+def _digitos(codigos):
+    """Devuelve los valores numéricos de los códigos y una máscara de dígitos válidos"""
+    import numpy as np
+
+    valores = codigos.astype(np.int64) - ord('0')
+    return valores, (valores >= 0) & (valores <= 9)
+
+
+def _motivos_cedulas(valores, formato_valido):
+    """
+    Versión vectorizada de _motivo_cedula
+
+     Parámetros
+     ----------
+         valores: numpy.ndarray (n, 10) de int
+             Valores numéricos de los carácteres de cada cédula
+         formato_valido: numpy.ndarray de bool
+             Filas con exactamente diez dígitos
+
+     RETORNA
+     -------
+         numpy.ndarray de uint8 con el motivo de rechazo de cada fila (CEDULA_*)
+    """
+    import numpy as np
+
+    productos = valores[:, :9] * np.array(_COEFICIENTES)
+    suma = (productos - 9 * (productos > 9)).sum(axis=1)
+    provincia = valores[:, 0] * 10 + valores[:, 1]
+    motivos = np.zeros(len(valores), dtype=np.uint8)
+    # Se asignan de menor a mayor prioridad para que prevalezca el primer motivo
+    motivos[-suma % 10 != valores[:, 9]] = CEDULA_VERIFICADOR
+    motivos[~np.isin(provincia, _PROVINCIAS)] = CEDULA_PROVINCIA
+    motivos[~formato_valido] = CEDULA_FORMATO
+    return motivos
 
-        # Consultar 
-        # o si se utilizan sólo dos letras
-        if self.cedula[1] in 'AUZEXM' or len(self.cedula.split('-')[0]) == 2:
-            return True
 
-        # Compruebe si el tiempo esta dentro de las horas laborables propuestas.
-        if not self.__es_tiempo_descanso(self.hora):
-            return True
+def validar_cedulas(cedulas):
+    """
+    Valida una columna completa de cédulas sin construir objetos: formato de
+    diez dígitos, código de provincia y dígito verificador módulo 10, con las
+    mismas reglas que el atributo cedula de PersonaAcreditada. Sirve para
+    descartar las filas inválidas de un lote antes de cualquier etapa costosa.
+
+     Parámetros
+     ----------
+         cedulas: lista o numpy.ndarray de str
+             Cédulas que se validarán
+
+     RETORNA
+     -------
+         numpy.ndarray de uint8 con el motivo de rechazo de cada fila:
+         CEDULA_VALIDA (0), CEDULA_FORMATO, CEDULA_PROVINCIA o CEDULA_VERIFICADOR.
+         MOTIVOS_CEDULA[motivo] da su nombre
+    """
+    codigos, valido = _codigos(cedulas, 10)
+    valores, digitos = _digitos(codigos)
+    return _motivos_cedulas(valores, valido & digitos.all(axis=1))
 
-        day = self.__es_feriado(self.fecha)  # Buscar el día de la semana a partir de la fecha
 
-        # Verifique si el último dígito de la cédula no está restringido en este día en particular
-        if int(self.cedula[-1]) not in self.restrictions[day]:
-            return True
-        return False
+def _es_feriado_sin_conexion(ordinal):
+    """
+    Comprueba si el día con el ordinal dado es feriado en EC-P sin usar la API:
+    primero en la tabla de días activa, luego en la instantánea activa y por
+    último con la caché de calendarios de HolidayEcuador
+    """
+    tabla = tabla_activa()
+    if tabla is not None and tabla.prov == 'EC-P':
+        try:
+            return tabla.es_feriado_ordinal(ordinal)
+        except KeyError:
+            pass
+    instantanea = instantanea_activa()
+    if instantanea is not None and instantanea.prov == 'EC-P':
+        try:
+            return instantanea.es_feriado_ordinal(ordinal)
+        except KeyError:
+            pass
+    return calendarios.es_feriado(datetime.date.fromordinal(ordinal), 'EC-P')
+
+
+def _es_feriado_conciliado(ordinal):
+    """
+    Comprueba si el día con el ordinal dado es feriado en EC-P según el
+    calendario conciliado con la API (ver src/conciliacion.py) que esté activo
+
+     RETORNA
+     -------
+         True o False, o None si no hay un calendario conciliado que cubra el día
+    """
+    instantanea = instantanea_activa()
+    if instantanea is None or instantanea.origen != 'conciliado' or instantanea.prov != 'EC-P':
+        return None
+    try:
+        return instantanea.es_feriado_ordinal(ordinal)
+    except KeyError:
+        return None
+
+
+def evaluar_lote(cedulas, fechas, horas):
+    """
+    Versión vectorizada de PersonaAcreditada.evaluar para listas completas de
+    beneficiarios. Evalúa cada fila con las mismas reglas que el método por
+    objeto (sin conexión), pero calculando el día de la semana, las horas
+    laborables, las restricciones por dígito y los feriados como operaciones
+    sobre arreglos.
+
+     Parámetros
+     ----------
+         cedulas: lista o numpy.ndarray de str
+             Cédulas de diez dígitos: por ejemplo, 2300166101
+         fechas: lista o numpy.ndarray de str
+             Fechas en formato AAAA/MM/DD: por ejemplo, 2021/04/02
+         horas: lista o numpy.ndarray de str
+             Horas en formato HH:MM: por ejemplo, 08:35, 19:30
+
+     RETORNA
+     -------
+         numpy.ndarray de bool con el resultado de evaluar() para cada fila
+
+     Errores
+     -------
+         ValueError
+             Si las columnas no tienen la misma longitud o alguna fila no tiene
+             el formato que exigen los atributos de PersonaAcreditada
+    """
+    import numpy as np
+
+    ced, ced_ok = _codigos(cedulas, 10)
+    fec, fec_ok = _codigos(fechas, 10)
+    hor, hor_ok = _codigos(horas, 5)
+    if not len(ced) == len(fec) == len(hor):
+        raise ValueError('Las columnas cedulas, fechas y horas deben tener la misma longitud')
+
+    # Cédula: diez dígitos, provincia y dígito verificador, antes de cualquier otra etapa
+    ced_val, ced_dig = _digitos(ced)
+    motivos = _motivos_cedulas(ced_val, ced_ok & ced_dig.all(axis=1))
+    if motivos.any():
+        fila = int(np.flatnonzero(motivos)[0])
+        raise ValueError('{} (fila {})'.format(_ERRORES_CEDULA[int(motivos[fila])], fila))
+    digito = ced_val[:, 9]
+
+    # Fecha: AAAA/MM/DD y debe existir en el calendario
+    fec_val, fec_dig = _digitos(fec)
+    separador = ord('/')
+    fec_ok &= fec_dig[:, [0, 1, 2, 3, 5, 6, 8, 9]].all(axis=1)
+    fec_ok &= (fec[:, 4] == separador) & (fec[:, 7] == separador)
+    anio = fec_val[:, 0] * 1000 + fec_val[:, 1] * 100 + fec_val[:, 2] * 10 + fec_val[:, 3]
+    mes = fec_val[:, 5] * 10 + fec_val[:, 6]
+    dia = fec_val[:, 8] * 10 + fec_val[:, 9]
+    fec_ok &= (anio >= 1) & (mes >= 1) & (mes <= 12) & (dia >= 1)
+    # Las filas inválidas se reemplazan por una fecha cualquiera para no romper el cálculo
+    anio = np.where(fec_ok, anio, 1970)
+    mes = np.where(fec_ok, mes, 1)
+    dia = np.where(fec_ok, dia, 1)
+    meses = ((anio - 1970) * 12 + mes - 1).astype('datetime64[M]')
+    dias = meses.astype('datetime64[D]') + (dia - 1)
+    fec_ok &= dias.astype('datetime64[M]') == meses
+    _verificar_filas(fec_ok, 'La fecha debe tener el siguiente formato: AAAA-MM-DD (por ejemplo: 2021/04/02)')
+
+    # Hora: HH:MM
+    hor_val, hor_dig = _digitos(hor)
+    hor_ok &= hor_dig[:, [0, 1, 3, 4]].all(axis=1) & (hor[:, 2] == ord(':'))
+    hh = hor_val[:, 0] * 10 + hor_val[:, 1]
+    mm = hor_val[:, 3] * 10 + hor_val[:, 4]
+    hor_ok &= (hh <= 23) & (mm <= 59)
+    _verificar_filas(hor_ok, 'La hora debe tener el siguiente formato: HH:MM (por ejemplo, 08:31, 14:22, 00:01)')
+    minutos = hh * 60 + mm
+
+    # Feriado y plan de cada día distinto del lote según el horario en uso (ver src/horario.py)
+    horario = horario_activo()
+    unicos, indice = np.unique(dias, return_inverse=True)
+    indice = indice.reshape(-1)
+    ordinales = (unicos.astype(np.int64) + _ORDINAL_1970).tolist()
+    feriados = [_es_feriado_sin_conexion(o) for o in ordinales]
+    planes = [horario.plan(o, 'EC-P') for o in ordinales]
+    plan_dia, mapas, _ = compilar_planes(planes)
+    laborable = mapas[plan_dia[indice], minutos]
+
+    # La decisión solo depende del día, el dígito y si la hora es laborable: las
+    # reglas se aplican una vez por cada combinación presente en el lote
+    combinaciones, posicion = np.unique(indice * 20 + digito * 2 + laborable, return_inverse=True)
+    decisiones = np.array([_aplicar_reglas(c % 20 // 2, ordinales[c // 20], None, False, planes[c // 20],
+                                           bool(c % 2), feriados[c // 20])[0]
+                           for c in combinaciones.tolist()], dtype=bool)
+    return decisiones[posicion.reshape(-1)]
+
+
+async def evaluar_lote_async(filas, online=True, consultor=None):
+    """
+    Evalúa concurrentemente una lista de filas (cedula, fecha, hora) con
+    PersonaAcreditada.evaluar_async. Las consultas de feriados en línea se
+    ejecutan en paralelo dentro del límite de la API y las fechas repetidas
+    comparten una sola llamada.
+
+     Parámetros
+     ----------
+         filas: iterable de tuplas (cedula, fecha, hora)
+             Datos de cada persona
+         online: booleano, opcional
+             si en línea == Verdadero, se utilizará la API de días festivos abstractos
+         consultor: ConsultorAsincrono, opcional
+             Consultor de feriados en línea, por defecto el compartido del proceso
+
+     RETORNA
+     -------
+         Lista de bool con el resultado de evaluar() para cada fila, en el mismo orden
+
+     Errores
+     -------
+         ValueError
+             Si alguna fila no tiene el formato que exigen los atributos de PersonaAcreditada
+    """
+    import asyncio
+
+    personas = [PersonaAcreditada(cedula, fecha, hora, online) for cedula, fecha, hora in filas]
+    return list(await asyncio.gather(*(p.evaluar_async(consultor) for p in personas)))
+
+
+def _verificar_filas(validas, mensaje):
+    """Lanza ValueError indicando la primera fila inválida del lote"""
+    if not validas.all():
+        fila = int(validas.argmin())
+        raise ValueError('{} (fila {})'.format(mensaje, fila))
 
 
 if __name__ == '__main__':
-    
-    cedula = input("Digite la cedula: ")
-    fecha = input("Digite la fecha: ")
-    hora = input("Digite la hora: ")
-    online = False
-
-    x = PersonaAcreditada(cedula,fecha,hora,online)
-    x.evaluar()
+    import sys
+    from .flujo import main
+
+    sys.exit(main())
@@ -0,0 +1,537 @@
+import datetime
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# abstractapi Holidays API, versión gratuita: 1000 peticiones por mes
+# y 1 petición por segundo
+URL_API = "https://holidays.abstractapi.com/v1/"
+PETICIONES_POR_SEGUNDO = 1.0
+PETICIONES_POR_MES = 1000
+
+# Las respuestas se guardan 30 días antes de volver a consultarse
+TTL_RESPUESTAS = 30 * 24 * 3600
+
+# La API marca incorrectamente el Jueves Santo (Maundy Thursday) como feriado
+NOMBRES_IGNORADOS = frozenset({'Maundy Thursday'})
+
+
+class LimitadorTokens:
+    """
+    Limitador de cubeta de tokens que respeta los límites de la API de feriados:
+    un número de peticiones por segundo y un cupo de peticiones por mes. Con
+    una CacheRespuestas en disco, los tokens, la última reposición y las
+    peticiones del mes se guardan en su base SQLite y se actualizan con una
+    sola sentencia UPDATE atómica, de modo que todos los procesos que usan el
+    mismo archivo (ejecuciones de la línea de comandos, procesos de servicio y
+    de paralelo) comparten un único presupuesto.
+    ...
+
+     ATRIBUTOS
+     -----------
+             tasa: float
+                 Tokens que se reponen por segundo
+             capacidad: int
+                 Tokens que se pueden acumular para ráfagas
+             max_mensual: int o None
+                 Peticiones permitidas por mes calendario, None para no limitar
+             cache: CacheRespuestas o None
+                 Caché donde se comparte el estado del limitador, None para
+                 mantenerlo solo en este objeto
+
+    Métodos
+    -------
+     adquirir(self):
+         Espera hasta que haya un token disponible y lo consume
+    """
+
+    def __init__(self, tasa=PETICIONES_POR_SEGUNDO, capacidad=1, max_mensual=PETICIONES_POR_MES,
+                 reloj=None, dormir=time.sleep, hoy=datetime.date.today, cache=None):
+        """
+        Construye todos los atributos necesarios para el limitador
+
+         Parámetros
+         ----------
+             tasa: float, opcional
+                 Tokens que se reponen por segundo
+             capacidad: int, opcional
+                 Tokens que se pueden acumular
+             max_mensual: int o None, opcional
+                 Peticiones permitidas por mes calendario
+             reloj, dormir, hoy: callable, opcional
+                 Funciones de tiempo, reemplazables en las pruebas. El reloj por
+                 defecto es time.monotonic o, si el estado se comparte, time.time
+             cache: CacheRespuestas, opcional
+                 Caché donde se comparte el estado entre procesos
+        """
+        if tasa <= 0 or capacidad < 1:
+            raise ValueError('La tasa y la capacidad deben ser positivas')
+        self.tasa = tasa
+        self.capacidad = capacidad
+        self.max_mensual = max_mensual
+        self.cache = cache
+        if reloj is None:
+            # Entre procesos solo la hora del sistema es comparable
+            reloj = time.monotonic if cache is None else time.time
+        self._reloj = reloj
+        self._dormir = dormir
+        self._hoy = hoy
+        self._tokens = float(capacidad)
+        self._ultimo = reloj()
+        self._mes = None
+        self._usadas_mes = 0
+        self._lock = threading.Lock()
+
+    def adquirir(self):
+        """
+        Espera hasta que haya un token disponible y lo consume
+
+         Errores
+         -------
+             RuntimeError
+                 Si se agotó el cupo mensual de peticiones
+        """
+        if self.cache is not None:
+            self._adquirir_compartido()
+            return
+        while True:
+            with self._lock:
+                hoy = self._hoy()
+                mes = (hoy.year, hoy.month)
+                if mes != self._mes:
+                    self._mes, self._usadas_mes = mes, 0
+                if self.max_mensual is not None and self._usadas_mes >= self.max_mensual:
+                    raise RuntimeError(
+                        'Se agotó el cupo mensual de {} peticiones a la API de feriados'.format(self.max_mensual))
+                ahora = self._reloj()
+                self._tokens = min(self.capacidad, self._tokens + (ahora - self._ultimo) * self.tasa)
+                self._ultimo = ahora
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self._usadas_mes += 1
+                    return
+                espera = (1 - self._tokens) / self.tasa
+            self._dormir(espera)
+
+    def _adquirir_compartido(self):
+        """adquirir() con el estado guardado en la caché"""
+        while True:
+            hoy = self._hoy()
+            mes = '{:04d}-{:02d}'.format(hoy.year, hoy.month)
+            espera = self.cache.tomar_token(mes, self._reloj(), self.tasa, self.capacidad, self.max_mensual)
+            if espera == 0:
+                return
+            if espera is None:
+                raise RuntimeError(
+                    'Se agotó el cupo mensual de {} peticiones a la API de feriados'.format(self.max_mensual))
+            self._dormir(espera)
+
+
+class CacheRespuestas:
+    """
+    Caché persistente en disco (SQLite) de las respuestas de la API de feriados,
+    indexada por fecha (o por año para las consultas de un año completo) y con
+    tiempo de vida.
+    ...
+
+     ATRIBUTOS
+     -----------
+             ruta: str
+                 Archivo de la base de datos, ':memory:' para no persistir
+             ttl: float
+                 Segundos durante los que una respuesta se considera válida
+
+    Métodos
+    -------
+     obtener(self, fecha):
+         Devuelve la respuesta guardada para la fecha o None
+     guardar(self, fecha, feriados):
+         Guarda la respuesta de la fecha
+     obtener_anio(self, anio):
+         Devuelve la respuesta guardada para el año completo o None
+     guardar_anio(self, anio, feriados, por_dia):
+         Guarda la respuesta del año y la de cada uno de sus días
+     respuestas(self):
+         Devuelve todas las respuestas guardadas por fecha
+     tomar_token(self, mes, ahora, tasa, capacidad, max_mensual):
+         Consume un token del limitador compartido por todos los procesos
+    """
+
+    def __init__(self, ruta, ttl=TTL_RESPUESTAS, reloj=time.time):
+        """
+        Construye todos los atributos necesarios para la caché
+
+         Parámetros
+         ----------
+             ruta: str
+                 Archivo de la base de datos
+             ttl: float, opcional
+                 Segundos durante los que una respuesta se considera válida
+             reloj: callable, opcional
+                 Función que devuelve la hora actual en segundos
+        """
+        if ruta != ':memory:':
+            directorio = os.path.dirname(os.path.abspath(ruta))
+            os.makedirs(directorio, exist_ok=True)
+        self.ruta = ruta
+        self.ttl = ttl
+        self._reloj = reloj
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(ruta, check_same_thread=False)
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS respuestas (fecha TEXT PRIMARY KEY, cuerpo TEXT, guardado REAL)')
+        # Estado del LimitadorTokens compartido: una sola fila
+        self._db.execute('CREATE TABLE IF NOT EXISTS limitador (id INTEGER PRIMARY KEY CHECK (id = 0), '
+                         'tokens REAL, ultimo REAL, mes TEXT, usadas INTEGER)')
+        self._db.commit()
+
+    def obtener(self, fecha):
+        """
+        Devuelve la respuesta guardada para la fecha
+
+         Parámetros
+         ----------
+             fecha: datetime.date
+                 Fecha consultada
+
+         RETORNA
+         -------
+             Lista de feriados de la API o None si no está guardada o expiró
+        """
+        return self._obtener(fecha.isoformat())
+
+    def _obtener(self, llave):
+        with self._lock:
+            fila = self._db.execute(
+                'SELECT cuerpo, guardado FROM respuestas WHERE fecha = ?', (llave,)).fetchone()
+        if fila is None or self._reloj() - fila[1] > self.ttl:
+            return None
+        return json.loads(fila[0])
+
+    def guardar(self, fecha, feriados):
+        """
+        Guarda la respuesta de la API para la fecha
+
+         Parámetros
+         ----------
+             fecha: datetime.date
+                 Fecha consultada
+             feriados: list
+                 Lista de feriados devuelta por la API
+        """
+        with self._lock:
+            self._db.execute('INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?)',
+                             (fecha.isoformat(), json.dumps(feriados), self._reloj()))
+            self._db.commit()
+
+    def obtener_anio(self, anio):
+        """
+        Devuelve la respuesta guardada para el año completo
+
+         Parámetros
+         ----------
+             anio: int
+                 Año consultado
+
+         RETORNA
+         -------
+             Lista de feriados de la API o None si no está guardada o expiró
+        """
+        return self._obtener('{:04d}'.format(anio))
+
+    def guardar_anio(self, anio, feriados, por_dia):
+        """
+        Guarda en una sola transacción la respuesta del año completo y la de
+        cada uno de sus días, de modo que las consultas por fecha de ese año
+        tampoco lleguen a la red
+
+         Parámetros
+         ----------
+             anio: int
+                 Año consultado
+             feriados: list
+                 Lista de feriados devuelta por la API para el año
+             por_dia: dict
+                 {datetime.date: lista de feriados} de cada día del año
+        """
+        guardado = self._reloj()
+        filas = [(fecha.isoformat(), json.dumps(lista), guardado) for fecha, lista in por_dia.items()]
+        filas.append(('{:04d}'.format(anio), json.dumps(feriados), guardado))
+        with self._lock:
+            self._db.executemany('INSERT OR REPLACE INTO respuestas VALUES (?, ?, ?)', filas)
+            self._db.commit()
+
+    def respuestas(self):
+        """
+        Devuelve todas las respuestas guardadas por fecha, vigentes o no
+
+         RETORNA
+         -------
+             Lista de (datetime.date, lista de feriados de la API) ordenada por fecha
+        """
+        with self._lock:
+            filas = self._db.execute(
+                'SELECT fecha, cuerpo FROM respuestas WHERE length(fecha) = 10 ORDER BY fecha').fetchall()
+        return [(datetime.date.fromisoformat(fecha), json.loads(cuerpo)) for fecha, cuerpo in filas]
+
+    def tomar_token(self, mes, ahora, tasa, capacidad, max_mensual):
+        """
+        Repone los tokens según el tiempo transcurrido y consume uno, en una
+        sola sentencia UPDATE que solo modifica la fila si hay un token
+        disponible y queda cupo en el mes. SQLite serializa las escrituras,
+        así que dos procesos nunca consumen el mismo token.
+
+         Parámetros
+         ----------
+             mes: str
+                 Mes actual, AAAA-MM; el contador se reinicia al cambiar
+             ahora: float
+                 Hora actual en segundos (time.time en todos los procesos)
+             tasa, capacidad, max_mensual
+                 Parámetros del LimitadorTokens
+
+         RETORNA
+         -------
+             0 si se consumió un token, los segundos que faltan para el
+             siguiente o None si se agotó el cupo del mes
+        """
+        cupo = -1 if max_mensual is None else max_mensual
+        with self._lock:
+            self._db.execute('INSERT OR IGNORE INTO limitador VALUES (0, ?, ?, ?, 0)', (capacidad, ahora, mes))
+            actualizadas = self._db.execute(
+                'UPDATE limitador SET '
+                '  tokens = min(:capacidad, tokens + max(0, :ahora - ultimo) * :tasa) - 1, ultimo = :ahora, '
+                '  usadas = CASE WHEN mes = :mes THEN usadas + 1 ELSE 1 END, mes = :mes '
+                'WHERE id = 0 AND min(:capacidad, tokens + max(0, :ahora - ultimo) * :tasa) >= 1 '
+                '  AND (:cupo < 0 OR CASE WHEN mes = :mes THEN usadas ELSE 0 END < :cupo)',
+                {'capacidad': capacidad, 'ahora': ahora, 'tasa': tasa, 'mes': mes, 'cupo': cupo}).rowcount
+            self._db.commit()
+            if actualizadas:
+                return 0
+            tokens, ultimo, mes_guardado, usadas = self._db.execute(
+                'SELECT tokens, ultimo, mes, usadas FROM limitador WHERE id = 0').fetchone()
+        if max_mensual is not None and mes_guardado == mes and usadas >= max_mensual:
+            return None
+        disponibles = min(capacidad, tokens + max(0.0, ahora - ultimo) * tasa)
+        return max((1 - disponibles) / tasa, 1e-3)
+
+    def cerrar(self):
+        """Cierra la base de datos"""
+        with self._lock:
+            self._db.close()
+
+
+class ClienteFeriados:
+    """
+    Cliente de la API de feriados abstractapi con conexiones persistentes
+    (keep-alive), limitación de peticiones y caché de respuestas en disco.
+    Las fechas ya consultadas nunca vuelven a llegar a la red mientras su
+    respuesta siga vigente.
+    ...
+
+     ATRIBUTOS
+     -----------
+             api_key: str
+                 Clave de la API, por defecto la variable de entorno HOLIDAYS_API_KEY
+             url: str
+                 Dirección de la API (puede apuntar a un servidor local)
+             cache: CacheRespuestas
+                 Caché de respuestas por fecha
+             limitador: LimitadorTokens
+                 Limitador de peticiones
+             timeout: float
+                 Segundos máximos de espera por petición
+
+    Métodos
+    -------
+     consultar(self, fecha):
+         Devuelve la lista de feriados que la API reporta para la fecha
+     consultar_anio(self, anio):
+         Devuelve los feriados que la API reporta para todo un año, por fecha
+     es_feriado(self, fecha):
+         Devuelve True si la fecha es feriado según la API
+    """
+
+    def __init__(self, api_key=None, url=URL_API, cache=None, limitador=None, timeout=5.0, conexiones=4):
+        """
+        Construye todos los atributos necesarios para el cliente
+
+         Parámetros
+         ----------
+             api_key: str, opcional
+                 Clave de la API, por defecto la variable de entorno HOLIDAYS_API_KEY
+             url: str, opcional
+                 Dirección de la API
+             cache: CacheRespuestas, opcional
+                 Caché de respuestas, por defecto una caché en memoria
+             limitador: LimitadorTokens, opcional
+                 Limitador de peticiones, por defecto los límites de la versión
+                 gratuita con el estado compartido en la caché
+             timeout: float, opcional
+                 Segundos máximos de espera por petición
+             conexiones: int, opcional
+                 Tamaño del grupo de conexiones reutilizables
+        """
+        self.api_key = api_key if api_key is not None else os.environ.get('HOLIDAYS_API_KEY')
+        self.url = url
+        self.cache = cache if cache is not None else CacheRespuestas(':memory:')
+        self.limitador = limitador if limitador is not None else LimitadorTokens(cache=self.cache)
+        self.timeout = timeout
+        self.peticiones = 0
+        self._sesion = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexiones)
+        self._sesion.mount('http://', adaptador)
+        self._sesion.mount('https://', adaptador)
+
+    def consultar(self, fecha):
+        """
+        Devuelve la lista de feriados que la API reporta para la fecha
+
+         Parámetros
+         ----------
+             fecha: datetime.date
+                 Fecha consultada
+
+         RETORNA
+         -------
+             Lista (posiblemente vacía) de feriados en formato JSON de la API
+
+         Errores
+         -------
+             requests.HTTPError
+                 Si falta la clave de la API o la respuesta no es válida
+        """
+        feriados = self.cache.obtener(fecha)
+        if feriados is not None:
+            return feriados
+        feriados = self._pedir({'year': fecha.year, 'month': fecha.month, 'day': fecha.day})
+        self.cache.guardar(fecha, feriados)
+        return feriados
+
+    def consultar_anio(self, anio):
+        """
+        Devuelve los feriados que la API reporta para todo un año con una sola
+        petición. La respuesta se guarda en la caché también por fecha, así que
+        las consultas posteriores de cualquier día del año no llegan a la red.
+
+         Parámetros
+         ----------
+             anio: int
+                 Año consultado
+
+         RETORNA
+         -------
+             Diccionario {datetime.date: lista de feriados en formato JSON de la
+             API} con los días del año que tienen algún feriado
+
+         Errores
+         -------
+             requests.HTTPError
+                 Si falta la clave de la API o la respuesta no es válida
+             ValueError
+                 Si un feriado de la respuesta no trae una fecha reconocible
+        """
+        feriados = self.cache.obtener_anio(anio)
+        if feriados is None:
+            feriados = self._pedir({'year': anio})
+            por_fecha = _agrupar_por_fecha(feriados)
+            inicio = datetime.date(anio, 1, 1).toordinal()
+            por_dia = {}
+            for ordinal in range(inicio, datetime.date(anio, 12, 31).toordinal() + 1):
+                fecha = datetime.date.fromordinal(ordinal)
+                por_dia[fecha] = por_fecha.get(fecha, [])
+            self.cache.guardar_anio(anio, feriados, por_dia)
+            return por_fecha
+        return _agrupar_por_fecha(feriados)
+
+    def _pedir(self, consulta):
+        """Hace una petición a la API respetando el limitador y devuelve el JSON"""
+        self.limitador.adquirir()
+        self.peticiones += 1
+        params = {'api_key': self.api_key, 'country': 'EC'}
+        params.update(consulta)
+        response = self._sesion.get(self.url, timeout=self.timeout, params=params)
+        if response.status_code == 401:
+            # Falta la clave de la API
+            raise requests.HTTPError(
+                'Missing API key. Store your key in the enviroment variable HOLIDAYS_API_KEY')
+        response.raise_for_status()
+        return response.json()
+
+    def es_feriado(self, fecha):
+        """
+        Comprueba si la fecha es feriado según la API
+
+         Parámetros
+         ----------
+             fecha: datetime.date
+                 Fecha consultada
+
+         RETORNA
+         -------
+             Devuelve True si la fecha es feriado, de lo contrario, False
+        """
+        return any(f.get('name') not in NOMBRES_IGNORADOS for f in self.consultar(fecha))
+
+    def cerrar(self):
+        """Cierra las conexiones abiertas"""
+        self._sesion.close()
+
+
+def _fecha_feriado(feriado):
+    """
+    Fecha de un feriado de la API: los campos date_year, date_month y date_day
+    o, si faltan, el campo date en formato MM/DD/AAAA
+    """
+    try:
+        if 'date_year' in feriado:
+            return datetime.date(int(feriado['date_year']), int(feriado['date_month']), int(feriado['date_day']))
+        mes, dia, anio = feriado['date'].split('/')
+        return datetime.date(int(anio), int(mes), int(dia))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Feriado sin fecha reconocible: {!r}'.format(feriado)) from None
+
+
+def _agrupar_por_fecha(feriados):
+    """Agrupa una respuesta de la API en {datetime.date: lista de feriados}"""
+    por_fecha = {}
+    for feriado in feriados:
+        por_fecha.setdefault(_fecha_feriado(feriado), []).append(feriado)
+    return por_fecha
+
+
+_cliente = None
+_cliente_lock = threading.Lock()
+
+
+def cliente_por_defecto():
+    """
+    Devuelve el cliente compartido por el proceso. Las respuestas y el estado
+    del limitador de peticiones se guardan en el archivo indicado por la
+    variable de entorno HOLIDAYS_API_CACHE o en
+    ~/.cache/acreditate/feriados.sqlite3, así que todos los procesos que usan
+    el mismo archivo respetan juntos los límites de la API
+    """
+    global _cliente
+    with _cliente_lock:
+        if _cliente is None:
+            ruta = os.environ.get('HOLIDAYS_API_CACHE') or os.path.join(
+                os.path.expanduser('~'), '.cache', 'acreditate', 'feriados.sqlite3')
+            _cliente = ClienteFeriados(cache=CacheRespuestas(ruta))
+        return _cliente
+
+
+def _olvidar_cliente():
+    """Tras un fork el hijo abre su propia conexión al archivo compartido en vez de heredar la del padre"""
+    global _cliente, _cliente_lock
+    _cliente = None
+    _cliente_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_olvidar_cliente)
@@ -0,0 +1,91 @@
+import asyncio
+
+from .api_feriados import cliente_por_defecto
+
+
+class ConsultorAsincrono:
+    """
+    Consultas asíncronas de feriados a la API con fusión de peticiones: las
+    consultas concurrentes de una misma fecha comparten una única llamada en
+    curso. Las llamadas se ejecutan en hilos con el ClienteFeriados, que
+    mantiene la caché en disco y el límite de peticiones de la API.
+    ...
+
+     ATRIBUTOS
+     -----------
+             cliente: ClienteFeriados
+                 Cliente de la API que resuelve cada fecha
+             concurrencia: int
+                 Número máximo de llamadas simultáneas al cliente
+             fusionadas: int
+                 Consultas que se resolvieron esperando una llamada ya en curso
+
+    Métodos
+    -------
+     es_feriado(self, fecha):
+         Corrutina que devuelve True si la fecha es feriado según la API
+    """
+
+    def __init__(self, cliente=None, concurrencia=8):
+        """
+        Construye todos los atributos necesarios para el consultor
+
+         Parámetros
+         ----------
+             cliente: ClienteFeriados, opcional
+                 Cliente de la API, por defecto el cliente compartido del proceso
+             concurrencia: int, opcional
+                 Número máximo de llamadas simultáneas al cliente
+        """
+        self.cliente = cliente
+        self.concurrencia = concurrencia
+        self.fusionadas = 0
+        self._loop = None
+        self._semaforo = None
+        self._en_curso = {}
+
+    def _preparar(self):
+        """Asocia el semáforo y las llamadas en curso al bucle de eventos actual"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._semaforo = asyncio.Semaphore(self.concurrencia)
+            self._en_curso = {}
+        if self.cliente is None:
+            self.cliente = cliente_por_defecto()
+
+    async def es_feriado(self, fecha):
+        """
+        Comprueba si la fecha es feriado según la API
+
+         Parámetros
+         ----------
+             fecha: datetime.date
+                 Fecha consultada
+
+         RETORNA
+         -------
+             Devuelve True si la fecha es feriado, de lo contrario, False
+        """
+        self._preparar()
+        tarea = self._en_curso.get(fecha)
+        if tarea is not None:
+            self.fusionadas += 1
+            return await asyncio.shield(tarea)
+        tarea = asyncio.ensure_future(self._consultar(fecha))
+        self._en_curso[fecha] = tarea
+        tarea.add_done_callback(lambda _: self._en_curso.pop(fecha, None))
+        return await asyncio.shield(tarea)
+
+    async def _consultar(self, fecha):
+        """Ejecuta la consulta bloqueante del cliente en un hilo"""
+        async with self._semaforo:
+            return await asyncio.to_thread(self.cliente.es_feriado, fecha)
+
+
+_consultor = ConsultorAsincrono()
+
+
+def consultor_por_defecto():
+    """Devuelve el consultor asíncrono compartido por el proceso"""
+    return _consultor
@@ -0,0 +1,184 @@
+import threading
+from collections import OrderedDict
+
+from .reglas_feriados import reglas_ecuador
+
+
+class CacheCalendarios:
+    """
+    Caché de calendarios de feriados compartida por todo el proceso, indexada
+    por (año, provincia). Cada calendario se genera una sola vez con
+    la tabla de reglas de HolidayEcuador y luego las consultas son búsquedas
+    en un diccionario. La memoria se limita con desalojo LRU.
+    ...
+
+     ATRIBUTOS
+     -----------
+             max_calendarios: int
+                 Número máximo de calendarios (año, provincia) que se conservan
+             aciertos: int
+                 Consultas resueltas con un calendario ya generado
+             fallos: int
+                 Consultas que obligaron a generar un calendario
+             desalojos: int
+                 Calendarios descartados por superar max_calendarios
+
+    Métodos
+    -------
+     calendario(self, anio, prov):
+         Devuelve el diccionario {fecha: nombre} de los feriados del año
+     es_feriado(self, fecha, prov):
+         Devuelve True si la fecha es feriado en la provincia
+     precargar(self, anio_inicio, anio_fin, prov):
+         Genera en una sola pasada los calendarios de un rango de años
+     estadisticas(self):
+         Devuelve los contadores de aciertos, fallos y desalojos
+     limpiar(self):
+         Vacía la caché y reinicia los contadores
+    """
+
+    def __init__(self, max_calendarios=64, generador=None):
+        """
+        Construye todos los atributos necesarios para la caché
+
+         Parámetros
+         ----------
+             max_calendarios: int, opcional
+                 Número máximo de calendarios que se conservan en memoria
+             generador: callable, opcional
+                 Función (anio, prov) -> {datetime.date: nombre}. Por defecto
+                 se usa la tabla de reglas de HolidayEcuador
+        """
+        if max_calendarios < 1:
+            raise ValueError('max_calendarios debe ser mayor que cero')
+        self.max_calendarios = max_calendarios
+        self._generador = generador or _generar_reglas
+        self._calendarios = OrderedDict()
+        self._lock = threading.Lock()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def calendario(self, anio, prov='EC-P'):
+        """
+        Devuelve los feriados de un año y provincia, generándolos si no están en caché
+
+         Parámetros
+         ----------
+             anio: int
+                 Año del calendario
+             prov: str, opcional
+                 Código de provincia según ISO3166-2
+
+         RETORNA
+         -------
+             Diccionario {datetime.date: nombre} que no debe modificarse
+        """
+        clave = (anio, prov)
+        with self._lock:
+            feriados = self._calendarios.get(clave)
+            if feriados is not None:
+                self._calendarios.move_to_end(clave)
+                self.aciertos += 1
+                return feriados
+            self.fallos += 1
+        # Se genera fuera del bloqueo para no detener a los demás hilos
+        feriados = self._generador(anio, prov)
+        with self._lock:
+            self._calendarios[clave] = feriados
+            self._calendarios.move_to_end(clave)
+            while len(self._calendarios) > self.max_calendarios:
+                self._calendarios.popitem(last=False)
+                self.desalojos += 1
+        return feriados
+
+    def precargar(self, anio_inicio, anio_fin, prov='EC-P'):
+        """
+        Genera en una sola pasada vectorizada los calendarios de los años
+        [anio_inicio, anio_fin] que aún no están en caché. Solo se usa con el
+        generador por defecto.
+
+         Parámetros
+         ----------
+             anio_inicio, anio_fin: int
+                 Primer y último año (incluidos)
+             prov: str, opcional
+                 Código de provincia según ISO3166-2
+        """
+        if self._generador is not _generar_reglas:
+            for anio in range(anio_inicio, anio_fin + 1):
+                self.calendario(anio, prov)
+            return
+        generados = reglas_ecuador.calendarios(anio_inicio, anio_fin, prov)
+        with self._lock:
+            for anio, feriados in generados.items():
+                if (anio, prov) not in self._calendarios:
+                    self._calendarios[(anio, prov)] = feriados
+            while len(self._calendarios) > self.max_calendarios:
+                self._calendarios.popitem(last=False)
+                self.desalojos += 1
+
+    def es_feriado(self, fecha, prov='EC-P'):
+        """
+        Comprueba si una fecha es feriado
+
+         Parámetros
+         ----------
+             fecha: datetime.date
+                 Fecha que se comprobará
+             prov: str, opcional
+                 Código de provincia según ISO3166-2
+
+         RETORNA
+         -------
+             Devuelve True si la fecha es feriado, de lo contrario, False
+        """
+        return fecha in self.calendario(fecha.year, prov)
+
+    def estadisticas(self):
+        """Devuelve los contadores de uso de la caché"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'calendarios': len(self._calendarios),
+                'max_calendarios': self.max_calendarios,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+            }
+
+    def limpiar(self):
+        """Vacía la caché y reinicia los contadores"""
+        with self._lock:
+            self._calendarios.clear()
+            self.aciertos = self.fallos = self.desalojos = 0
+        cambiaron_feriados()
+
+
+def _generar_reglas(anio, prov):
+    """Genera los feriados de un año con la tabla de reglas de HolidayEcuador"""
+    return reglas_ecuador.anio(anio, prov)
+
+
+# Caché compartida por todo el proceso
+calendarios = CacheCalendarios()
+
+_version_feriados = 0
+_version_lock = threading.Lock()
+
+
+def cambiaron_feriados():
+    """
+    Registra que cambiaron los datos de feriados sin conexión (tabla de días,
+    instantánea o calendarios), para que se descarten los resultados que
+    dependen de ellos
+    """
+    global _version_feriados
+    with _version_lock:
+        _version_feriados += 1
+
+
+def version_feriados():
+    """Número que cambia cada vez que cambian los datos de feriados sin conexión"""
+    return _version_feriados
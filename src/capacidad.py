@@ -0,0 +1,154 @@
+import csv
+import datetime
+
+from .Acreditate import _es_feriado_sin_conexion
+from .horario import MINUTOS_DIA, compilar_planes, horario_activo
+
+
+class MatrizCapacidad:
+    """
+    Matriz densa (día x franja horaria x último dígito de cédula) con los
+    minutos de cada franja en los que ese dígito puede cobrar, es decir, en
+    los que evaluar() devuelve True. Un valor mayor que cero significa que
+    hay al menos un minuto de la franja en el que puede cobrar.
+    ...
+
+     ATRIBUTOS
+     -----------
+             fechas: numpy.ndarray de datetime64[D]
+                 Días de la matriz, en orden
+             franjas: numpy.ndarray de int
+                 Minuto del día en que comienza cada franja
+             intervalo: int
+                 Duración de cada franja en minutos
+             minutos: numpy.ndarray de uint16 (días x franjas x 10)
+                 Minutos en que cada dígito puede cobrar en cada franja
+             permitido: numpy.ndarray de bool (días x franjas x 10)
+                 Franjas en las que cada dígito puede cobrar en algún minuto
+
+    Métodos
+    -------
+     a_csv(self, salida):
+         Escribe la matriz en formato CSV, una fila por día y franja
+     guardar(self, ruta):
+         Guarda la matriz en un archivo .npz de numpy
+     cargar(cls, ruta):
+         Lee una matriz guardada con guardar
+    """
+    __slots__ = ('fechas', 'franjas', 'intervalo', 'minutos')
+
+    def __init__(self, fechas, franjas, intervalo, minutos):
+        self.fechas = fechas
+        self.franjas = franjas
+        self.intervalo = intervalo
+        self.minutos = minutos
+
+    @property
+    def permitido(self):
+        """Matriz booleana (días x franjas x 10) de franjas en las que cada dígito puede cobrar"""
+        return self.minutos > 0
+
+    def a_csv(self, salida):
+        """
+        Escribe la matriz en formato CSV con las columnas fecha, inicio, fin y
+        digito_0 ... digito_9 (minutos de la franja en que cada dígito puede cobrar)
+
+         Parámetros
+         ----------
+             salida: archivo de texto
+        """
+        escritor = csv.writer(salida, lineterminator='\n')
+        escritor.writerow(['fecha', 'inicio', 'fin'] + ['digito_{}'.format(d) for d in range(10)])
+        horas = ['{:02d}:{:02d}'.format(m // 60, m % 60) for m in self.franjas.tolist()]
+        finales = ['{:02d}:{:02d}'.format((m + self.intervalo - 1) // 60, (m + self.intervalo - 1) % 60)
+                   for m in self.franjas.tolist()]
+        for fecha, filas in zip(self.fechas.astype(datetime.date).tolist(), self.minutos.tolist()):
+            texto = fecha.strftime('%Y/%m/%d')
+            escritor.writerows([texto, inicio, fin] + fila for inicio, fin, fila in zip(horas, finales, filas))
+
+    def guardar(self, ruta):
+        """Guarda fechas, franjas, intervalo y minutos en un archivo .npz de numpy"""
+        import numpy as np
+
+        with open(ruta, 'wb') as archivo:
+            np.savez_compressed(archivo, fechas=self.fechas, franjas=self.franjas,
+                                intervalo=np.array(self.intervalo), minutos=self.minutos)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Lee una matriz guardada con guardar"""
+        import numpy as np
+
+        with np.load(ruta) as datos:
+            return cls(datos['fechas'], datos['franjas'], int(datos['intervalo']), datos['minutos'])
+
+
+def matriz_capacidad(inicio, fin, intervalo=60, horario=None):
+    """
+    Calcula en una sola pasada vectorizada cuántos minutos de cada franja
+    horaria de cada día de un rango puede cobrar cada dígito final de cédula
+    (los minutos en que evaluar() devuelve True), a partir
+    de las restricciones por día, las ventanas laborables y los feriados sin
+    conexión (tabla de días, instantánea o HolidayEcuador)
+
+     Parámetros
+     ----------
+         inicio, fin: datetime.date
+             Primer y último día (incluidos)
+         intervalo: int, opcional
+             Duración de cada franja en minutos; debe dividir exactamente el día
+         horario: Horario, opcional
+             Horario de ventanas y restricciones, por defecto el horario en uso
+
+     RETORNA
+     -------
+         MatrizCapacidad
+
+     Errores
+     -------
+         ValueError
+             Si fin es anterior a inicio o el intervalo no divide el día
+    """
+    import numpy as np
+
+    if fin < inicio:
+        raise ValueError('fin debe ser mayor o igual que inicio')
+    if not 0 < intervalo <= MINUTOS_DIA or MINUTOS_DIA % intervalo:
+        raise ValueError('El intervalo debe dividir exactamente los {} minutos del día'.format(MINUTOS_DIA))
+    if horario is None:
+        horario = horario_activo()
+
+    ordinales = range(inicio.toordinal(), fin.toordinal() + 1)
+    indices, mapas, restringidos = compilar_planes([horario.plan(o, 'EC-P') for o in ordinales])
+    feriado = np.array([_es_feriado_sin_conexion(o) for o in ordinales], dtype=bool)
+
+    # Minutos laborables de cada franja para cada plan distinto: (planes x franjas)
+    laborables = mapas.reshape(len(mapas), MINUTOS_DIA // intervalo, intervalo).sum(axis=2, dtype=np.uint16)
+    # Un dígito restringido no puede cobrar en los minutos laborables; el resto
+    # de la franja sí. (planes x franjas x 10), luego un plano por día
+    por_plan = intervalo - laborables[:, :, None] * restringidos[:, None, :].astype(np.uint16)
+    minutos = por_plan[indices]
+    # En los feriados todos pueden cobrar durante toda la franja
+    minutos[feriado] = intervalo
+
+    fechas = np.arange(np.datetime64(inicio, 'D'), np.datetime64(fin, 'D') + 1)
+    franjas = np.arange(0, MINUTOS_DIA, intervalo)
+    return MatrizCapacidad(fechas, franjas, intervalo, minutos)
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description='Calcula la matriz de capacidad por día, franja y dígito')
+    parser.add_argument('inicio', help='primer día, AAAA/MM/DD')
+    parser.add_argument('fin', help='último día, AAAA/MM/DD')
+    parser.add_argument('--intervalo', type=int, default=60, help='minutos por franja')
+    parser.add_argument('--npz', help='guardar en un archivo .npz de numpy en lugar de CSV')
+    args = parser.parse_args()
+    desde, hasta = (datetime.datetime.strptime(f, '%Y/%m/%d').date() for f in (args.inicio, args.fin))
+    matriz = matriz_capacidad(desde, hasta, args.intervalo)
+    if args.npz:
+        matriz.guardar(args.npz)
+    else:
+        matriz.a_csv(sys.stdout)
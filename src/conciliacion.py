@@ -0,0 +1,266 @@
+import datetime
+import threading
+from collections import namedtuple
+
+from .instantanea import ORIGEN_CONCILIADO, Instantanea, activar_instantanea, instantanea_activa
+
+# Una vez al día se comprueba si hay años nuevos o respuestas expiradas; la
+# API solo se consulta cuando la caché de respuestas ya no tiene el año
+INTERVALO_CONCILIACION = 24 * 3600
+
+Diferencias = namedtuple('Diferencias', ['anio', 'coinciden', 'solo_api', 'solo_reglas'])
+Diferencias.__doc__ = """
+Resultado de comparar los feriados de un año según la API y según HolidayEcuador
+
+ ATRIBUTOS
+ -----------
+         anio: int
+             Año comparado
+         coinciden: list de datetime.date
+             Días que ambas fuentes marcan como feriado
+         solo_api: dict
+             {datetime.date: nombre} de los feriados que solo reporta la API
+         solo_reglas: dict
+             {datetime.date: nombre} de los feriados que solo genera HolidayEcuador
+"""
+
+
+def feriados_api(cliente, anio):
+    """
+    Feriados de un año según la API, con una sola petición por año
+
+     Parámetros
+     ----------
+         cliente: ClienteFeriados
+             Cliente de la API (o de un servidor local que la imite)
+         anio: int
+
+     RETORNA
+     -------
+         {datetime.date: nombre}, sin los feriados de NOMBRES_IGNORADOS
+    """
+    from .api_feriados import NOMBRES_IGNORADOS
+
+    feriados = {}
+    for fecha, lista in cliente.consultar_anio(anio).items():
+        nombres = [f.get('name') or '' for f in lista if f.get('name') not in NOMBRES_IGNORADOS]
+        if nombres and fecha.year == anio:
+            feriados[fecha] = nombres[0]
+    return feriados
+
+
+def comparar(anio, api, reglas):
+    """
+    Compara los feriados de un año según la API y según las reglas
+
+     Parámetros
+     ----------
+         anio: int
+         api, reglas: dict
+             {datetime.date: nombre} de cada fuente
+
+     RETORNA
+     -------
+         Diferencias
+    """
+    return Diferencias(anio, sorted(api.keys() & reglas.keys()),
+                       {f: n for f, n in sorted(api.items()) if f not in reglas},
+                       {f: n for f, n in sorted(reglas.items()) if f not in api})
+
+
+def conciliar(anios, cliente=None, prov='EC-P', revision=0):
+    """
+    Descarga los feriados de cada año desde la API y los fusiona con los de
+    HolidayEcuador. El calendario resultante marca como feriado todo día que
+    cualquiera de las dos fuentes marque; si ambas coinciden se conserva el
+    nombre de las reglas.
+
+     Parámetros
+     ----------
+         anios: iterable de int
+             Años consecutivos a conciliar
+         cliente: ClienteFeriados, opcional
+             Cliente de la API, por defecto el compartido del proceso
+         prov: str, opcional
+             Código de provincia según ISO3166-2
+         revision: int, opcional
+             Número de revisión del calendario resultante
+
+     RETORNA
+     -------
+         Tupla (Instantanea con origen 'conciliado', lista de Diferencias por año)
+
+     Errores
+     -------
+         ValueError
+             Si no hay años o no son consecutivos
+         requests.HTTPError, RuntimeError
+             Si la API falla o se agotó su cupo de peticiones
+    """
+    from .feriados_ecuador import HolidayEcuador
+
+    anios = sorted(set(anios))
+    if not anios:
+        raise ValueError('Debe indicar al menos un año')
+    if anios[-1] - anios[0] + 1 != len(anios):
+        raise ValueError('Los años deben ser consecutivos')
+    if cliente is None:
+        from .api_feriados import cliente_por_defecto
+        cliente = cliente_por_defecto()
+
+    fusion, diferencias = {}, []
+    for anio in anios:
+        api = feriados_api(cliente, anio)
+        reglas = dict(HolidayEcuador(prov=prov, years=anio))
+        diferencias.append(comparar(anio, api, reglas))
+        fusion.update(api)
+        fusion.update(reglas)
+    instantanea = Instantanea.desde_feriados(fusion, datetime.date(anios[0], 1, 1), datetime.date(anios[-1], 12, 31),
+                                             prov, ORIGEN_CONCILIADO, revision)
+    return instantanea, diferencias
+
+
+class TrabajoConciliacion:
+    """
+    Trabajo en segundo plano que mantiene un calendario conciliado (API y
+    HolidayEcuador) para el año en curso y los siguientes, lo guarda en disco
+    y lo activa. Con el calendario activo, PersonaAcreditada resuelve también
+    las evaluaciones online sin llamadas a la red: la API se consulta una vez
+    por año (y por tiempo de vida de la caché de respuestas).
+    ...
+
+     ATRIBUTOS
+     -----------
+             cliente: ClienteFeriados o None
+                 Cliente de la API, None para usar el compartido del proceso
+             ruta: str o None
+                 Archivo donde se guarda el calendario conciliado
+             anios_adelante: int
+                 Años posteriores al actual que también se concilian
+             intervalo: float
+                 Segundos entre ejecuciones
+             diferencias: list de Diferencias
+                 Resultado de la última comparación
+             error: Exception o None
+                 Error de la última ejecución; el calendario anterior sigue activo
+
+    Métodos
+    -------
+     ejecutar(self):
+         Concilia los años una vez y activa el resultado
+     iniciar(self):
+         Arranca el hilo que ejecuta el trabajo periódicamente
+     detener(self):
+         Detiene el hilo
+    """
+
+    def __init__(self, cliente=None, ruta=None, prov='EC-P', anios_adelante=1,
+                 intervalo=INTERVALO_CONCILIACION, hoy=datetime.date.today):
+        """
+        Construye el trabajo y, si ruta ya contiene un calendario conciliado,
+        lo activa de inmediato
+
+         Parámetros
+         ----------
+             cliente: ClienteFeriados, opcional
+                 Cliente de la API (o de un servidor local que la imite)
+             ruta: str, opcional
+                 Archivo donde se guarda el calendario conciliado
+             prov: str, opcional
+                 Código de provincia según ISO3166-2
+             anios_adelante: int, opcional
+                 Años posteriores al actual que también se concilian
+             intervalo: float, opcional
+                 Segundos entre ejecuciones
+             hoy: callable, opcional
+                 Función que devuelve la fecha actual
+        """
+        self.cliente = cliente
+        self.ruta = ruta
+        self.prov = prov
+        self.anios_adelante = anios_adelante
+        self.intervalo = intervalo
+        self.diferencias = []
+        self.error = None
+        self._hoy = hoy
+        self._detener = threading.Event()
+        self._hilo = None
+        if ruta is not None:
+            try:
+                guardada = Instantanea.cargar(ruta)
+            except (OSError, ValueError):
+                guardada = None
+            if guardada is not None and guardada.origen == 'conciliado' and guardada.prov == prov:
+                activar_instantanea(guardada)
+
+    def ejecutar(self):
+        """
+        Concilia el año actual y los siguientes, y activa el calendario
+        resultante. La revisión solo aumenta si los feriados cambiaron respecto
+        del calendario activo; si no cambiaron no se invalida ninguna caché.
+
+         RETORNA
+         -------
+             La Instantanea activa, o None si la conciliación falló y no había
+             calendario conciliado previo
+        """
+        actual = instantanea_activa()
+        if actual is not None and (actual.origen != 'conciliado' or actual.prov != self.prov):
+            actual = None
+        anio = self._hoy().year
+        anios = range(anio, anio + self.anios_adelante + 1)
+        try:
+            revision = actual.revision if actual is not None else 0
+            nueva, self.diferencias = conciliar(anios, self.cliente, self.prov, revision)
+        except Exception as error:  # el trabajo no debe morir por un fallo de la API
+            self.error = error
+            return actual
+        self.error = None
+        if nueva == actual:
+            return actual
+        if actual is not None:
+            nueva.revision = actual.revision + 1
+        if self.ruta is not None:
+            nueva.guardar(self.ruta)
+        return activar_instantanea(nueva)
+
+    def _bucle(self):
+        while not self._detener.is_set():
+            self.ejecutar()
+            self._detener.wait(self.intervalo)
+
+    def iniciar(self):
+        """Arranca el hilo que ejecuta el trabajo cada intervalo segundos"""
+        if self._hilo is None or not self._hilo.is_alive():
+            self._detener.clear()
+            self._hilo = threading.Thread(target=self._bucle, name='conciliacion-feriados', daemon=True)
+            self._hilo.start()
+        return self
+
+    def detener(self, espera=None):
+        """Detiene el hilo y espera a que termine"""
+        self._detener.set()
+        if self._hilo is not None:
+            self._hilo.join(espera)
+            self._hilo = None
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Concilia los feriados de la API con HolidayEcuador')
+    parser.add_argument('ruta', help='archivo de destino de la instantánea conciliada')
+    parser.add_argument('anios', nargs=2, type=int, metavar=('INICIO', 'FIN'), help='años (incluidos)')
+    parser.add_argument('--prov', default='EC-P', help='código de provincia ISO3166-2')
+    parser.add_argument('--revision', type=int, default=0)
+    args = parser.parse_args()
+    calendario, comparaciones = conciliar(range(args.anios[0], args.anios[1] + 1), prov=args.prov,
+                                          revision=args.revision)
+    calendario.guardar(args.ruta)
+    for comparacion in comparaciones:
+        print('{}: {} coinciden, {} solo en la API, {} solo en las reglas'.format(
+            comparacion.anio, len(comparacion.coinciden), len(comparacion.solo_api), len(comparacion.solo_reglas)))
+        for fecha, nombre in comparacion.solo_api.items():
+            print('  API    {} {}'.format(fecha.isoformat(), nombre))
+        for fecha, nombre in comparacion.solo_reglas.items():
+            print('  reglas {} {}'.format(fecha.isoformat(), nombre))
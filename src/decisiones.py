@@ -0,0 +1,180 @@
+import threading
+from collections import OrderedDict
+
+from . import calendario as _calendario
+from . import horario as _horario
+
+
+def clave(digito, ordinal, laborable):
+    """
+    Empaqueta en un solo entero lo único de lo que depende una decisión sin
+    conexión: el último dígito de la cédula (bits 0-3), si la hora cae en una
+    ventana laborable (bit 4) y la fecha como ordinal (bits 5 en adelante)
+
+     Parámetros
+     ----------
+         digito: int
+             Último dígito de la cédula
+         ordinal: int
+             Fecha como ordinal (datetime.date.toordinal)
+         laborable: bool
+             True si la hora está dentro de una ventana laborable
+
+     RETORNA
+     -------
+         int
+    """
+    return ordinal << 5 | laborable << 4 | digito
+
+
+def versiones_vigentes():
+    """
+    Versiones del horario en uso y de los datos de feriados sin conexión, de
+    las que dependen las decisiones guardadas. Se toman antes de calcular una
+    decisión y se pasan a MemoDecisiones.guardar.
+    """
+    return _horario.version(), _calendario.version_feriados()
+
+
+class MemoDecisiones:
+    """
+    Caché acotada de decisiones de evaluar() sin conexión, indexada por
+    clave(digito, fecha, laborable), con desalojo LRU. Se vacía sola cuando
+    cambia el horario en uso (horario.version) o los datos de feriados sin
+    conexión (calendario.version_feriados), y también puede invalidarse de
+    forma explícita.
+    ...
+
+     ATRIBUTOS
+     -----------
+             max_decisiones: int
+                 Número máximo de decisiones que se conservan
+             aciertos: int
+                 Consultas resueltas con una decisión guardada
+             fallos: int
+                 Consultas sin decisión guardada
+             desalojos: int
+                 Decisiones descartadas por superar max_decisiones
+             invalidaciones: int
+                 Veces que se vació la caché por cambios de horario o feriados
+
+    Métodos
+    -------
+     obtener(self, clave):
+         Devuelve la decisión guardada o None
+     guardar(self, clave, decision, versiones=None):
+         Guarda una decisión si se calculó con los datos vigentes
+     invalidar(self):
+         Descarta todas las decisiones
+     estadisticas(self):
+         Devuelve los contadores de aciertos, fallos y desalojos
+     limpiar(self):
+         Vacía la caché y reinicia los contadores
+    """
+
+    def __init__(self, max_decisiones=65536):
+        """
+        Construye todos los atributos necesarios para la caché
+
+         Parámetros
+         ----------
+             max_decisiones: int, opcional
+                 Número máximo de decisiones que se conservan en memoria
+        """
+        if max_decisiones < 1:
+            raise ValueError('max_decisiones debe ser mayor que cero')
+        self.max_decisiones = max_decisiones
+        self._decisiones = OrderedDict()
+        self._lock = threading.Lock()
+        self._versiones = versiones_vigentes()
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+        self.invalidaciones = 0
+
+    def _vigente(self):
+        """Vacía la caché si cambió el horario o los feriados"""
+        versiones = versiones_vigentes()
+        if versiones != self._versiones:
+            with self._lock:
+                if versiones != self._versiones:
+                    self._versiones = versiones
+                    self._decisiones.clear()
+                    self.invalidaciones += 1
+
+    def obtener(self, clave):
+        """
+        Devuelve la decisión guardada para la clave. Las lecturas no toman el
+        bloqueo: cada operación sobre el OrderedDict es atómica y los contadores
+        son solo estadísticos.
+
+         RETORNA
+         -------
+             Tupla (resultado, motivo) o None si no está guardada
+        """
+        self._vigente()
+        decision = self._decisiones.get(clave)
+        if decision is None:
+            self.fallos += 1
+            return None
+        try:
+            self._decisiones.move_to_end(clave)
+        except KeyError:  # desalojada por otro hilo entre get y move_to_end
+            pass
+        self.aciertos += 1
+        return decision
+
+    def guardar(self, clave, decision, versiones=None):
+        """
+        Guarda la decisión (resultado, motivo) de la clave
+
+         Parámetros
+         ----------
+             clave: int
+                 Resultado de clave(digito, ordinal, laborable)
+             decision: tupla
+                 (resultado, motivo)
+             versiones: tupla, opcional
+                 Resultado de versiones_vigentes() tomado antes de calcular la
+                 decisión; si el horario o los feriados cambiaron desde entonces
+                 la decisión puede estar desactualizada y no se guarda
+        """
+        self._vigente()
+        with self._lock:
+            if versiones is not None and versiones != self._versiones:
+                return
+            self._decisiones[clave] = decision
+            self._decisiones.move_to_end(clave)
+            if len(self._decisiones) > self.max_decisiones:
+                self._decisiones.popitem(last=False)
+                self.desalojos += 1
+
+    def invalidar(self):
+        """Descarta todas las decisiones, por ejemplo tras cambiar la fuente de feriados"""
+        with self._lock:
+            self._decisiones.clear()
+            self.invalidaciones += 1
+
+    def estadisticas(self):
+        """Devuelve los contadores de uso de la caché"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'decisiones': len(self._decisiones),
+                'max_decisiones': self.max_decisiones,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'invalidaciones': self.invalidaciones,
+                'tasa_aciertos': self.aciertos / consultas if consultas else 0.0,
+            }
+
+    def limpiar(self):
+        """Vacía la caché y reinicia los contadores"""
+        with self._lock:
+            self._decisiones.clear()
+            self.aciertos = self.fallos = self.desalojos = self.invalidaciones = 0
+
+
+# Caché de decisiones compartida por todo el proceso
+memo_decisiones = MemoDecisiones()
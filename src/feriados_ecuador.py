@@ -0,0 +1,49 @@
+from holidays.holiday_base import HolidayBase
+
+from .reglas_feriados import reglas_ecuador
+
+
+class HolidayEcuador(HolidayBase):
+    """
+    Una clase para representar un feriado en Ecuador por provincia (HolidayEcuador)
+    Su objetivo es determinar si un
+    fecha específica es u nas vacaciones lo más rápido y flexible posible.
+    https://www.turismo.gob.ec/wp-content/uploads/2020/03/CALENDARIO-DE-FERIADOS.pdf
+    ...
+    Atributos (Hereda la clase HolidayBase)
+    ----------
+    prov: str
+        código de provincia según ISO3166-2
+    Métodos
+    -------
+    __init__(self, plate, fecha, tiempo, online=False):
+        Construye todos los atributos necesarios para el objeto HolidayEcuador.
+    _poblar(uno mismo, año):
+        Devoluciones si una fecha es feriado o no
+    """     
+    # Códigos ISO 3166-2 para las principales subdivisiones,
+    # provincias llamadas
+    # https://es.wikipedia.org/wiki/ISO_3166-2:EC
+    PROVINCES = ["EC-P"]  # TODO añadir más provincias
+
+    def __init__(self, **kwargs):
+        """
+        Construye todos los atributos necesarios para el objeto HolidayEcuador
+        """         
+        self.country = "ECU"
+        self.prov = kwargs.pop("prov", "ON")
+        HolidayBase.__init__(self, **kwargs)
+
+    def _populate(self, year):
+        """
+        Genera los feriados del año a partir de la tabla de reglas compilada
+        (ver src/reglas_feriados.py: fechas fijas, relativas a Pascua y
+        trasladables según la reforma a la LOSEP)
+        
+         Parámetros
+         ----------
+             año: str
+                 año de una fecha
+        """
+        for fecha, nombre in reglas_ecuador.anio(year, self.prov).items():
+            self[fecha] = nombre
@@ -0,0 +1,211 @@
+import argparse
+import csv
+import io
+import json
+import sys
+
+from .Acreditate import evaluador, evaluador_online
+
+# Tamaño de los búferes de lectura y escritura
+BUFER = 1 << 20
+
+CAMPOS = ['cedula', 'fecha', 'hora']
+# linea solo tiene valor en las filas con error; es el número de línea de la entrada
+CAMPOS_SALIDA = CAMPOS + ['resultado', 'motivo', 'error', 'linea']
+
+
+def _filas_jsonl(lineas, primera_linea=1):
+    """Genera (numero, cedula, fecha, hora, error) a partir de líneas JSONL"""
+    for numero, linea in enumerate(lineas, primera_linea):
+        if not linea.strip():
+            continue
+        try:
+            registro = json.loads(linea)
+            yield numero, str(registro['cedula']), str(registro['fecha']), str(registro['hora']), None
+        except (ValueError, KeyError, TypeError) as error:
+            yield numero, None, None, None, 'Registro JSON inválido: {}'.format(error)
+
+
+def _filas_csv(lineas, primera_linea=1):
+    """Genera (numero, cedula, fecha, hora, error) a partir de líneas CSV con o sin cabecera"""
+    for numero, campos in enumerate(csv.reader(lineas), primera_linea):
+        if not campos:
+            continue
+        if numero == 1 and [c.strip().lower() for c in campos] == CAMPOS:
+            continue
+        if len(campos) != 3:
+            yield numero, None, None, None, 'Se esperaban 3 columnas (cedula, fecha, hora)'
+            continue
+        yield (numero,) + tuple(c.strip() for c in campos) + (None,)
+
+
+def decidir(cedula, fecha, hora, online=False):
+    """
+    Evalúa una fila y devuelve la decisión con su motivo
+
+     Parámetros
+     ----------
+         cedula, fecha, hora: str
+             Datos de la persona con el formato de PersonaAcreditada
+         online: booleano, opcional
+             si en línea == Verdadero, se utilizará la API de días festivos abstractos
+
+     RETORNA
+     -------
+         Diccionario con cedula, fecha, hora, resultado, motivo y error
+    """
+    decision = {'cedula': cedula, 'fecha': fecha, 'hora': hora,
+                'resultado': None, 'motivo': None, 'error': None}
+    try:
+        decision['resultado'], decision['motivo'] = (evaluador_online if online else evaluador).comprobar_con_motivo(
+            cedula, fecha, hora)
+    except ValueError as error:
+        decision['error'] = str(error)
+    return decision
+
+
+def procesar(entrada, salida, formato='jsonl', online=False, tamano_bloque=10000, cabecera=True, primera_linea=1):
+    """
+    Lee registros de la entrada y escribe una decisión por línea en la salida.
+    Los registros se procesan en bloques, por lo que la memoria usada no depende
+    del tamaño de la entrada. Las filas inválidas se reportan en su línea sin
+    detener el proceso.
+
+     Parámetros
+     ----------
+         entrada: archivo de texto
+             Registros JSONL ({"cedula": ..., "fecha": ..., "hora": ...}) o CSV
+             (cedula,fecha,hora, con cabecera opcional)
+         salida: archivo de texto
+             Destino de las decisiones, en el mismo formato que la entrada; las
+             filas con error incluyen su número de línea en la entrada (linea)
+         formato: str, opcional
+             'jsonl' o 'csv'
+         online: booleano, opcional
+             si en línea == Verdadero, se utilizará la API de días festivos abstractos
+         tamano_bloque: int, opcional
+             Número de filas que se acumulan antes de escribir en la salida
+         cabecera: booleano, opcional
+             Si es Verdadero y el formato es CSV, se escribe la cabecera de la salida
+         primera_linea: int, opcional
+             Número de línea de la primera línea de la entrada, para reportar errores
+             de fragmentos de un archivo mayor
+
+     RETORNA
+     -------
+         Tupla (filas procesadas, filas con error)
+    """
+    if formato not in ('jsonl', 'csv'):
+        raise ValueError('El formato debe ser jsonl o csv')
+    if tamano_bloque < 1:
+        raise ValueError('El tamaño de bloque debe ser mayor que cero')
+    if formato == 'jsonl':
+        filas = _filas_jsonl(entrada, primera_linea)
+    else:
+        filas = _filas_csv(entrada, primera_linea)
+    if formato == 'csv' and cabecera:
+        bufer = io.StringIO()
+        escritor = csv.DictWriter(bufer, CAMPOS_SALIDA, lineterminator='\n')
+        escritor.writeheader()
+        salida.write(bufer.getvalue())
+
+    total = errores = 0
+    bloque = []
+    for numero, cedula, fecha, hora, error in filas:
+        if error is None:
+            decision = decidir(cedula, fecha, hora, online)
+        else:
+            decision = {'cedula': cedula, 'fecha': fecha, 'hora': hora,
+                        'resultado': None, 'motivo': None, 'error': error}
+        total += 1
+        if decision['error'] is not None:
+            errores += 1
+            decision['linea'] = numero
+        bloque.append(decision)
+        if len(bloque) >= tamano_bloque:
+            _escribir(salida, bloque, formato)
+            bloque = []
+    if bloque:
+        _escribir(salida, bloque, formato)
+    return total, errores
+
+
+def _escribir(salida, bloque, formato):
+    """Escribe un bloque de decisiones con una sola operación de escritura"""
+    if formato == 'jsonl':
+        salida.write(''.join(json.dumps(d, ensure_ascii=False) + '\n' for d in bloque))
+    else:
+        bufer = io.StringIO()
+        csv.DictWriter(bufer, CAMPOS_SALIDA, extrasaction='ignore', lineterminator='\n').writerows(bloque)
+        salida.write(bufer.getvalue())
+
+
+def main(argv=None):
+    """
+    Punto de entrada de la línea de comandos:
+
+        python -m src.Acreditate [entrada] [-o salida] [--formato jsonl|csv] [--online] [--bloque N]
+                                 [--procesos N] [--fragmento BYTES] [--instantanea RUTA] [--horario RUTA]
+
+    Sin archivo de entrada se leen los registros de la entrada estándar. Con
+    --procesos y un archivo de entrada, el archivo se evalúa por fragmentos en
+    varios procesos (ver src/paralelo.py). Con --instantanea los feriados sin
+    conexión se toman de una instantánea binaria (ver src/instantanea.py) y con
+    --horario las ventanas y restricciones de un archivo JSON (ver src/horario.py).
+    """
+    parser = argparse.ArgumentParser(
+        prog='python -m src.Acreditate',
+        description='Evalúa registros de cédula, fecha y hora y escribe una decisión por línea')
+    parser.add_argument('entrada', nargs='?', help='archivo JSONL o CSV, por defecto la entrada estándar')
+    parser.add_argument('-o', '--salida', help='archivo de salida, por defecto la salida estándar')
+    parser.add_argument('--formato', choices=['jsonl', 'csv'],
+                        help='formato de la entrada, por defecto según la extensión o jsonl')
+    parser.add_argument('--online', action='store_true', help='consultar los feriados en la API')
+    parser.add_argument('--bloque', type=int, default=10000, help='filas por bloque de escritura')
+    parser.add_argument('--procesos', type=int, default=1, help='procesos de evaluación para archivos de entrada')
+    parser.add_argument('--fragmento', type=int, default=None, help='bytes por fragmento con --procesos')
+    parser.add_argument('--instantanea', help='instantánea de feriados para la evaluación sin conexión')
+    parser.add_argument('--horario', help='archivo JSON con las ventanas y restricciones del horario')
+    args = parser.parse_args(argv)
+
+    if args.instantanea:
+        from .instantanea import activar_instantanea
+        activar_instantanea(args.instantanea)
+    if args.horario:
+        from .horario import activar_horario
+        activar_horario(args.horario)
+
+    formato = args.formato
+    if formato is None:
+        formato = 'csv' if args.entrada and args.entrada.lower().endswith('.csv') else 'jsonl'
+
+    if args.salida:
+        salida = open(args.salida, 'w', encoding='utf-8', newline='', buffering=BUFER)
+    else:
+        salida = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', newline='', write_through=False)
+    entrada = None
+    try:
+        if args.entrada and args.procesos > 1:
+            from .paralelo import TAMANO_FRAGMENTO, procesar_archivo
+            total, errores = procesar_archivo(args.entrada, salida, formato, args.online, args.procesos,
+                                              args.fragmento or TAMANO_FRAGMENTO, args.instantanea, args.horario)
+        else:
+            if args.entrada:
+                entrada = open(args.entrada, 'r', encoding='utf-8', newline='', buffering=BUFER)
+            else:
+                entrada = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+            total, errores = procesar(entrada, salida, formato, args.online, args.bloque)
+    finally:
+        # La entrada y salida estándar se desacoplan en lugar de cerrarse
+        if entrada is not None:
+            if args.entrada:
+                entrada.close()
+            else:
+                entrada.detach()
+        salida.flush()
+        if args.salida:
+            salida.close()
+        else:
+            salida.detach()
+    print('{} registros procesados, {} con error'.format(total, errores), file=sys.stderr)
+    return 0
@@ -0,0 +1,316 @@
+import datetime
+import json
+import threading
+
+# Días de la semana en el orden de datetime.date.weekday()
+DIAS = ["LUNES", "MARTES", "MIERCOLES", "JUEVES", "VIERNES", "SABADO", "DOMINGO"]
+
+# Horas laborables: 07:30 - 11:59 y 13:00 - 16:30
+VENTANAS = [(7 * 60 + 30, 11 * 60 + 59), (13 * 60, 16 * 60 + 30)]
+
+MINUTOS_DIA = 24 * 60
+
+
+def _minutos(valor):
+    """Convierte 'HH:MM' o un entero de minutos en minutos desde la medianoche"""
+    if isinstance(valor, int):
+        minutos = valor
+    else:
+        horas, _, minutos = str(valor).partition(':')
+        minutos = int(horas) * 60 + int(minutos)
+    if not 0 <= minutos < MINUTOS_DIA:
+        raise ValueError('Hora fuera del día: {}'.format(valor))
+    return minutos
+
+
+def _fecha(valor):
+    """Convierte 'AAAA/MM/DD', 'AAAA-MM-DD' o datetime.date en ordinal"""
+    if isinstance(valor, datetime.date):
+        return valor.toordinal()
+    return datetime.date(*map(int, str(valor).replace('-', '/').split('/'))).toordinal()
+
+
+def _por_dia(valor, convertir):
+    """
+    Normaliza un valor que puede darse para todos los días (lista) o por día
+    ({"LUNES": ...}) en una lista de 7 elementos; los días ausentes quedan en None
+    """
+    if valor is None:
+        return [None] * 7
+    if isinstance(valor, dict):
+        desconocidos = set(valor) - set(DIAS)
+        if desconocidos:
+            raise ValueError('Días desconocidos: {}'.format(', '.join(sorted(desconocidos))))
+        return [convertir(valor[dia]) if dia in valor else None for dia in DIAS]
+    return [convertir(valor)] * 7
+
+
+def _ventanas_mapa(mapa):
+    """Devuelve las ventanas (inicio, fin) inclusivas en minutos de un mapa de bits por minuto"""
+    ventanas, minuto = [], 0
+    while mapa >> minuto:
+        if (mapa >> minuto) & 1:
+            inicio = minuto
+            while (mapa >> minuto) & 1:
+                minuto += 1
+            ventanas.append((inicio, minuto - 1))
+        else:
+            minuto += 1
+    return ventanas
+
+
+def _mapa_ventanas(ventanas):
+    """Compila una lista de ventanas (inicio, fin) inclusivas en un mapa de bits por minuto"""
+    mapa = 0
+    for inicio, fin in ventanas:
+        inicio, fin = _minutos(inicio), _minutos(fin)
+        if fin < inicio:
+            raise ValueError('La ventana {}-{} termina antes de empezar'.format(inicio, fin))
+        mapa |= ((1 << (fin - inicio + 1)) - 1) << inicio
+    return mapa
+
+
+def _mascara_digitos(digitos):
+    """Compila una lista de dígitos en una máscara de 10 bits"""
+    mascara = 0
+    for digito in digitos:
+        if not 0 <= int(digito) <= 9:
+            raise ValueError('Dígito inválido: {}'.format(digito))
+        mascara |= 1 << int(digito)
+    return mascara
+
+
+class PlanDia:
+    """
+    Plan compilado de un día: mapa de bits de los minutos laborables y máscara
+    de los dígitos finales de cédula restringidos en ellos. Cada comprobación
+    es O(1). Fuera de las ventanas laborables, y todo el día para los dígitos
+    no restringidos, evaluar() devuelve True: la persona puede cobrar.
+    """
+    __slots__ = ('mapa', 'digitos')
+
+    def __init__(self, mapa, digitos):
+        self.mapa = mapa
+        self.digitos = digitos
+
+    def laborable(self, minuto):
+        """Devuelve True si el minuto del día está dentro de una ventana laborable"""
+        return (self.mapa >> minuto) & 1 == 1
+
+    def restringido(self, digito):
+        """Devuelve True si el dígito final de cédula está restringido en las ventanas laborables del día"""
+        return (self.digitos >> digito) & 1 == 1
+
+    def ventanas(self):
+        """Devuelve las ventanas laborables como lista de (inicio, fin) inclusivos en minutos"""
+        return _ventanas_mapa(self.mapa)
+
+    def turnos(self, digito):
+        """
+        Devuelve las ventanas (inicio, fin) inclusivas en minutos en las que
+        evaluar() devuelve True para el dígito, si el día no es feriado: todo el
+        día si el dígito no está restringido y, si lo está, los minutos fuera
+        de las ventanas laborables
+        """
+        if not self.restringido(digito):
+            return [(0, MINUTOS_DIA - 1)]
+        return _ventanas_mapa(~self.mapa & ((1 << MINUTOS_DIA) - 1))
+
+    def __eq__(self, otro):
+        return isinstance(otro, PlanDia) and (self.mapa, self.digitos) == (otro.mapa, otro.digitos)
+
+    def __hash__(self):
+        return hash((self.mapa, self.digitos))
+
+
+class Horario:
+    """
+    Motor de horarios configurable: ventanas laborables y dígitos restringidos
+    en ellas por día de la semana, con excepciones por provincia y rango de fechas. Las
+    reglas se compilan en un PlanDia por día de la semana y por excepción, de
+    modo que la evaluación solo consulta mapas de bits.
+    ...
+
+     ATRIBUTOS
+     -----------
+             semana: list de PlanDia
+                 Plan de cada día de la semana, 0 = lunes
+
+    Métodos
+    -------
+     desde_dict(cls, datos):
+         Construye un horario a partir de un diccionario (formato JSON)
+     desde_archivo(cls, ruta):
+         Construye un horario a partir de un archivo JSON
+     plan(self, ordinal, prov):
+         Devuelve el PlanDia de una fecha
+    """
+
+    def __init__(self, ventanas=None, digitos=None, excepciones=()):
+        """
+        Compila el horario
+
+         Parámetros
+         ----------
+             ventanas: list o dict, opcional
+                 Ventanas laborables [(inicio, fin), ...] inclusivas, en 'HH:MM' o
+                 minutos, para todos los días o por día ({"LUNES": [...]}).
+                 Por defecto 07:30-11:59 y 13:00-16:30
+             digitos: dict o list, opcional
+                 Dígitos restringidos por día ({"LUNES": [1, 2], ...}); por defecto
+                 PersonaAcreditada.restrictions
+             excepciones: iterable de dict, opcional
+                 Cada excepción tiene "desde" y "hasta" (fechas inclusivas),
+                 opcionalmente "provincias" y reemplaza "ventanas" y/o "digitos"
+                 de los días que indique. Si varias coinciden se aplican en
+                 orden, de modo que la última prevalece en lo que defina.
+        """
+        if digitos is None:
+            from .Acreditate import PersonaAcreditada
+            digitos = PersonaAcreditada.restrictions
+        mapas = _por_dia(VENTANAS if ventanas is None else ventanas, _mapa_ventanas)
+        mascaras = _por_dia(digitos, _mascara_digitos)
+        if None in mapas or None in mascaras:
+            raise ValueError('El horario base debe definir ventanas y dígitos para todos los días')
+        self.semana = [PlanDia(m, d) for m, d in zip(mapas, mascaras)]
+
+        self._excepciones = []
+        for excepcion in excepciones:
+            desde, hasta = _fecha(excepcion['desde']), _fecha(excepcion['hasta'])
+            if hasta < desde:
+                raise ValueError('La excepción termina antes de empezar: {}'.format(excepcion))
+            provincias = excepcion.get('provincias')
+            mapas = _por_dia(excepcion.get('ventanas'), _mapa_ventanas)
+            mascaras = _por_dia(excepcion.get('digitos'), _mascara_digitos)
+            self._excepciones.append((desde, hasta, frozenset(provincias) if provincias else None,
+                                      mapas, mascaras))
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def desde_dict(cls, datos):
+        """Construye un horario con las claves "ventanas", "digitos" y "excepciones" del diccionario"""
+        return cls(datos.get('ventanas'), datos.get('digitos'), datos.get('excepciones', ()))
+
+    @classmethod
+    def desde_archivo(cls, ruta):
+        """
+        Construye un horario a partir de un archivo JSON, por ejemplo:
+
+            {"ventanas": [["07:30", "11:59"], ["13:00", "16:30"]],
+             "digitos": {"LUNES": [1, 2], "MARTES": [3, 4], "MIERCOLES": [5, 6],
+                         "JUEVES": [7, 8], "VIERNES": [9, 0], "SABADO": [], "DOMINGO": []},
+             "excepciones": [{"desde": "2021/12/20", "hasta": "2021/12/24",
+                              "provincias": ["EC-P"], "ventanas": [["08:00", "12:00"]]}]}
+        """
+        with open(ruta, encoding='utf-8') as archivo:
+            return cls.desde_dict(json.load(archivo))
+
+    def plan(self, ordinal, prov='EC-P'):
+        """
+        Devuelve el plan de un día
+
+         Parámetros
+         ----------
+             ordinal: int
+                 Fecha como ordinal (datetime.date.toordinal)
+             prov: str, opcional
+                 Código de provincia según ISO3166-2
+
+         RETORNA
+         -------
+             PlanDia del día
+        """
+        dia_semana = (ordinal - 1) % 7  # el ordinal 1 (0001-01-01) fue lunes
+        if not self._excepciones:
+            return self.semana[dia_semana]
+        clave = (ordinal, prov)
+        plan = self._memo.get(clave)
+        if plan is None:
+            plan = self.semana[dia_semana]
+            mapa, digitos = plan.mapa, plan.digitos
+            for desde, hasta, provincias, mapas, mascaras in self._excepciones:
+                if desde <= ordinal <= hasta and (provincias is None or prov in provincias):
+                    if mapas[dia_semana] is not None:
+                        mapa = mapas[dia_semana]
+                    if mascaras[dia_semana] is not None:
+                        digitos = mascaras[dia_semana]
+            if (mapa, digitos) != (plan.mapa, plan.digitos):
+                plan = PlanDia(mapa, digitos)
+            with self._lock:
+                if len(self._memo) >= 100000:
+                    self._memo.clear()
+                self._memo[clave] = plan
+        return plan
+
+
+def compilar_planes(planes):
+    """
+    Convierte una secuencia de PlanDia en arreglos de numpy para la evaluación
+    vectorizada; los planes repetidos se compilan una sola vez
+
+     Parámetros
+     ----------
+         planes: list de PlanDia
+
+     RETORNA
+     -------
+         Tupla (indices, mapas, restringidos): indices (numpy.ndarray de intp) da
+         para cada plan su fila en mapas (bool, distintos x MINUTOS_DIA, minutos
+         laborables) y en restringidos (bool, distintos x 10, dígitos restringidos)
+    """
+    import numpy as np
+
+    distintos = list(dict.fromkeys(planes))
+    posicion = {plan: i for i, plan in enumerate(distintos)}
+    mapas = np.zeros((len(distintos), MINUTOS_DIA), dtype=bool)
+    restringidos = np.zeros((len(distintos), 10), dtype=bool)
+    for i, plan in enumerate(distintos):
+        bits = np.frombuffer(plan.mapa.to_bytes(MINUTOS_DIA // 8, 'little'), dtype=np.uint8)
+        mapas[i] = np.unpackbits(bits, bitorder='little').astype(bool)
+        restringidos[i] = [plan.restringido(d) for d in range(10)]
+    indices = np.array([posicion[plan] for plan in planes], dtype=np.intp)
+    return indices, mapas, restringidos
+
+
+_activo = None
+_version = 0
+_activo_lock = threading.Lock()
+
+
+def horario_activo():
+    """Devuelve el horario en uso, por defecto las ventanas y restricciones de PersonaAcreditada"""
+    global _activo
+    if _activo is None:
+        with _activo_lock:
+            if _activo is None:
+                _activo = Horario()
+    return _activo
+
+
+def activar_horario(horario):
+    """
+    Reemplaza el horario en uso
+
+     Parámetros
+     ----------
+         horario: Horario, str o None
+             Horario compilado, ruta de un archivo JSON o None para volver al
+             horario por defecto
+
+     RETORNA
+     -------
+         El Horario activo
+    """
+    global _activo, _version
+    if isinstance(horario, str):
+        horario = Horario.desde_archivo(horario)
+    with _activo_lock:
+        _activo = horario
+        _version += 1
+    return horario_activo()
+
+
+def version():
+    """Número que cambia cada vez que se reemplaza el horario en uso"""
+    return _version
@@ -0,0 +1,395 @@
+import datetime
+import os
+import struct
+import threading
+import zlib
+
+from .calendario import cambiaron_feriados
+
+# Formato del archivo (little endian):
+#   cabecera: firma (4 bytes), versión (uint16), origen (uint16), provincia (8 bytes),
+#             revisión (uint32), ordinal del primer día (uint32), número de días (uint32),
+#             CRC32 del contenido (uint32)
+#   contenido:
+#     días conocidos: un bit por día, (dias + 7) // 8 bytes
+#     feriados:       un bit por día, (dias + 7) // 8 bytes
+#     nombres:        número de nombres (uint32) y, por cada feriado en orden,
+#                     desplazamiento desde el primer día (uint32) y longitud (uint16),
+#                     seguidos de los nombres en UTF-8
+#
+# Cargar una instantánea no importa holidays, dateutil ni numpy.
+FIRMA = b'ACRF'
+VERSION = 1
+CABECERA = struct.Struct('<4sHH8sIIII')
+NOMBRE = struct.Struct('<IH')
+CANTIDAD = struct.Struct('<I')
+
+ORIGEN_REGLAS = 0
+ORIGEN_API = 1
+ORIGEN_CONCILIADO = 2
+ORIGENES = {ORIGEN_REGLAS: 'reglas', ORIGEN_API: 'api', ORIGEN_CONCILIADO: 'conciliado'}
+
+
+class Instantanea:
+    """
+    Calendario de feriados completo e inmutable para un rango de días y una
+    provincia, serializable en un formato binario compacto y versionado. Cada
+    día tiene un bit de "conocido" y otro de "feriado", de modo que cargar
+    una instantánea solo copia bytes y cada consulta es O(1).
+    ...
+
+     ATRIBUTOS
+     -----------
+             prov: str
+                 Código de provincia según ISO3166-2
+             inicio: datetime.date
+                 Primer día de la instantánea
+             dias: int
+                 Número de días de la instantánea
+             origen: str
+                 'reglas' (HolidayEcuador), 'api' (respuestas de la API en caché)
+                 o 'conciliado' (ambos fusionados, ver src/conciliacion.py)
+             revision: int
+                 Número de revisión de los datos, libre para quien la genera
+
+    Métodos
+    -------
+     desde_feriados(cls, feriados, inicio, fin, prov, origen, revision, conocidos):
+         Construye una instantánea a partir de un diccionario {fecha: nombre}
+     desde_bytes(cls, datos):
+         Reconstruye una instantánea serializada con a_bytes
+     cargar(cls, ruta):
+         Lee una instantánea de un archivo
+     a_bytes(self):
+         Serializa la instantánea
+     guardar(self, ruta):
+         Escribe la instantánea en un archivo de forma atómica
+     es_feriado(self, fecha):
+         Devuelve True si la fecha es feriado
+     feriados(self):
+         Devuelve el diccionario {fecha: nombre} de todos los feriados
+    """
+    __slots__ = ('prov', 'origen', 'revision', '_inicio', 'dias', '_conocidos', '_feriados', '_nombres',
+                 '_todos_conocidos')
+
+    def __init__(self, prov, inicio, dias, conocidos, feriados, nombres, origen=ORIGEN_REGLAS, revision=0):
+        """
+        Construye una instantánea a partir de sus mapas de bits; use
+        desde_feriados, desde_bytes o cargar en lugar de llamarlo directamente
+
+         Parámetros
+         ----------
+             prov: str
+                 Código de provincia según ISO3166-2
+             inicio: int
+                 Ordinal (datetime.date.toordinal) del primer día
+             dias: int
+                 Número de días
+             conocidos, feriados: bytes
+                 Mapas de bits de (dias + 7) // 8 bytes
+             nombres: bytes
+                 Bloque de nombres serializado
+             origen: int, opcional
+                 ORIGEN_REGLAS, ORIGEN_API u ORIGEN_CONCILIADO
+             revision: int, opcional
+                 Número de revisión de los datos
+        """
+        tamano = (dias + 7) // 8
+        if len(conocidos) != tamano or len(feriados) != tamano:
+            raise ValueError('Los mapas de bits deben tener {} bytes'.format(tamano))
+        if origen not in ORIGENES:
+            raise ValueError('Origen desconocido: {}'.format(origen))
+        self.prov = prov
+        self.origen = ORIGENES[origen]
+        self.revision = revision
+        self._inicio = inicio
+        self.dias = dias
+        self._conocidos = conocidos
+        self._feriados = feriados
+        self._nombres = nombres
+        self._todos_conocidos = conocidos == _todos(dias)
+
+    @property
+    def inicio(self):
+        """Primer día de la instantánea"""
+        return datetime.date.fromordinal(self._inicio)
+
+    @property
+    def fin(self):
+        """Último día de la instantánea"""
+        return datetime.date.fromordinal(self._inicio + self.dias - 1)
+
+    @classmethod
+    def desde_feriados(cls, feriados, inicio, fin, prov='EC-P', origen=ORIGEN_REGLAS, revision=0,
+                       conocidos=None):
+        """
+        Construye una instantánea a partir de un calendario de feriados
+
+         Parámetros
+         ----------
+             feriados: dict
+                 {datetime.date: nombre}; se ignoran las fechas fuera del rango
+             inicio, fin: datetime.date
+                 Primer y último día (incluidos)
+             prov: str, opcional
+                 Código de provincia según ISO3166-2
+             origen: int, opcional
+                 ORIGEN_REGLAS, ORIGEN_API u ORIGEN_CONCILIADO
+             revision: int, opcional
+                 Número de revisión de los datos
+             conocidos: iterable de datetime.date, opcional
+                 Días para los que el calendario tiene información; por defecto
+                 todos los del rango
+
+         RETORNA
+         -------
+             Instantanea
+        """
+        primero, ultimo = inicio.toordinal(), fin.toordinal()
+        if ultimo < primero:
+            raise ValueError('fin debe ser mayor o igual que inicio')
+        if len(prov.encode('ascii')) > 8:
+            raise ValueError('El código de provincia no puede tener más de 8 caracteres')
+        dias = ultimo - primero + 1
+        tamano = (dias + 7) // 8
+        if conocidos is None:
+            bits_conocidos = bytearray(_todos(dias))
+        else:
+            bits_conocidos = bytearray(tamano)
+            for fecha in conocidos:
+                indice = fecha.toordinal() - primero
+                if 0 <= indice < dias:
+                    bits_conocidos[indice >> 3] |= 1 << (indice & 7)
+        bits_feriados = bytearray(tamano)
+        indices, textos = [], []
+        for fecha, nombre in sorted(feriados.items()):
+            indice = fecha.toordinal() - primero
+            if not 0 <= indice < dias:
+                continue
+            bits_feriados[indice >> 3] |= 1 << (indice & 7)
+            bits_conocidos[indice >> 3] |= 1 << (indice & 7)
+            texto = str(nombre).encode('utf-8')
+            indices.append(NOMBRE.pack(indice, len(texto)))
+            textos.append(texto)
+        nombres = CANTIDAD.pack(len(indices)) + b''.join(indices) + b''.join(textos)
+        return cls(prov, primero, dias, bytes(bits_conocidos), bytes(bits_feriados), nombres, origen, revision)
+
+    @classmethod
+    def desde_bytes(cls, datos):
+        """
+        Reconstruye una instantánea serializada con a_bytes
+
+         Errores
+         -------
+             ValueError
+                 Si los datos no son una instantánea válida de esta versión
+        """
+        datos = memoryview(datos)
+        if len(datos) < CABECERA.size:
+            raise ValueError('Los datos no son una instantánea de feriados')
+        firma, version, origen, prov, revision, inicio, dias, crc = CABECERA.unpack_from(datos)
+        if firma != FIRMA:
+            raise ValueError('Los datos no son una instantánea de feriados')
+        if version != VERSION:
+            raise ValueError('Versión de instantánea no soportada: {} (se esperaba {})'.format(version, VERSION))
+        contenido = datos[CABECERA.size:]
+        if zlib.crc32(contenido) != crc:
+            raise ValueError('La instantánea está dañada o incompleta')
+        tamano = (dias + 7) // 8
+        if len(contenido) < 2 * tamano + CANTIDAD.size:
+            raise ValueError('La instantánea está incompleta')
+        return cls(prov.rstrip(b'\0').decode('ascii'), inicio, dias, bytes(contenido[:tamano]),
+                   bytes(contenido[tamano:2 * tamano]), bytes(contenido[2 * tamano:]), origen, revision)
+
+    @classmethod
+    def cargar(cls, ruta):
+        """Lee una instantánea de un archivo creado con guardar"""
+        with open(ruta, 'rb') as archivo:
+            return cls.desde_bytes(archivo.read())
+
+    def a_bytes(self):
+        """Serializa la instantánea en el formato binario versionado"""
+        contenido = self._conocidos + self._feriados + self._nombres
+        origen = {v: k for k, v in ORIGENES.items()}[self.origen]
+        return CABECERA.pack(FIRMA, VERSION, origen, self.prov.encode('ascii'), self.revision,
+                             self._inicio, self.dias, zlib.crc32(contenido)) + contenido
+
+    def guardar(self, ruta):
+        """Escribe la instantánea en un archivo; se reemplaza de forma atómica"""
+        temporal = ruta + '.tmp'
+        with open(temporal, 'wb') as archivo:
+            archivo.write(self.a_bytes())
+        os.replace(temporal, ruta)
+
+    def es_feriado_ordinal(self, ordinal):
+        """
+        Devuelve True si el día con el ordinal dado (datetime.date.toordinal) es feriado
+
+         Errores
+         -------
+             KeyError
+                 Si el día está fuera de la instantánea o no se conoce
+        """
+        indice = ordinal - self._inicio
+        if not 0 <= indice < self.dias or not (
+                self._todos_conocidos or self._conocidos[indice >> 3] >> (indice & 7) & 1):
+            raise KeyError(datetime.date.fromordinal(ordinal))
+        return self._feriados[indice >> 3] >> (indice & 7) & 1 == 1
+
+    def es_feriado(self, fecha):
+        """Devuelve True si la fecha es feriado"""
+        return self.es_feriado_ordinal(fecha.toordinal())
+
+    def __contains__(self, fecha):
+        indice = fecha.toordinal() - self._inicio
+        return 0 <= indice < self.dias and (
+            self._todos_conocidos or self._conocidos[indice >> 3] >> (indice & 7) & 1 == 1)
+
+    def feriados(self):
+        """
+        Devuelve todos los feriados de la instantánea
+
+         RETORNA
+         -------
+             Diccionario {datetime.date: nombre} ordenado por fecha
+        """
+        cantidad, = CANTIDAD.unpack_from(self._nombres)
+        posicion = CANTIDAD.size + cantidad * NOMBRE.size
+        resultado = {}
+        for indice, longitud in NOMBRE.iter_unpack(self._nombres[CANTIDAD.size:posicion]):
+            resultado[datetime.date.fromordinal(self._inicio + indice)] = \
+                self._nombres[posicion:posicion + longitud].decode('utf-8')
+            posicion += longitud
+        return resultado
+
+    def __eq__(self, otra):
+        return isinstance(otra, Instantanea) and self.a_bytes() == otra.a_bytes()
+
+
+def _todos(dias):
+    """Mapa de bits con los dias primeros bits encendidos"""
+    completos, resto = divmod(dias, 8)
+    return b'\xff' * completos + (bytes([(1 << resto) - 1]) if resto else b'')
+
+
+def exportar_reglas(anio_inicio, anio_fin, prov='EC-P', revision=0):
+    """
+    Genera una instantánea con los feriados de HolidayEcuador para los años
+    [anio_inicio, anio_fin]
+
+     Parámetros
+     ----------
+         anio_inicio, anio_fin: int
+             Primer y último año (incluidos)
+         prov: str, opcional
+             Código de provincia según ISO3166-2
+         revision: int, opcional
+             Número de revisión de los datos
+
+     RETORNA
+     -------
+         Instantanea
+    """
+    from .feriados_ecuador import HolidayEcuador
+
+    if anio_fin < anio_inicio:
+        raise ValueError('anio_fin debe ser mayor o igual que anio_inicio')
+    feriados = HolidayEcuador(prov=prov, years=range(anio_inicio, anio_fin + 1))
+    return Instantanea.desde_feriados(dict(feriados), datetime.date(anio_inicio, 1, 1),
+                                      datetime.date(anio_fin, 12, 31), prov, ORIGEN_REGLAS, revision)
+
+
+def exportar_cache(cache, prov='EC-P', revision=0):
+    """
+    Genera una instantánea con las respuestas de la API de feriados guardadas
+    en una CacheRespuestas. Solo los días consultados quedan como conocidos;
+    se ignora el tiempo de vida de las respuestas.
+
+     Parámetros
+     ----------
+         cache: CacheRespuestas
+             Caché de respuestas de la API
+         prov: str, opcional
+             Código de provincia de la API consultada
+         revision: int, opcional
+             Número de revisión de los datos
+
+     RETORNA
+     -------
+         Instantanea
+
+     Errores
+     -------
+         ValueError
+             Si la caché no tiene respuestas
+    """
+    from .api_feriados import NOMBRES_IGNORADOS
+
+    feriados, conocidos = {}, []
+    for fecha, respuesta in cache.respuestas():
+        conocidos.append(fecha)
+        nombres = [f.get('name') or '' for f in respuesta if f.get('name') not in NOMBRES_IGNORADOS]
+        if nombres:
+            feriados[fecha] = nombres[0]
+    if not conocidos:
+        raise ValueError('La caché no tiene respuestas de la API')
+    return Instantanea.desde_feriados(feriados, min(conocidos), max(conocidos), prov, ORIGEN_API,
+                                      revision, conocidos)
+
+
+_activa = None
+_activa_lock = threading.Lock()
+
+
+def activar_instantanea(instantanea):
+    """
+    Usa una instantánea en las comprobaciones de feriados sin conexión de
+    PersonaAcreditada y evaluar_lote; los días que no contiene se calculan
+    con las reglas de HolidayEcuador. Una instantánea con origen 'conciliado'
+    resuelve además las comprobaciones online de los días que contiene.
+
+     Parámetros
+     ----------
+         instantanea: Instantanea, str o None
+             Instantánea, ruta de un archivo o None para desactivarla
+
+     RETORNA
+     -------
+         La Instantanea activa o None
+    """
+    global _activa
+    if isinstance(instantanea, str):
+        instantanea = Instantanea.cargar(instantanea)
+    with _activa_lock:
+        _activa = instantanea
+    cambiaron_feriados()
+    return _activa
+
+
+def instantanea_activa():
+    """Devuelve la Instantanea activa o None"""
+    return _activa
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Exporta calendarios de feriados a una instantánea binaria')
+    parser.add_argument('ruta', help='archivo de destino')
+    origen = parser.add_mutually_exclusive_group(required=True)
+    origen.add_argument('--anios', nargs=2, type=int, metavar=('INICIO', 'FIN'),
+                        help='años de HolidayEcuador (incluidos)')
+    origen.add_argument('--cache', help='base SQLite de respuestas de la API')
+    parser.add_argument('--prov', default='EC-P', help='código de provincia ISO3166-2')
+    parser.add_argument('--revision', type=int, default=0)
+    args = parser.parse_args()
+    if args.cache:
+        from .api_feriados import CacheRespuestas
+
+        cache = CacheRespuestas(args.cache)
+        try:
+            exportar_cache(cache, args.prov, args.revision).guardar(args.ruta)
+        finally:
+            cache.cerrar()
+    else:
+        exportar_reglas(args.anios[0], args.anios[1], args.prov, args.revision).guardar(args.ruta)
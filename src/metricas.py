@@ -0,0 +1,182 @@
+import bisect
+import threading
+import time
+
+# Límites superiores (en segundos) de los intervalos de los histogramas de latencia
+LIMITES = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 1e-3, 1e-2, 1e-1, 1.0)
+
+# Etapas de PersonaAcreditada.evaluar
+ETAPAS = ('analisis', 'feriado_offline', 'feriado_online', 'horario', 'dia_semana', 'restriccion')
+
+reloj = time.perf_counter
+
+
+class Histograma:
+    """
+    Histograma de latencias con intervalos fijos (LIMITES)
+    ...
+
+     ATRIBUTOS
+     -----------
+             cuentas: list de int
+                 Observaciones por intervalo; la última posición es +Inf
+             suma: float
+                 Suma de todas las observaciones en segundos
+             total: int
+                 Número de observaciones
+    """
+    __slots__ = ('cuentas', 'suma', 'total')
+
+    def __init__(self):
+        self.cuentas = [0] * (len(LIMITES) + 1)
+        self.suma = 0.0
+        self.total = 0
+
+    def observar(self, segundos):
+        """Agrega una observación"""
+        self.cuentas[bisect.bisect_left(LIMITES, segundos)] += 1
+        self.suma += segundos
+        self.total += 1
+
+
+class Metricas:
+    """
+    Contadores e histogramas de latencia por etapa de evaluar() y desglose
+    de los resultados por motivo. Solo se registran datos mientras activo
+    es True; desactivado, el costo en evaluar() es la comprobación de la bandera.
+    ...
+
+     ATRIBUTOS
+     -----------
+             activo: bool
+                 Indica si se registran métricas
+
+    Métodos
+    -------
+     observar(self, etapa, segundos):
+         Registra la latencia de una etapa
+     contar_motivo(self, motivo):
+         Registra el motivo del resultado de una evaluación
+     estadisticas(self):
+         Devuelve los contadores e histogramas como diccionario
+     prometheus(self, datos=None):
+         Devuelve las métricas en formato de texto de Prometheus
+     reiniciar(self):
+         Borra todas las observaciones
+    """
+
+    def __init__(self):
+        self.activo = False
+        self._lock = threading.Lock()
+        self.reiniciar()
+
+    def activar(self):
+        """Comienza a registrar métricas"""
+        self.activo = True
+
+    def desactivar(self):
+        """Deja de registrar métricas"""
+        self.activo = False
+
+    def reiniciar(self):
+        """Borra todas las observaciones"""
+        with self._lock:
+            self._histogramas = {etapa: Histograma() for etapa in ETAPAS}
+            self._motivos = {}
+
+    def observar(self, etapa, segundos):
+        """
+        Registra la latencia de una etapa
+
+         Parámetros
+         ----------
+             etapa: str
+                 Nombre de la etapa, uno de ETAPAS
+             segundos: float
+                 Duración de la etapa
+        """
+        with self._lock:
+            histograma = self._histogramas.get(etapa)
+            if histograma is None:
+                histograma = self._histogramas[etapa] = Histograma()
+            histograma.observar(segundos)
+
+    def contar_motivo(self, motivo):
+        """Registra el motivo del resultado de una evaluación"""
+        with self._lock:
+            self._motivos[motivo] = self._motivos.get(motivo, 0) + 1
+
+    def estadisticas(self):
+        """
+        Devuelve los contadores e histogramas
+
+         RETORNA
+         -------
+             Diccionario con 'etapas' ({etapa: {'total', 'suma', 'promedio', 'cuentas'}})
+             y 'motivos' ({motivo: total})
+        """
+        with self._lock:
+            etapas = {etapa: {'total': h.total, 'suma': h.suma,
+                              'promedio': h.suma / h.total if h.total else 0.0,
+                              'cuentas': list(h.cuentas)}
+                      for etapa, h in self._histogramas.items()}
+            return {'etapas': etapas, 'motivos': dict(self._motivos)}
+
+    def prometheus(self, datos=None):
+        """
+        Devuelve las métricas en formato de texto de exposición de Prometheus
+
+         Parámetros
+         ----------
+             datos: dict, opcional
+                 Estadísticas a exponer, por ejemplo las de varios procesos
+                 unidas con combinar; por defecto las de este objeto
+        """
+        if datos is None:
+            datos = self.estadisticas()
+        lineas = ['# HELP acreditate_etapa_segundos Latencia de cada etapa de evaluar',
+                  '# TYPE acreditate_etapa_segundos histogram']
+        for etapa, h in datos['etapas'].items():
+            acumulado = 0
+            for limite, cuenta in zip(LIMITES + ('+Inf',), h['cuentas']):
+                acumulado += cuenta
+                lineas.append('acreditate_etapa_segundos_bucket{{etapa="{}",le="{}"}} {}'.format(
+                    etapa, limite, acumulado))
+            lineas.append('acreditate_etapa_segundos_sum{{etapa="{}"}} {!r}'.format(etapa, h['suma']))
+            lineas.append('acreditate_etapa_segundos_count{{etapa="{}"}} {}'.format(etapa, h['total']))
+        lineas += ['# HELP acreditate_evaluaciones_total Evaluaciones por motivo del resultado',
+                   '# TYPE acreditate_evaluaciones_total counter']
+        for motivo, total in sorted(datos['motivos'].items()):
+            lineas.append('acreditate_evaluaciones_total{{motivo="{}"}} {}'.format(motivo, total))
+        return '\n'.join(lineas) + '\n'
+
+
+def combinar(estadisticas):
+    """
+    Suma las estadísticas de varios procesos
+
+     Parámetros
+     ----------
+         estadisticas: iterable de dict
+             Resultados de Metricas.estadisticas()
+
+     RETORNA
+     -------
+         Diccionario con el mismo formato que Metricas.estadisticas()
+    """
+    etapas, motivos = {}, {}
+    for datos in estadisticas:
+        for etapa, h in datos['etapas'].items():
+            suma = etapas.setdefault(etapa, {'total': 0, 'suma': 0.0, 'cuentas': [0] * (len(LIMITES) + 1)})
+            suma['total'] += h['total']
+            suma['suma'] += h['suma']
+            suma['cuentas'] = [a + b for a, b in zip(suma['cuentas'], h['cuentas'])]
+        for motivo, total in datos['motivos'].items():
+            motivos[motivo] = motivos.get(motivo, 0) + total
+    for h in etapas.values():
+        h['promedio'] = h['suma'] / h['total'] if h['total'] else 0.0
+    return {'etapas': etapas, 'motivos': motivos}
+
+
+# Métricas compartidas por todo el proceso
+metricas = Metricas()
@@ -0,0 +1,149 @@
+import collections
+import csv
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from .flujo import CAMPOS_SALIDA, procesar
+
+# Tamaño por defecto de cada fragmento del archivo de entrada
+TAMANO_FRAGMENTO = 8 * 1024 * 1024
+
+
+def dividir(ruta, tamano_fragmento=TAMANO_FRAGMENTO):
+    """
+    Divide un archivo en rangos de bytes que comienzan y terminan en un salto de línea
+
+     Parámetros
+     ----------
+         ruta: str
+             Archivo de entrada con un registro por línea
+         tamano_fragmento: int, opcional
+             Tamaño aproximado en bytes de cada fragmento
+
+     RETORNA
+     -------
+         Lista de tuplas (inicio, fin) que cubren todo el archivo
+    """
+    if tamano_fragmento < 1:
+        raise ValueError('El tamaño de fragmento debe ser mayor que cero')
+    tamano = os.path.getsize(ruta)
+    rangos = []
+    with open(ruta, 'rb') as archivo:
+        inicio = 0
+        while inicio < tamano:
+            archivo.seek(min(inicio + tamano_fragmento, tamano))
+            archivo.readline()  # se avanza hasta el final de la línea en curso
+            fin = min(archivo.tell(), tamano)
+            rangos.append((inicio, fin))
+            inicio = fin
+    return rangos
+
+
+def _leer(ruta, inicio, fin):
+    with open(ruta, 'rb') as archivo:
+        archivo.seek(inicio)
+        return archivo.read(fin - inicio)
+
+
+# Número de línea que la salida agrega al final de cada decisión con error, en JSONL y en CSV
+_LINEA = {'jsonl': (re.compile(r'"linea": (\d+)\}$', re.MULTILINE), '"linea": {}}}'),
+          'csv': (re.compile(r',(\d+)$', re.MULTILINE), ',{}')}
+
+
+def _inicializar(instantanea, horario):
+    """Activa en cada proceso de trabajo la instantánea y el horario indicados"""
+    if instantanea is not None:
+        from .instantanea import activar_instantanea
+        activar_instantanea(instantanea)
+    if horario is not None:
+        from .horario import activar_horario
+        activar_horario(horario)
+
+
+def _evaluar_fragmento(ruta, inicio, fin, formato, online, primera_linea):
+    """
+    Evalúa un fragmento del archivo en un proceso de trabajo. Solo viajan entre
+    procesos la ruta y el rango de bytes de ida, y el texto de salida, los
+    contadores y el número de líneas del fragmento de vuelta. Las líneas se
+    numeran desde primera_linea; el proceso principal las corrige al escribir.
+    """
+    texto = _leer(ruta, inicio, fin).decode('utf-8')
+    lineas = texto.count('\n') + (1 if texto and not texto.endswith('\n') else 0)
+    salida = io.StringIO()
+    total, errores = procesar(io.StringIO(texto, newline=''), salida, formato, online,
+                              tamano_bloque=1 << 30, cabecera=False, primera_linea=primera_linea)
+    return salida.getvalue(), total, errores, lineas
+
+
+def procesar_archivo(ruta, salida, formato='jsonl', online=False, procesos=None,
+                     tamano_fragmento=TAMANO_FRAGMENTO, instantanea=None, horario=None):
+    """
+    Evalúa un archivo grande repartiendo fragmentos de bytes entre varios
+    procesos (concurrent.futures.ProcessPoolExecutor) y escribe las decisiones
+    en el orden de la entrada, con el mismo formato que flujo.procesar.
+    Cada registro debe ocupar una sola línea.
+
+     Parámetros
+     ----------
+         ruta: str
+             Archivo JSONL o CSV de entrada
+         salida: archivo de texto
+             Destino de las decisiones
+         formato: str, opcional
+             'jsonl' o 'csv'
+         online: booleano, opcional
+             si en línea == Verdadero, se utilizará la API de días festivos abstractos
+         procesos: int, opcional
+             Número de procesos, por defecto uno por núcleo
+         tamano_fragmento: int, opcional
+             Tamaño aproximado en bytes de cada fragmento
+         instantanea, horario: str, opcional
+             Rutas de la instantánea de feriados y del horario que cada proceso
+             activa al arrancar; sin ellas los procesos usan los que tengan
+             activos (los del proceso principal solo si se crean con fork)
+
+     RETORNA
+     -------
+         Tupla (filas procesadas, filas con error)
+    """
+    if formato not in ('jsonl', 'csv'):
+        raise ValueError('El formato debe ser jsonl o csv')
+    procesos = procesos or os.cpu_count() or 1
+    rangos = dividir(ruta, tamano_fragmento)
+    if formato == 'csv':
+        bufer = io.StringIO()
+        csv.DictWriter(bufer, CAMPOS_SALIDA, lineterminator='\n').writeheader()
+        salida.write(bufer.getvalue())
+
+    # conteo = [filas, filas con error, número de la primera línea del siguiente fragmento]
+    conteo = [0, 0, 1]
+    with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar,
+                             initargs=(instantanea, horario)) as ejecutor:
+        # Se mantienen a lo sumo dos fragmentos en curso por proceso y se escriben
+        # en orden a medida que terminan. Solo el primer fragmento numera sus
+        # líneas desde 1, porque en CSV la línea 1 puede ser la cabecera.
+        pendientes = collections.deque()
+        for inicio, fin in rangos:
+            primera = 1 if inicio == 0 else 2
+            pendientes.append((ejecutor.submit(_evaluar_fragmento, ruta, inicio, fin, formato, online, primera),
+                               primera))
+            if len(pendientes) >= 2 * procesos:
+                _escribir(salida, formato, *pendientes.popleft(), conteo)
+        while pendientes:
+            _escribir(salida, formato, *pendientes.popleft(), conteo)
+    return conteo[0], conteo[1]
+
+
+def _escribir(salida, formato, futuro, primera, conteo):
+    """Escribe la salida de un fragmento con los números de línea de todo el archivo"""
+    texto, filas, con_error, lineas = futuro.result()
+    desplazamiento = conteo[2] - primera
+    if con_error and desplazamiento:
+        patron, reemplazo = _LINEA[formato]
+        texto = patron.sub(lambda m: reemplazo.format(int(m.group(1)) + desplazamiento), texto)
+    salida.write(texto)
+    conteo[0] += filas
+    conteo[1] += con_error
+    conteo[2] += lineas
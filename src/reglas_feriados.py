@@ -0,0 +1,251 @@
+import datetime
+from collections import namedtuple
+
+# Tipos de regla
+FIJO = 'fijo'              # misma fecha todos los años
+PASCUA = 'pascua'          # desplazamiento en días respecto del domingo de Pascua
+TRASLADABLE = 'trasladable'  # fecha fija que se traslada según el día de la semana en que cae
+
+Regla = namedtuple('Regla', ['tipo', 'nombre', 'mes', 'dia', 'desplazamiento', 'traslados', 'desde', 'provincias'])
+Regla.__doc__ = """
+Regla declarativa de un feriado
+
+ ATRIBUTOS
+ -----------
+         tipo: str
+             FIJO, PASCUA o TRASLADABLE
+         nombre: str
+             Nombre del feriado
+         mes, dia: int
+             Fecha base de las reglas FIJO y TRASLADABLE
+         desplazamiento: int
+             Días respecto del domingo de Pascua de las reglas PASCUA
+         traslados: dict
+             {día de la semana de la fecha base: días de traslado} de las reglas TRASLADABLE
+         desde: int o None
+             Primer año en que se aplican los traslados
+         provincias: tuple o None
+             Provincias (ISO3166-2) en las que aplica, None para todas
+"""
+
+
+def fijo(mes, dia, nombre, provincias=None):
+    """Crea una regla de fecha fija"""
+    return Regla(FIJO, nombre, mes, dia, 0, None, None, provincias)
+
+
+def pascua(desplazamiento, nombre, provincias=None):
+    """Crea una regla relativa al domingo de Pascua"""
+    return Regla(PASCUA, nombre, None, None, desplazamiento, None, None, provincias)
+
+
+def trasladable(mes, dia, nombre, traslados, desde=None, provincias=None):
+    """Crea una regla de fecha fija con traslados según el día de la semana"""
+    return Regla(TRASLADABLE, nombre, mes, dia, 0, traslados, desde, provincias)
+
+
+# (Ley 858/Ley de Reforma a la LOSEP (vigente desde el 21 de diciembre de 2016 /R.O # 906))
+# Si el feriado cae en sábado o martes el descanso obligatorio irá al viernes o lunes
+# inmediato anterior respectivamente, si cae en domingo irá al lunes siguiente y si cae
+# en miércoles o jueves se moverá al viernes de esa semana
+LOSEP = {1: -1, 2: 2, 3: 1, 5: -1, 6: 1}
+
+# Día de los difuntos: se traslada según el día de la semana en que cae el 2 de noviembre
+DIFUNTOS = {2: 2, 5: -1, 6: 2}
+
+REGLAS_ECUADOR = [
+    # Festividades santo domingo
+    fijo(7, 3, "Cantonalización de Santo Domingo"),
+    fijo(11, 6, "Provincialización de Santo Domingo"),
+    # Festividades parroquiales 'Luz de américa'
+    fijo(8, 2, "Fiestas patronales"),
+    fijo(1, 1, "Año Nuevo [New Year's Day]"),
+    fijo(12, 25, "Navidad [Christmas]"),
+    # Semana Santa
+    pascua(-2, "Semana Santa (Viernes Santo) [Good Friday)]"),
+    pascua(0, "Día de Pascuas [Easter Day]"),
+    # Carnaval: 46 días de cuaresma antes de Pascua
+    pascua(-48, "Lunes de carnaval [Carnival of Monday)]"),
+    pascua(-47, "Martes de carnaval [Tuesday of Carnival)]"),
+    trasladable(5, 1, "Día Nacional del Trabajo [Labour Day]", LOSEP, desde=2016),
+    trasladable(8, 10, "Primer Grito de la Independencia [First Cry of Independence]", LOSEP, desde=2016),
+    trasladable(10, 9, "Independencia de Guayaquil [Guayaquil's Independence]", LOSEP, desde=2016),
+    trasladable(11, 2, "Día de los difuntos [Day of the Dead]", DIFUNTOS),
+    # Fundación de Quito, aplica solo para la provincia de Pichincha
+    trasladable(12, 6, "Fundación de Quito [Foundation of Quito]", LOSEP, desde=2016, provincias=('EC-P',)),
+]
+
+
+def pascua_vectorizada(anios):
+    """
+    Calcula el domingo de Pascua (calendario gregoriano) de un arreglo de años
+
+     Parámetros
+     ----------
+         anios: numpy.ndarray de int
+
+     RETORNA
+     -------
+         numpy.ndarray de datetime64[D]
+    """
+    a = anios % 19
+    b, c = anios // 100, anios % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    n = h + l - 7 * m + 114
+    return _fechas(anios, n // 31, n % 31 + 1)
+
+
+def _fechas(anios, meses, dias):
+    """Convierte arreglos de año, mes y día en datetime64[D]"""
+    base = ((anios - 1970) * 12 + meses - 1).astype('datetime64[M]').astype('datetime64[D]')
+    return base + (dias - 1)
+
+
+class ReglasFeriados:
+    """
+    Tabla de reglas de feriados compilada una sola vez. Genera los feriados de
+    un año, o de un rango completo de años en una sola pasada vectorizada.
+    ...
+
+     ATRIBUTOS
+     -----------
+             reglas: list de Regla
+                 Reglas de la tabla
+
+    Métodos
+    -------
+     anio(self, anio, prov):
+         Devuelve el diccionario {fecha: nombre} de los feriados de un año
+     rango(self, anio_inicio, anio_fin, prov):
+         Devuelve los feriados de todos los años del rango como arreglos
+    """
+
+    def __init__(self, reglas):
+        """
+        Compila las reglas
+
+         Parámetros
+         ----------
+             reglas: iterable de Regla
+        """
+        self.reglas = list(reglas)
+        for regla in self.reglas:
+            if regla.tipo not in (FIJO, PASCUA, TRASLADABLE):
+                raise ValueError('Tipo de regla desconocido: {}'.format(regla.tipo))
+        # Desplazamiento por día de la semana de cada regla
+        self._traslados = [[(r.traslados or {}).get(wd, 0) for wd in range(7)] for r in self.reglas]
+
+    def _aplica(self, regla, prov):
+        return regla.provincias is None or prov in regla.provincias
+
+    def anio(self, anio, prov='EC-P'):
+        """
+        Genera los feriados de un año
+
+         Parámetros
+         ----------
+             anio: int
+             prov: str, opcional
+                 Código de provincia según ISO3166-2
+
+         RETORNA
+         -------
+             Diccionario {datetime.date: nombre}
+        """
+        from dateutil.easter import easter
+        domingo_pascua = None
+        feriados = {}
+        for regla in self.reglas:
+            if not self._aplica(regla, prov):
+                continue
+            if regla.tipo == PASCUA:
+                if domingo_pascua is None:
+                    domingo_pascua = easter(anio)
+                fecha = domingo_pascua + datetime.timedelta(days=regla.desplazamiento)
+            else:
+                fecha = datetime.date(anio, regla.mes, regla.dia)
+                if regla.tipo == TRASLADABLE and (regla.desde is None or anio >= regla.desde):
+                    fecha += datetime.timedelta(days=regla.traslados.get(fecha.weekday(), 0))
+            _agregar(feriados, fecha, regla.nombre)
+        return feriados
+
+    def rango(self, anio_inicio, anio_fin, prov='EC-P'):
+        """
+        Genera en una sola pasada vectorizada los feriados de los años
+        [anio_inicio, anio_fin]
+
+         Parámetros
+         ----------
+             anio_inicio, anio_fin: int
+                 Primer y último año (incluidos)
+             prov: str, opcional
+                 Código de provincia según ISO3166-2
+
+         RETORNA
+         -------
+             Tupla (fechas, nombres): numpy.ndarray de datetime64[D] ordenado y
+             la lista de nombres correspondiente
+        """
+        import numpy as np
+
+        anios = np.arange(anio_inicio, anio_fin + 1, dtype=np.int64)
+        domingo_pascua = pascua_vectorizada(anios)
+        fechas, nombres = [], []
+        for regla, traslados in zip(self.reglas, self._traslados):
+            if not self._aplica(regla, prov):
+                continue
+            if regla.tipo == PASCUA:
+                dias = domingo_pascua + regla.desplazamiento
+            else:
+                dias = _fechas(anios, regla.mes, regla.dia)
+                if regla.tipo == TRASLADABLE:
+                    dia_semana = (dias.astype(np.int64) + 3) % 7  # 1970-01-01 fue jueves
+                    vigente = anios >= regla.desde if regla.desde is not None else True
+                    dias = dias + np.where(vigente, np.array(traslados)[dia_semana], 0)
+            fechas.append(dias)
+            nombres.append(np.full(len(dias), regla.nombre, dtype=object))
+        if not fechas:
+            return np.array([], dtype='datetime64[D]'), []
+        fechas, nombres = np.concatenate(fechas), np.concatenate(nombres)
+        orden = np.argsort(fechas, kind='stable')
+        fechas, nombres = fechas[orden], nombres[orden]
+        # Feriados que coinciden en la misma fecha se combinan en un solo nombre
+        repetido = np.flatnonzero(fechas[1:] == fechas[:-1])
+        if len(repetido):
+            nombres = list(nombres)
+            for i in repetido[::-1]:
+                nombres[i] = '{}, {}'.format(nombres[i], nombres[i + 1])
+                del nombres[i + 1]
+            fechas = np.delete(fechas, repetido + 1)
+        return fechas, list(nombres)
+
+    def calendarios(self, anio_inicio, anio_fin, prov='EC-P'):
+        """
+        Genera con rango() los diccionarios {datetime.date: nombre} de cada año
+
+         RETORNA
+         -------
+             Diccionario {anio: {datetime.date: nombre}}
+        """
+        resultado = {anio: {} for anio in range(anio_inicio, anio_fin + 1)}
+        fechas, nombres = self.rango(anio_inicio, anio_fin, prov)
+        for fecha, nombre in zip(fechas.tolist(), nombres):
+            resultado[fecha.year][fecha] = nombre
+        return resultado
+
+
+def _agregar(feriados, fecha, nombre):
+    """Agrega un feriado combinando los nombres si la fecha ya existe"""
+    if fecha in feriados:
+        nombre = '{}, {}'.format(feriados[fecha], nombre)
+    feriados[fecha] = nombre
+
+
+# Tabla compilada de los feriados de Ecuador
+reglas_ecuador = ReglasFeriados(REGLAS_ECUADOR)
@@ -0,0 +1,388 @@
+import datetime
+import json
+import os
+import signal
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .Acreditate import RegistroEntrada
+from .calendario import calendarios
+from .decisiones import memo_decisiones
+from .flujo import decidir
+from .metricas import combinar, metricas
+from .turnos import proximos_turnos
+
+# Tamaño máximo del cuerpo de una petición
+MAX_CUERPO = 16 * 1024 * 1024
+
+# Número máximo de ventanas por consulta de /turnos
+MAX_TURNOS = 1000
+
+# Años antes o después del actual que acepta /turnos
+MAX_ANIOS_TURNOS = 100
+
+# Segundos entre las copias de las métricas de cada proceso de trabajo
+INTERVALO_METRICAS = 1.0
+
+
+class ManejadorAcreditate(BaseHTTPRequestHandler):
+    """
+    Manejador HTTP/1.1 con conexiones persistentes (keep-alive) del servicio
+
+     RUTAS
+     -----
+         POST /evaluar
+             {"cedula": ..., "fecha": ..., "hora": ..., "online": false}
+             -> decisión con resultado y motivo, o error (400)
+         POST /lote
+             {"filas": [{"cedula": ..., "fecha": ..., "hora": ...}, ...], "online": false}
+             -> {"decisiones": [...]} en el mismo orden
+         POST /turnos
+             {"cedula": ..., "fecha": ..., "hora": ..., "cantidad": 1}
+             -> {"turnos": [{"fecha": ..., "inicio": "HH:MM", "fin": "HH:MM"}, ...]}
+                próximas ventanas en las que la persona puede cobrar, o error (400)
+         GET /salud
+             -> estado del proceso y de las cachés de calendarios y decisiones
+         GET /metricas
+             -> métricas de todos los procesos de trabajo sumadas, en formato
+                de texto de Prometheus
+    """
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    server_version = 'Acreditate'
+
+    def _responder(self, estado, cuerpo, tipo='application/json'):
+        if not isinstance(cuerpo, bytes):
+            cuerpo = json.dumps(cuerpo, ensure_ascii=False).encode('utf-8')
+        self.send_response(estado)
+        self.send_header('Content-Type', tipo)
+        self.send_header('Content-Length', str(len(cuerpo)))
+        self.end_headers()
+        self.wfile.write(cuerpo)
+
+    def _leer_json(self):
+        """Lee el cuerpo JSON de la petición, o responde con error y devuelve None"""
+        try:
+            longitud = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            longitud = -1
+        if longitud < 0:
+            # Sin una longitud válida no se sabe dónde termina el cuerpo
+            self.close_connection = True
+            self._responder(400, {'error': 'Content-Length inválido'})
+            return None
+        if longitud > MAX_CUERPO:
+            self.close_connection = True
+            self._responder(413, {'error': 'El cuerpo de la petición es demasiado grande'})
+            return None
+        try:
+            datos = json.loads(self.rfile.read(longitud) or b'null')
+        except ValueError as error:
+            self._responder(400, {'error': 'JSON inválido: {}'.format(error)})
+            return None
+        if not isinstance(datos, dict):
+            self._responder(400, {'error': 'Se esperaba un objeto JSON'})
+            return None
+        return datos
+
+    def do_GET(self):
+        if self.path == '/salud':
+            self._responder(200, {'estado': 'ok', 'pid': os.getpid(),
+                                  'calendarios': calendarios.estadisticas(),
+                                  'decisiones': memo_decisiones.estadisticas()})
+        elif self.path == '/metricas':
+            directorio = self.server.directorio_metricas
+            datos = _metricas_agregadas(directorio) if directorio is not None else None
+            self._responder(200, metricas.prometheus(datos).encode('utf-8'), 'text/plain; version=0.0.4')
+        else:
+            self._responder(404, {'error': 'Ruta no encontrada'})
+
+    def do_POST(self):
+        # El cuerpo se lee siempre para que la conexión persistente quede lista para la siguiente petición
+        datos = self._leer_json()
+        if datos is None:
+            return
+        if self.path not in ('/evaluar', '/lote', '/turnos'):
+            self._responder(404, {'error': 'Ruta no encontrada'})
+            return
+        if self.path == '/turnos':
+            try:
+                self._responder(200, {'turnos': _turnos(datos)})
+            except ValueError as error:
+                self._responder(400, {'error': str(error)})
+            return
+        online = bool(datos.get('online', False))
+        if self.path == '/evaluar':
+            decision = _decidir(datos, online)
+            self._responder(400 if decision['error'] else 200, decision)
+        else:
+            filas = datos.get('filas')
+            if not isinstance(filas, list):
+                self._responder(400, {'error': 'Se esperaba la lista "filas"'})
+                return
+            self._responder(200, {'decisiones': [_decidir(fila, online) for fila in filas]})
+
+    def log_message(self, *args):
+        pass
+
+
+def _decidir(fila, online):
+    """Evalúa un objeto {"cedula", "fecha", "hora"} recibido por HTTP"""
+    if not isinstance(fila, dict) or not all(isinstance(fila.get(c), str) for c in ('cedula', 'fecha', 'hora')):
+        return {'cedula': None, 'fecha': None, 'hora': None, 'resultado': None, 'motivo': None,
+                'error': 'Cada fila debe tener cedula, fecha y hora como cadenas'}
+    return decidir(fila['cedula'], fila['fecha'], fila['hora'], online)
+
+
+def _turnos(datos):
+    """Próximas ventanas con turno de un objeto {"cedula", "fecha", "hora", "cantidad"} recibido por HTTP"""
+    cantidad = datos.get('cantidad', 1)
+    if not isinstance(cantidad, int) or not 1 <= cantidad <= MAX_TURNOS:
+        raise ValueError('"cantidad" debe ser un entero entre 1 y {}'.format(MAX_TURNOS))
+    registro = RegistroEntrada(datos.get('cedula'), datos.get('fecha'), datos.get('hora'))
+    fecha = datetime.date.fromordinal(registro.ordinal)
+    if abs(fecha.year - datetime.date.today().year) > MAX_ANIOS_TURNOS:
+        raise ValueError('La fecha debe estar a menos de {} años del año actual'.format(MAX_ANIOS_TURNOS))
+    desde = datetime.datetime(fecha.year, fecha.month, fecha.day, registro.minutos // 60, registro.minutos % 60)
+    return [{'fecha': v.inicio.strftime('%Y/%m/%d'), 'inicio': v.inicio.strftime('%H:%M'),
+             'fin': v.fin.strftime('%H:%M')} for v in proximos_turnos(registro.cedula, desde, cantidad)]
+
+
+def _guardar_metricas(directorio):
+    """Escribe de forma atómica las métricas de este proceso en directorio/<pid>.json"""
+    destino = os.path.join(directorio, '{}.json'.format(os.getpid()))
+    temporal = destino + '.tmp'
+    with open(temporal, 'w') as archivo:
+        json.dump(metricas.estadisticas(), archivo)
+    os.replace(temporal, destino)
+
+
+def _metricas_agregadas(directorio):
+    """
+    Suma las métricas de todos los procesos de trabajo. Con las métricas
+    activas cada proceso copia las suyas en el directorio cada
+    INTERVALO_METRICAS segundos, y el que atiende la petición lo hace en el
+    momento. Las copias de un proceso que terminó se
+    conservan, así que los contadores nunca disminuyen.
+    """
+    _guardar_metricas(directorio)
+    datos = []
+    for nombre in os.listdir(directorio):
+        if nombre.endswith('.json'):
+            try:
+                with open(os.path.join(directorio, nombre)) as archivo:
+                    datos.append(json.load(archivo))
+            except (OSError, ValueError):
+                pass
+    return combinar(datos)
+
+
+class _ServidorHTTP(ThreadingHTTPServer):
+    """Servidor HTTP con hilos que atiende sobre un socket ya abierto"""
+    daemon_threads = True
+
+    def __init__(self, sock, directorio_metricas=None):
+        ThreadingHTTPServer.__init__(self, sock.getsockname()[:2], ManejadorAcreditate, bind_and_activate=False)
+        self.socket.close()
+        self.socket = sock
+        self.directorio_metricas = directorio_metricas
+
+
+def calentar():
+    """Genera por adelantado los calendarios del año anterior, el actual y el siguiente"""
+    anio = datetime.date.today().year
+    calendarios.precargar(anio - 1, anio + 1, 'EC-P')
+
+
+class Servicio:
+    """
+    Servicio HTTP/JSON local de evaluación. El socket se abre una vez y se
+    comparte entre varios procesos creados con fork por adelantado; cada uno
+    atiende conexiones persistentes con hilos y mantiene sus calendarios de
+    feriados precargados. Con procesos=0 se atiende en el proceso actual.
+    Los procesos comparten a través del archivo de caché de la API el cupo de
+    peticiones online, y a través de un directorio temporal sus métricas, que
+    /metricas devuelve sumadas.
+    ...
+
+     ATRIBUTOS
+     -----------
+             host: str
+                 Dirección de escucha
+             puerto: int
+                 Puerto de escucha (0 para elegir uno libre)
+             procesos: int
+                 Número de procesos de trabajo
+
+    Métodos
+    -------
+     iniciar(self):
+         Abre el socket y arranca los procesos de trabajo sin bloquear
+     esperar(self):
+         Bloquea hasta que terminan los procesos de trabajo
+     detener(self):
+         Detiene los procesos de trabajo y cierra el socket
+    """
+
+    def __init__(self, host='127.0.0.1', puerto=8080, procesos=None):
+        """
+        Construye todos los atributos necesarios para el servicio
+
+         Parámetros
+         ----------
+             host: str, opcional
+                 Dirección de escucha
+             puerto: int, opcional
+                 Puerto de escucha (0 para elegir uno libre)
+             procesos: int, opcional
+                 Número de procesos de trabajo, por defecto uno por núcleo
+        """
+        if procesos is None:
+            procesos = os.cpu_count() or 1
+        if procesos > 0 and not hasattr(os, 'fork'):
+            raise ValueError('Esta plataforma no permite crear procesos con fork, use procesos=0')
+        self.host = host
+        self.puerto = puerto
+        self.procesos = procesos
+        self._socket = None
+        self._hijos = []
+        self._servidor = None
+        self._hilo = None
+        self._metricas = None
+
+    @property
+    def url(self):
+        """Dirección base del servicio"""
+        return 'http://{}:{}'.format(self.host, self.puerto)
+
+    def iniciar(self):
+        """Abre el socket y arranca los procesos de trabajo sin bloquear"""
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.puerto))
+        sock.listen(1024)
+        self.puerto = sock.getsockname()[1]
+        self._socket = sock
+        # Los calendarios se precargan antes del fork y los procesos los heredan
+        calentar()
+
+        if self.procesos == 0:
+            self._servidor = _ServidorHTTP(sock)
+            self._hilo = threading.Thread(target=self._servidor.serve_forever, args=(0.05,), daemon=True)
+            self._hilo.start()
+            return
+        # Los procesos compiten por aceptar conexiones; el socket no bloquea para
+        # que el proceso que pierde una conexión vuelva a esperar en select
+        sock.setblocking(False)
+        self._metricas = tempfile.mkdtemp(prefix='acreditate-metricas-')
+        for _ in range(self.procesos):
+            pid = os.fork()
+            if pid == 0:
+                self._trabajar(sock)
+            self._hijos.append(pid)
+
+    def _trabajar(self, sock):
+        """Cuerpo de cada proceso de trabajo; nunca retorna"""
+        codigo = 0
+        try:
+            signal.signal(signal.SIGTERM, lambda *_: os._exit(0))
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            # Las métricas heredadas del padre ya están en su propio proceso
+            metricas.reiniciar()
+            if metricas.activo:
+                threading.Thread(target=self._copiar_metricas, daemon=True).start()
+            _ServidorHTTP(sock, self._metricas).serve_forever()
+        except BaseException:
+            codigo = 1
+        finally:
+            os._exit(codigo)
+
+    def _copiar_metricas(self):
+        """Copia periódicamente las métricas del proceso de trabajo al directorio compartido"""
+        while True:
+            try:
+                _guardar_metricas(self._metricas)
+            except OSError:
+                pass
+            time.sleep(INTERVALO_METRICAS)
+
+    def esperar(self):
+        """Bloquea hasta que terminan los procesos de trabajo"""
+        if self._hilo is not None:
+            self._hilo.join()
+        while self._hijos:
+            try:
+                os.waitpid(self._hijos.pop(), 0)
+            except ChildProcessError:
+                pass
+
+    def detener(self):
+        """Detiene los procesos de trabajo y cierra el socket"""
+        if self._servidor is not None:
+            self._servidor.shutdown()
+            self._servidor = None
+            self._hilo = None
+        for pid in self._hijos:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        self.esperar()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        if self._metricas is not None:
+            shutil.rmtree(self._metricas, ignore_errors=True)
+            self._metricas = None
+
+
+def main(argv=None):
+    """
+    Punto de entrada de la línea de comandos:
+
+        python -m src.servicio [--host 127.0.0.1] [--puerto 8080] [--procesos N]
+                               [--instantanea RUTA] [--horario RUTA]
+
+    La instantánea y el horario se activan antes de crear los procesos de
+    trabajo, que los heredan.
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m src.servicio',
+                                     description='Servicio HTTP/JSON de evaluación de Acreditate')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8080)
+    parser.add_argument('--procesos', type=int, help='procesos de trabajo, por defecto uno por núcleo')
+    parser.add_argument('--metricas', action='store_true', help='activar la instrumentación de evaluar')
+    parser.add_argument('--instantanea', help='instantánea de feriados para la evaluación sin conexión')
+    parser.add_argument('--horario', help='archivo JSON con las ventanas y restricciones del horario')
+    args = parser.parse_args(argv)
+
+    if args.instantanea:
+        from .instantanea import activar_instantanea
+        activar_instantanea(args.instantanea)
+    if args.horario:
+        from .horario import activar_horario
+        activar_horario(args.horario)
+
+    if args.metricas:
+        metricas.activar()
+    servicio = Servicio(args.host, args.puerto, args.procesos)
+    servicio.iniciar()
+    print('Atendiendo en {} con {} procesos'.format(servicio.url, servicio.procesos), file=sys.stderr)
+    try:
+        servicio.esperar()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servicio.detener()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,188 @@
+import datetime
+import mmap
+import os
+import struct
+
+from .calendario import calendarios, cambiaron_feriados
+
+# Formato del archivo:
+#   cabecera: firma (4 bytes), versión (uint16), provincia (8 bytes),
+#             ordinal del primer día (uint32), número de días (uint32)
+#   registros: un byte por día, en orden
+#     bit 0: feriado
+# El día de la semana, las ventanas y los dígitos restringidos no se guardan:
+# salen siempre del horario en uso, que puede reemplazarse después de construir
+# la tabla (la versión 1 los guardaba).
+FIRMA = b'ACRD'
+VERSION = 2
+CABECERA = struct.Struct('<4sH8sII')
+REGISTRO = struct.Struct('<B')
+
+BIT_FERIADO = 1
+
+
+def construir_tabla(ruta, anio_inicio, anio_fin, prov='EC-P'):
+    """
+    Compila la tabla de estado por día para los años [anio_inicio, anio_fin] y la
+    guarda en un archivo binario que los procesos pueden mapear en memoria
+
+     Parámetros
+     ----------
+         ruta: str
+             Archivo de destino
+         anio_inicio, anio_fin: int
+             Primer y último año (incluidos) de la tabla
+         prov: str, opcional
+             Código de provincia según ISO3166-2
+    """
+    if anio_fin < anio_inicio:
+        raise ValueError('anio_fin debe ser mayor o igual que anio_inicio')
+
+    inicio = datetime.date(anio_inicio, 1, 1).toordinal()
+    fin = datetime.date(anio_fin, 12, 31).toordinal()
+    registros = bytearray(REGISTRO.size * (fin - inicio + 1))
+    calendarios.precargar(anio_inicio, anio_fin, prov)
+    for anio in range(anio_inicio, anio_fin + 1):
+        for fecha in calendarios.calendario(anio, prov):
+            if fecha.year == anio:
+                REGISTRO.pack_into(registros, REGISTRO.size * (fecha.toordinal() - inicio), BIT_FERIADO)
+
+    temporal = ruta + '.tmp'
+    with open(temporal, 'wb') as archivo:
+        archivo.write(CABECERA.pack(FIRMA, VERSION, prov.encode('ascii'), inicio, fin - inicio + 1))
+        archivo.write(registros)
+    # Se reemplaza de forma atómica para no afectar a los procesos que ya lo mapearon
+    os.replace(temporal, ruta)
+
+
+class TablaDias:
+    """
+    Tabla de feriados por día mapeada en memoria de solo lectura. Todos los
+    procesos que abren el mismo archivo comparten una única copia en la caché
+    de páginas del sistema operativo y cada consulta es O(1).
+    ...
+
+     ATRIBUTOS
+     -----------
+             prov: str
+                 Código de provincia de la tabla
+             inicio: datetime.date
+                 Primer día de la tabla
+             dias: int
+                 Número de días de la tabla
+
+    Métodos
+    -------
+     registro(self, fecha):
+         Devuelve el registro de un byte de la fecha
+     es_feriado(self, fecha):
+         Devuelve True si la fecha es feriado
+    """
+
+    def __init__(self, ruta):
+        """
+        Mapea en memoria el archivo de la tabla
+
+         Parámetros
+         ----------
+             ruta: str
+                 Archivo creado con construir_tabla
+
+         Errores
+         -------
+             ValueError
+                 Si el archivo no es una tabla de días válida
+        """
+        with open(ruta, 'rb') as archivo:
+            self._mmap = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self._mmap) < CABECERA.size:
+                raise ValueError('El archivo {} no es una tabla de días'.format(ruta))
+            firma, version, prov, inicio, dias = CABECERA.unpack_from(self._mmap)
+            if firma != FIRMA or version != VERSION:
+                raise ValueError('El archivo {} no es una tabla de días versión {}'.format(ruta, VERSION))
+            if len(self._mmap) != CABECERA.size + dias * REGISTRO.size:
+                raise ValueError('El archivo {} está incompleto'.format(ruta))
+            self.prov = prov.rstrip(b'\0').decode('ascii')
+            self.inicio = datetime.date.fromordinal(inicio)
+        except ValueError:
+            # El mapeo conserva su propio descriptor del archivo: se cierran ambos
+            self._mmap.close()
+            raise
+        self._inicio = inicio
+        self.dias = dias
+        self._registros = memoryview(self._mmap)[CABECERA.size:]
+
+    def registro_ordinal(self, ordinal):
+        """
+        Devuelve el registro de un día a partir de su ordinal (datetime.date.toordinal)
+
+         Errores
+         -------
+             KeyError
+                 Si el día no está dentro de la tabla
+        """
+        indice = ordinal - self._inicio
+        if not 0 <= indice < self.dias:
+            raise KeyError(datetime.date.fromordinal(ordinal))
+        return self._registros[indice]
+
+    def registro(self, fecha):
+        """Devuelve el registro de un byte de la fecha"""
+        return self.registro_ordinal(fecha.toordinal())
+
+    def es_feriado(self, fecha):
+        """Devuelve True si la fecha es feriado"""
+        return bool(self.registro(fecha) & BIT_FERIADO)
+
+    def es_feriado_ordinal(self, ordinal):
+        """Devuelve True si el día con el ordinal dado es feriado"""
+        return bool(self.registro_ordinal(ordinal) & BIT_FERIADO)
+
+    def __contains__(self, fecha):
+        return 0 <= fecha.toordinal() - self._inicio < self.dias
+
+    def cerrar(self):
+        """
+        Libera el mapeo en memoria. Solo debe llamarse cuando ningún otro hilo
+        usa la tabla; activar_tabla no la llama sobre la tabla reemplazada.
+        """
+        self._registros.release()
+        self._mmap.close()
+
+
+_activa = None
+
+
+def activar_tabla(ruta):
+    """
+    Mapea la tabla de días del archivo y la usa en las comprobaciones de
+    feriados sin conexión de PersonaAcreditada. Con ruta None se desactiva.
+
+     RETORNA
+     -------
+         La TablaDias activa o None
+    """
+    global _activa
+    # La tabla anterior no se cierra: otros hilos pueden estar leyéndola. El
+    # mapeo se libera cuando ya nadie la referencia.
+    _activa = TablaDias(ruta) if ruta is not None else None
+    cambiaron_feriados()
+    return _activa
+
+
+def tabla_activa():
+    """Devuelve la TablaDias activa o None"""
+    return _activa
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Compila la tabla de estado por día')
+    parser.add_argument('ruta', help='archivo de destino')
+    parser.add_argument('anio_inicio', type=int)
+    parser.add_argument('anio_fin', type=int)
+    parser.add_argument('--prov', default='EC-P', help='código de provincia ISO3166-2')
+    args = parser.parse_args()
+    construir_tabla(args.ruta, args.anio_inicio, args.anio_fin, args.prov)
@@ -0,0 +1,201 @@
+import bisect
+import datetime
+import threading
+from collections import OrderedDict, namedtuple
+
+from . import calendario as _calendario
+from . import horario as _horario
+from .Acreditate import _es_feriado_sin_conexion, _parsear_cedula
+
+# Años siguientes al de la consulta en los que se buscan turnos
+HORIZONTE_ANIOS = 2
+
+# Años que el índice conserva; se descartan los menos usados
+MAX_ANIOS = 8
+
+Ventana = namedtuple('Ventana', ['inicio', 'fin'])
+Ventana.__doc__ = """
+Ventana en la que una persona puede cobrar: evaluar() devuelve True en todos sus minutos
+
+ ATRIBUTOS
+ -----------
+         inicio: datetime.datetime
+             Primer minuto de la ventana
+         fin: datetime.datetime
+             Último minuto de la ventana (incluido)
+"""
+
+
+class IndiceTurnos:
+    """
+    Índice precalculado, para cada dígito final de cédula, de las ventanas de
+    cada día en las que la persona puede cobrar, es decir, los minutos en los
+    que evaluar() devuelve True: todo el día si es feriado o el dígito no
+    está restringido y, si lo está, los minutos fuera de las ventanas
+    laborables. Se construye por años a medida que se consultan, a partir del
+    horario en uso (días de la semana, restricciones y excepciones) y de los
+    feriados sin conexión (tabla de días, instantánea o HolidayEcuador), y
+    conserva a lo sumo MAX_ANIOS años. Cada consulta es una búsqueda binaria
+    en el año de la fecha pedida.
+    ...
+
+     ATRIBUTOS
+     -----------
+             anios: list de int
+                 Años ya indexados
+
+    Métodos
+    -------
+     siguiente(self, cedula, desde):
+         Devuelve la primera ventana con turno a partir de una fecha y hora
+     proximas(self, cedula, desde, cantidad):
+         Devuelve las próximas ventanas con turno
+     limpiar(self):
+         Descarta el índice
+    """
+
+    def __init__(self, max_anios=MAX_ANIOS):
+        """
+        Construye un índice vacío; los años se indexan al consultarlos
+
+         Parámetros
+         ----------
+             max_anios: int, opcional
+                 Número máximo de años indexados que se conservan
+        """
+        if max_anios < 1:
+            raise ValueError('max_anios debe ser mayor que cero')
+        self.max_anios = max_anios
+        self._lock = threading.Lock()
+        self.limpiar()
+
+    def limpiar(self):
+        """Descarta todos los años indexados"""
+        with self._lock:
+            self._version = (_horario.version(), _calendario.version_feriados())
+            self._por_anio = OrderedDict()
+
+    @property
+    def anios(self):
+        """Años ya indexados, en orden"""
+        with self._lock:
+            return sorted(self._por_anio)
+
+    def _indexar_anio(self, anio):
+        """Calcula, para cada dígito, los días del año con alguna ventana y sus ventanas"""
+        horario = _horario.horario_activo()
+        por_digito = [([], []) for _ in range(10)]
+        ventanas_plan = {}
+        for ordinal in range(datetime.date(anio, 1, 1).toordinal(), datetime.date(anio, 12, 31).toordinal() + 1):
+            # En un feriado evaluar() devuelve True todo el día para cualquier dígito
+            plan = None if _es_feriado_sin_conexion(ordinal) else horario.plan(ordinal, 'EC-P')
+            ventanas = ventanas_plan.get(plan)
+            if ventanas is None:
+                if plan is None:
+                    ventanas = [((0, _horario.MINUTOS_DIA - 1),)] * 10
+                else:
+                    ventanas = [tuple(plan.turnos(digito)) for digito in range(10)]
+                ventanas_plan[plan] = ventanas
+            for digito in range(10):
+                if ventanas[digito]:
+                    por_digito[digito][0].append(ordinal)
+                    por_digito[digito][1].append(ventanas[digito])
+        return por_digito
+
+    def _anio(self, anio):
+        """
+        Devuelve el índice de un año, indexándolo si hace falta; descarta el
+        índice si cambió el horario o los datos de feriados sin conexión. El
+        año se calcula sin tomar el bloqueo y solo se guarda si las versiones
+        no cambiaron mientras tanto.
+        """
+        version = (_horario.version(), _calendario.version_feriados())
+        if version != self._version:
+            self.limpiar()
+        with self._lock:
+            indexado = self._por_anio.get(anio)
+            if indexado is not None:
+                self._por_anio.move_to_end(anio)
+                return indexado
+        indexado = self._indexar_anio(anio)
+        with self._lock:
+            if self._version == version:
+                self._por_anio[anio] = indexado
+                while len(self._por_anio) > self.max_anios:
+                    self._por_anio.popitem(last=False)
+        return indexado
+
+    def proximas(self, cedula, desde, cantidad):
+        """
+        Devuelve las próximas ventanas en las que la persona puede cobrar
+
+         Parámetros
+         ----------
+             cedula: str
+                 Cédula de diez dígitos: por ejemplo, 2300166101
+             desde: datetime.datetime
+                 Fecha y hora desde la que se busca; si cae dentro de una
+                 ventana, la primera comienza en ese minuto
+             cantidad: int
+                 Número máximo de ventanas
+
+         RETORNA
+         -------
+             Lista de Ventana en orden, a lo sumo una por cada tramo de un día
+             (un día sin restricción es una ventana de 00:00 a 23:59); solo
+             se buscan turnos hasta el final del año de desde más
+             HORIZONTE_ANIOS, así que puede tener menos de cantidad elementos
+
+         Errores
+         -------
+             ValueError
+                 Si la cédula no es válida
+        """
+        digito = _parsear_cedula(cedula)
+        if cantidad < 1:
+            return []
+        ordinal = desde.toordinal()
+        minuto = desde.hour * 60 + desde.minute
+        resultado = []
+        for anio in range(desde.year, min(desde.year + HORIZONTE_ANIOS, datetime.MAXYEAR) + 1):
+            # Cada año es una lista independiente: limpiar() no invalida las que ya se tomaron
+            dias, ventanas = self._anio(anio)[digito]
+            i = bisect.bisect_left(dias, ordinal)
+            while i < len(dias):
+                fecha = datetime.date.fromordinal(dias[i])
+                for inicio, fin in ventanas[i]:
+                    if dias[i] == ordinal:
+                        if fin < minuto:
+                            continue
+                        inicio = max(inicio, minuto)
+                    resultado.append(Ventana(_momento(fecha, inicio), _momento(fecha, fin)))
+                    if len(resultado) == cantidad:
+                        return resultado
+                i += 1
+        return resultado
+
+    def siguiente(self, cedula, desde):
+        """
+        Devuelve la primera ventana en la que la persona puede cobrar a partir
+        de desde, o None si no hay turnos dentro del horizonte (ver proximas)
+        """
+        ventanas = self.proximas(cedula, desde, 1)
+        return ventanas[0] if ventanas else None
+
+
+def _momento(fecha, minuto):
+    return datetime.datetime(fecha.year, fecha.month, fecha.day, minuto // 60, minuto % 60)
+
+
+# Índice compartido por todo el proceso
+indice_turnos = IndiceTurnos()
+
+
+def siguiente_turno(cedula, desde):
+    """Primera ventana con turno a partir de desde, con el índice compartido (ver IndiceTurnos.siguiente)"""
+    return indice_turnos.siguiente(cedula, desde)
+
+
+def proximos_turnos(cedula, desde, cantidad):
+    """Próximas ventanas con turno, con el índice compartido (ver IndiceTurnos.proximas)"""
+    return indice_turnos.proximas(cedula, desde, cantidad)
@@ -1,6 +1,43 @@
 import unittest
 from datetime import datetime
-from src.Acreditate import PersonaAcreditada
+import datetime as dt
+import json
+import os
+import tempfile
+import threading
+import time
+import asyncio
+import io
+import subprocess
+import sys
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import requests
+import bench
+from src.Acreditate import HolidayEcuador, PersonaAcreditada, RegistroEntrada, evaluar_lote, evaluar_lote_async
+from src.Acreditate import Evaluador, evaluador
+from src.Acreditate import (CEDULA_FORMATO, CEDULA_PROVINCIA, CEDULA_VALIDA, CEDULA_VERIFICADOR, MOTIVOS_CEDULA,
+                            validar_cedulas)
+from src.calendario import CacheCalendarios
+from src.api_feriados import CacheRespuestas, ClienteFeriados, LimitadorTokens
+from src.asincrono import ConsultorAsincrono
+from src.calendario import calendarios
+from src.flujo import main, procesar
+from src.reglas_feriados import reglas_ecuador
+from src.metricas import metricas
+from src.servicio import INTERVALO_METRICAS, Servicio
+from src.paralelo import dividir, procesar_archivo
+from src.horario import Horario, activar_horario, horario_activo
+from src.decisiones import MemoDecisiones, clave, memo_decisiones, versiones_vigentes
+from src.capacidad import MatrizCapacidad, matriz_capacidad
+from src.conciliacion import TrabajoConciliacion, conciliar
+from src.turnos import IndiceTurnos, Ventana, proximos_turnos, siguiente_turno
+from src.instantanea import Instantanea, activar_instantanea, exportar_cache, exportar_reglas
+from src.tabla_dias import CABECERA, TablaDias, activar_tabla, construir_tabla
+
+# Cédulas válidas terminadas en 0, 1, ..., 9
+CEDULAS = ['1714800560', '1714404611', '1712583242', '1713375143', '1712662434',
+           '1712345675', '1712741626', '1712504057', '1712424868', '1713612719']
 
 
 class TestAcreditate(unittest.TestCase):
@@ -96,5 +133,1560 @@ class TestAcreditate(unittest.TestCase):
         self.assertTrue(result)
         print("Hora no laborable")
 
+
+class ServidorFeriadosPrueba:
+    '''
+    Servidor HTTP local que imita la API de feriados de abstractapi.
+    Responde con los feriados del diccionario recibido, para un día o para un
+    año completo, y cuenta las peticiones.
+    '''
+
+    def __init__(self, feriados, demora=0.0):
+        servidor = self
+        self.feriados = feriados
+        self.demora = demora
+        self.peticiones = 0
+
+        class Manejador(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                servidor.peticiones += 1
+                time.sleep(servidor.demora)
+                q = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+                if not q.get('api_key'):
+                    estado, cuerpo = 401, b'{}'
+                elif 'day' in q:
+                    fecha = dt.date(int(q['year']), int(q['month']), int(q['day']))
+                    nombres = servidor.feriados.get(fecha, [])
+                    estado, cuerpo = 200, json.dumps([{'name': n} for n in nombres]).encode()
+                else:
+                    # Consulta de un año completo: cada feriado trae su fecha
+                    estado, cuerpo = 200, json.dumps([
+                        {'name': n, 'date': f.strftime('%m/%d/%Y'), 'date_year': str(f.year),
+                         'date_month': '{:02d}'.format(f.month), 'date_day': '{:02d}'.format(f.day)}
+                        for f, nombres in sorted(servidor.feriados.items()) if f.year == int(q['year'])
+                        for n in nombres]).encode()
+                self.send_response(estado)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(cuerpo)))
+                self.end_headers()
+                self.wfile.write(cuerpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Manejador)
+        self.url = 'http://127.0.0.1:{}/v1/'.format(self.httpd.server_address[1])
+        threading.Thread(target=self.httpd.serve_forever, args=(0.05,), daemon=True).start()
+
+    def cerrar(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def limitador_libre():
+    """Limitador sin esperas para las pruebas"""
+    return LimitadorTokens(tasa=1e9, capacidad=1000, max_mensual=None)
+
+
+class TestRegistroEntrada(unittest.TestCase):
+    '''
+    Pruebas del registro compacto de entradas validadas.
+
+     METODOS
+     --------
+         test_valores_analizados(self):
+             Prueba que los valores se convierten una sola vez a enteros
+         test_propiedades(self):
+             Prueba que las propiedades de PersonaAcreditada actualizan el registro
+    '''
+
+    def test_valores_analizados(self):
+        """
+        Prueba que los valores se convierten una sola vez a enteros
+        """
+        registro = RegistroEntrada('2300166101', '2021/04/27', '14:05')
+        self.assertEqual(registro.digito, 1)
+        self.assertEqual(registro.ordinal, dt.date(2021, 4, 27).toordinal())
+        self.assertEqual(registro.minutos, 14 * 60 + 5)
+        self.assertEqual(registro.dia_semana, 1)
+        self.assertFalse(hasattr(registro, '__dict__'))
+        for fecha in ('2021/02/29', '2021-04-27', '2021/4/27'):
+            with self.assertRaises(ValueError):
+                RegistroEntrada('2300166101', fecha, '14:05')
+        with self.assertRaises(ValueError):
+            RegistroEntrada('2300166101', '2021/04/27', '14:')
+
+    def test_propiedades(self):
+        """
+        Prueba que las propiedades de PersonaAcreditada actualizan el registro
+        """
+        persona = PersonaAcreditada(CEDULAS[3], '2021/04/27', '14:00')
+        self.assertFalse(hasattr(persona, '__dict__'))
+        self.assertFalse(persona.evaluar())
+        persona.hora = '20:00'
+        self.assertEqual((persona.hora, persona.registro.minutos), ('20:00', 1200))
+        self.assertTrue(persona.evaluar())
+        registro = RegistroEntrada(CEDULAS[3], '2021/04/27', '14:00')
+        copia = PersonaAcreditada.desde_registro(registro)
+        self.assertEqual((copia.cedula, copia.fecha, copia.hora), (CEDULAS[3], '2021/04/27', '14:00'))
+        self.assertFalse(copia.evaluar())
+
+
+class TestEvaluarLote(unittest.TestCase):
+    '''
+    Pruebas de la evaluación vectorizada por lotes.
+
+     METODOS
+     --------
+         test_igual_a_evaluar(self):
+             Prueba que el lote da el mismo resultado que evaluar() fila por fila
+         test_filas_invalidas(self):
+             Prueba que una fila mal formada genera ValueError
+    '''
+
+    def test_igual_a_evaluar(self):
+        """
+        Prueba que el lote da el mismo resultado que evaluar() fila por fila
+        """
+        fechas = ['2020/12/25', '2021/04/25', '2021/04/26', '2021/04/27', '2021/04/28',
+                  '2021/04/29', '2021/04/30', '2021/05/24', '2022/02/28', '2020/12/07']
+        horas = ['07:29', '07:30', '11:59', '12:30', '13:00', '16:30', '16:31', '20:00']
+        filas = [(c, f, h) for c in CEDULAS for f in fechas for h in horas]
+        cedulas, fechas, horas = zip(*filas)
+        esperado = [PersonaAcreditada(*fila).evaluar() for fila in filas]
+        resultado = evaluar_lote(cedulas, fechas, horas)
+        self.assertEqual(resultado.tolist(), esperado)
+        self.assertFalse(resultado.all())
+
+    def test_filas_invalidas(self):
+        """
+        Prueba que una fila mal formada genera ValueError
+        """
+        with self.assertRaises(ValueError):
+            evaluar_lote(['2300166101', '230016610'], ['2021/04/27'] * 2, ['14:00'] * 2)
+        with self.assertRaises(ValueError):
+            evaluar_lote(['2300166101'], ['2021/02/30'], ['14:00'])
+        with self.assertRaises(ValueError):
+            evaluar_lote(['2300166101'], ['2021/04/27'], ['24:00'])
+        self.assertEqual(evaluar_lote([], [], []).tolist(), [])
+
+
+class TestValidarCedulas(unittest.TestCase):
+    '''
+    Pruebas de la validación de provincia y dígito verificador de las cédulas.
+
+     METODOS
+     --------
+         test_motivos(self):
+             Prueba el motivo de rechazo de cédulas conocidas
+         test_igual_a_objeto(self):
+             Prueba que validar_cedulas() coincide con el atributo cedula de PersonaAcreditada
+         test_lote_rechaza_antes_de_evaluar(self):
+             Prueba que evaluar_lote() rechaza las cédulas inválidas indicando motivo y fila
+    '''
+
+    def test_motivos(self):
+        """
+        Prueba el motivo de rechazo de cédulas conocidas
+        """
+        cedulas = CEDULAS + ['2300166101', '3000000004', '1713375144', '2513375143', '0013375143',
+                             '171337514', 'A713375143', '17133751431']
+        esperado = [CEDULA_VALIDA] * 12 + [CEDULA_VERIFICADOR, CEDULA_PROVINCIA, CEDULA_PROVINCIA] + \
+                   [CEDULA_FORMATO] * 3
+        self.assertEqual(validar_cedulas(cedulas).tolist(), esperado)
+        self.assertEqual(MOTIVOS_CEDULA[CEDULA_VERIFICADOR], 'digito_verificador')
+        with self.assertRaisesRegex(ValueError, 'verificador'):
+            PersonaAcreditada('1713375144', '2021/04/27', '14:00')
+        with self.assertRaisesRegex(ValueError, 'provincia'):
+            PersonaAcreditada('2513375143', '2021/04/27', '14:00')
+
+    def test_igual_a_objeto(self):
+        """
+        Prueba que validar_cedulas() coincide con el atributo cedula de PersonaAcreditada
+        """
+        cedulas = ['%02d%08d' % (i % 32, (i * 7919) % 10 ** 8) for i in range(2000)] + CEDULAS
+        motivos = validar_cedulas(cedulas)
+        for cedula, motivo in zip(cedulas, motivos.tolist()):
+            try:
+                PersonaAcreditada(cedula, '2021/04/27', '14:00')
+                valida = True
+            except ValueError:
+                valida = False
+            self.assertEqual(valida, motivo == CEDULA_VALIDA, cedula)
+        self.assertGreater(int((motivos == CEDULA_VALIDA).sum()), len(CEDULAS))
+
+    def test_lote_rechaza_antes_de_evaluar(self):
+        """
+        Prueba que evaluar_lote() rechaza las cédulas inválidas indicando motivo y fila
+        """
+        consultas = calendarios.estadisticas()['aciertos'] + calendarios.estadisticas()['fallos']
+        with self.assertRaisesRegex(ValueError, r'verificador.*\(fila 1\)'):
+            evaluar_lote([CEDULAS[0], '1713375144'], ['2019/04/27'] * 2, ['14:00'] * 2)
+        self.assertEqual(calendarios.estadisticas()['aciertos'] + calendarios.estadisticas()['fallos'], consultas)
+
+
+class TestCacheCalendarios(unittest.TestCase):
+    '''
+    Pruebas de la caché de calendarios por (año, provincia).
+
+     METODOS
+     --------
+         test_aciertos_y_fallos(self):
+             Prueba que cada calendario se genera una sola vez
+         test_desalojo_lru(self):
+             Prueba que se descarta el calendario usado hace más tiempo
+    '''
+
+    def test_aciertos_y_fallos(self):
+        """
+        Prueba que cada calendario se genera una sola vez
+        """
+        cache = CacheCalendarios()
+        self.assertTrue(cache.es_feriado(dt.date(2020, 12, 25)))
+        self.assertFalse(cache.es_feriado(dt.date(2020, 12, 24)))
+        self.assertTrue(cache.es_feriado(dt.date(2020, 12, 7)))  # Fundación de Quito, trasladada al lunes
+        stats = cache.estadisticas()
+        self.assertEqual((stats['fallos'], stats['aciertos']), (1, 2))
+
+    def test_desalojo_lru(self):
+        """
+        Prueba que se descarta el calendario usado hace más tiempo
+        """
+        generados = []
+        cache = CacheCalendarios(max_calendarios=2, generador=lambda a, p: generados.append(a) or {})
+        for anio in (2020, 2021, 2020, 2022, 2020, 2021):
+            cache.calendario(anio)
+        self.assertEqual(generados, [2020, 2021, 2022, 2021])
+        self.assertEqual(cache.estadisticas()['desalojos'], 2)
+
+
+class TestClienteFeriados(unittest.TestCase):
+    '''
+    Pruebas del cliente de la API de feriados contra un servidor local.
+
+     METODOS
+     --------
+         test_cache_en_disco(self):
+             Prueba que las fechas repetidas no vuelven a llegar a la red
+         test_falta_api_key(self):
+             Prueba que la falta de clave genera HTTPError
+         test_consultar_anio(self):
+             Prueba que un año completo se obtiene con una sola petición y llena la caché por fecha
+         test_limitador(self):
+             Prueba que el limitador espera entre peticiones y respeta el cupo mensual
+         test_limitador_compartido(self):
+             Prueba que procesos distintos con la misma caché comparten los límites
+    '''
+
+    def setUp(self):
+        self.servidor = ServidorFeriadosPrueba({
+            dt.date(2021, 12, 25): ['Christmas Day'],
+            dt.date(2021, 4, 1): ['Maundy Thursday']})
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.directorio.name, 'feriados.sqlite3')
+
+    def tearDown(self):
+        self.servidor.cerrar()
+        self.directorio.cleanup()
+
+    def test_cache_en_disco(self):
+        """
+        Prueba que las fechas repetidas no vuelven a llegar a la red
+        """
+        cliente = ClienteFeriados('clave', self.servidor.url, CacheRespuestas(self.ruta), limitador_libre())
+        for _ in range(3):
+            self.assertTrue(cliente.es_feriado(dt.date(2021, 12, 25)))
+            self.assertFalse(cliente.es_feriado(dt.date(2021, 12, 24)))
+            self.assertFalse(cliente.es_feriado(dt.date(2021, 4, 1)))
+        self.assertEqual(self.servidor.peticiones, 3)
+        cliente.cerrar()
+        # Un cliente nuevo reutiliza las respuestas guardadas en disco
+        cliente = ClienteFeriados('clave', self.servidor.url, CacheRespuestas(self.ruta), limitador_libre())
+        self.assertTrue(cliente.es_feriado(dt.date(2021, 12, 25)))
+        self.assertEqual(self.servidor.peticiones, 3)
+        # Con ttl cero la respuesta se vuelve a consultar
+        cliente.cache.ttl = -1
+        self.assertTrue(cliente.es_feriado(dt.date(2021, 12, 25)))
+        self.assertEqual(self.servidor.peticiones, 4)
+
+    def test_falta_api_key(self):
+        """
+        Prueba que la falta de clave genera HTTPError
+        """
+        cliente = ClienteFeriados('', self.servidor.url, limitador=limitador_libre())
+        with self.assertRaises(requests.HTTPError):
+            cliente.es_feriado(dt.date(2021, 12, 25))
+
+    def test_consultar_anio(self):
+        """
+        Prueba que un año completo se obtiene con una sola petición y llena la caché por fecha
+        """
+        cliente = ClienteFeriados('clave', self.servidor.url, CacheRespuestas(self.ruta), limitador_libre())
+        feriados = cliente.consultar_anio(2021)
+        self.assertEqual(sorted(feriados), [dt.date(2021, 4, 1), dt.date(2021, 12, 25)])
+        self.assertEqual(feriados[dt.date(2021, 12, 25)][0]['name'], 'Christmas Day')
+        self.assertEqual(cliente.consultar_anio(2021), feriados)
+        self.assertTrue(cliente.es_feriado(dt.date(2021, 12, 25)))
+        self.assertFalse(cliente.es_feriado(dt.date(2021, 4, 1)))
+        self.assertFalse(cliente.es_feriado(dt.date(2021, 7, 14)))
+        self.assertEqual(self.servidor.peticiones, 1)
+        self.assertEqual(len(cliente.cache.respuestas()), 365)
+        cliente.cerrar()
+
+    def test_limitador(self):
+        """
+        Prueba que el limitador espera entre peticiones y respeta el cupo mensual
+        """
+        reloj = [0.0]
+        esperas = []
+
+        def dormir(segundos):
+            esperas.append(segundos)
+            reloj[0] += segundos
+
+        limitador = LimitadorTokens(tasa=1.0, capacidad=1, max_mensual=3,
+                                    reloj=lambda: reloj[0], dormir=dormir)
+        for _ in range(3):
+            limitador.adquirir()
+        self.assertEqual(esperas, [1.0, 1.0])
+        with self.assertRaises(RuntimeError):
+            limitador.adquirir()
+
+    def test_limitador_compartido(self):
+        """
+        Prueba que procesos distintos con la misma caché comparten los límites
+        """
+        # Otro proceso consume dos peticiones del cupo mensual
+        codigo = ('from src.api_feriados import CacheRespuestas, LimitadorTokens\n'
+                  'limitador = LimitadorTokens(tasa=1e9, capacidad=10, max_mensual=3, cache=CacheRespuestas(%r))\n'
+                  'limitador.adquirir()\nlimitador.adquirir()\n' % self.ruta)
+        subprocess.run([sys.executable, '-c', codigo], check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
+        cache = CacheRespuestas(self.ruta)
+        limitador = LimitadorTokens(tasa=1e9, capacidad=10, max_mensual=3, cache=cache)
+        limitador.adquirir()
+        with self.assertRaises(RuntimeError):
+            limitador.adquirir()
+        # Al cambiar de mes el contador se reinicia
+        limitador._hoy = lambda: dt.date.today() + dt.timedelta(days=40)
+        limitador.adquirir()
+
+        # Dos limitadores sobre la misma base comparten también la cubeta de tokens
+        reloj = [1000.0]
+        esperas = []
+
+        def dormir(segundos):
+            esperas.append(segundos)
+            reloj[0] += segundos
+
+        otra = os.path.join(self.directorio.name, 'otra.sqlite3')
+        uno, dos = (LimitadorTokens(tasa=2.0, capacidad=1, max_mensual=None, cache=CacheRespuestas(otra),
+                                    reloj=lambda: reloj[0], dormir=dormir) for _ in range(2))
+        uno.adquirir()
+        dos.adquirir()
+        uno.adquirir()
+        self.assertEqual(esperas, [0.5, 0.5])
+
+
+class TestEvaluarAsync(unittest.TestCase):
+    '''
+    Pruebas de la evaluación asíncrona con fusión de consultas.
+
+     METODOS
+     --------
+         test_fusion_de_consultas(self):
+             Prueba que las fechas repetidas comparten una sola llamada a la API
+         test_concurrencia(self):
+             Prueba que las consultas de fechas distintas se ejecutan en paralelo
+    '''
+
+    def setUp(self):
+        self.servidor = ServidorFeriadosPrueba({dt.date(2021, 4, 26): ['Feriado de prueba']}, demora=0.1)
+        self.cliente = ClienteFeriados('clave', self.servidor.url, limitador=limitador_libre(), conexiones=8)
+
+    def tearDown(self):
+        self.cliente.cerrar()
+        self.servidor.cerrar()
+
+    def test_fusion_de_consultas(self):
+        """
+        Prueba que las fechas repetidas comparten una sola llamada a la API
+        """
+        consultor = ConsultorAsincrono(self.cliente)
+        filas = [(CEDULAS[1], '2021/04/26', '14:00'),  # lunes feriado
+                 (CEDULAS[3], '2021/04/27', '14:00'),  # martes, dígito restringido
+                 (CEDULAS[1], '2021/04/27', '14:00'),  # martes, dígito sin restricción
+                 (CEDULAS[3], '2021/04/27', '20:00')] * 10
+        resultado = asyncio.run(evaluar_lote_async(filas, consultor=consultor))
+        self.assertEqual(resultado, [True, False, True, True] * 10)
+        self.assertEqual(self.servidor.peticiones, 2)
+        self.assertEqual(consultor.fusionadas, 18)
+
+    def test_concurrencia(self):
+        """
+        Prueba que las consultas de fechas distintas se ejecutan en paralelo
+        """
+        consultor = ConsultorAsincrono(self.cliente, concurrencia=8)
+        filas = [(CEDULAS[1], '2021/05/{:02d}'.format(d), '14:00') for d in (3, 10, 17, 24, 31)]
+        inicio = time.perf_counter()
+        resultado = asyncio.run(evaluar_lote_async(filas, consultor=consultor))
+        self.assertLess(time.perf_counter() - inicio, 0.4)
+        self.assertEqual(resultado, [False] * 5)
+        self.assertEqual(self.servidor.peticiones, 5)
+
+
+class TestTablaDias(unittest.TestCase):
+    '''
+    Pruebas de la tabla de estado por día mapeada en memoria.
+
+     METODOS
+     --------
+         test_igual_a_calendario(self):
+             Prueba que la tabla coincide con HolidayEcuador
+         test_tabla_activa(self):
+             Prueba que evaluar() usa la tabla activa
+         test_reemplazo_sin_cerrar(self):
+             Prueba que la tabla reemplazada sigue siendo legible
+         test_archivo_invalido(self):
+             Prueba que un archivo que no es una tabla genera ValueError
+    '''
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.directorio.name, 'dias.bin')
+        construir_tabla(self.ruta, 2020, 2021)
+
+    def tearDown(self):
+        activar_tabla(None)
+        self.directorio.cleanup()
+
+    def test_igual_a_calendario(self):
+        """
+        Prueba que la tabla coincide con HolidayEcuador
+        """
+        tabla = TablaDias(self.ruta)
+        self.assertEqual((tabla.inicio, tabla.dias, tabla.prov), (dt.date(2020, 1, 1), 731, 'EC-P'))
+        fecha = tabla.inicio
+        while fecha in tabla:
+            self.assertEqual(tabla.es_feriado(fecha), calendarios.es_feriado(fecha))
+            fecha += dt.timedelta(days=1)
+        with self.assertRaises(KeyError):
+            tabla.registro(dt.date(2022, 1, 1))
+        tabla.cerrar()
+
+    def test_tabla_activa(self):
+        """
+        Prueba que evaluar() usa la tabla activa
+        """
+        with open(self.ruta, 'r+b') as archivo:
+            # Se marca como feriado el martes 2021/04/27
+            archivo.seek(CABECERA.size + (dt.date(2021, 4, 27) - dt.date(2020, 1, 1)).days)
+            archivo.write(b'\x01')
+        persona = PersonaAcreditada(CEDULAS[3], '2021/04/27', '14:00')
+        self.assertFalse(persona.evaluar())
+        activar_tabla(self.ruta)
+        self.assertTrue(persona.evaluar())
+
+    def test_reemplazo_sin_cerrar(self):
+        """
+        Prueba que la tabla reemplazada sigue siendo legible
+        """
+        anterior = activar_tabla(self.ruta)
+        activar_tabla(self.ruta)
+        activar_tabla(None)
+        self.assertTrue(anterior.es_feriado(dt.date(2021, 1, 1)))
+        self.assertFalse(anterior.es_feriado(dt.date(2021, 4, 27)))
+
+    def test_archivo_invalido(self):
+        """
+        Prueba que un archivo que no es una tabla genera ValueError
+        """
+        with open(self.ruta, 'wb') as archivo:
+            archivo.write(b'no es una tabla de dias')
+        with self.assertRaises(ValueError):
+            TablaDias(self.ruta)
+        # Los mapeos de los archivos rechazados no dejan descriptores abiertos
+        if os.path.isdir('/proc/self/fd'):
+            abiertos = len(os.listdir('/proc/self/fd'))
+            for _ in range(20):
+                with self.assertRaises(ValueError):
+                    TablaDias(self.ruta)
+            self.assertEqual(len(os.listdir('/proc/self/fd')), abiertos)
+
+
+class TestFlujo(unittest.TestCase):
+    '''
+    Pruebas del procesamiento en flujo de registros JSONL y CSV.
+
+     METODOS
+     --------
+         test_jsonl(self):
+             Prueba que cada registro produce una decisión con su motivo
+         test_csv(self):
+             Prueba la entrada CSV con cabecera y filas inválidas
+         test_main_archivos(self):
+             Prueba la línea de comandos con archivos de entrada y salida
+    '''
+
+    def test_jsonl(self):
+        """
+        Prueba que cada registro produce una decisión con su motivo
+        """
+        entrada = io.StringIO(
+            '{"cedula": "%s", "fecha": "2021/04/27", "hora": "14:00"}\n'
+            '{"cedula": "%s", "fecha": "2020/12/25", "hora": "14:00"}\n'
+            '\n'
+            'no es json\n'
+            '{"cedula": "230016101", "fecha": "2021/04/27", "hora": "14:00"}\n'
+            '{"cedula": "%s", "fecha": "2021/04/27", "hora": "20:00"}\n' % (CEDULAS[3], CEDULAS[3], CEDULAS[3]))
+        salida = io.StringIO()
+        self.assertEqual(procesar(entrada, salida, tamano_bloque=2), (5, 2))
+        decisiones = [json.loads(linea) for linea in salida.getvalue().splitlines()]
+        self.assertEqual([(d['resultado'], d['motivo']) for d in decisiones],
+                         [(False, 'digito_restringido'), (True, 'feriado'), (None, None),
+                          (None, None), (True, 'fuera_de_horario')])
+        self.assertEqual([d.get('linea') for d in decisiones], [None, None, 4, 5, None])
+        self.assertIn('cédula', decisiones[3]['error'])
+
+    def test_csv(self):
+        """
+        Prueba la entrada CSV con cabecera y filas inválidas
+        """
+        entrada = io.StringIO('cedula,fecha,hora\n%s,2021/04/27,14:00\n%s,2021/04/27\n' % (CEDULAS[1], CEDULAS[1]))
+        salida = io.StringIO()
+        self.assertEqual(procesar(entrada, salida, 'csv'), (2, 1))
+        lineas = salida.getvalue().splitlines()
+        self.assertEqual(lineas[0], 'cedula,fecha,hora,resultado,motivo,error,linea')
+        self.assertEqual(lineas[1], '%s,2021/04/27,14:00,True,digito_sin_restriccion,,' % CEDULAS[1])
+        self.assertTrue(lineas[2].startswith(',,,,,'))
+        self.assertTrue(lineas[2].endswith(',3'))
+
+    def test_main_archivos(self):
+        """
+        Prueba la línea de comandos con archivos de entrada y salida
+        """
+        with tempfile.TemporaryDirectory() as directorio:
+            entrada = os.path.join(directorio, 'entrada.csv')
+            salida = os.path.join(directorio, 'salida.csv')
+            with open(entrada, 'w') as archivo:
+                archivo.write('%s,2021/04/25,14:00\n' % CEDULAS[0])
+            self.assertEqual(main([entrada, '-o', salida]), 0)
+            with open(salida) as archivo:
+                self.assertEqual(archivo.read().splitlines()[1], '%s,2021/04/25,14:00,True,digito_sin_restriccion,,' % CEDULAS[0])
+            horario = os.path.join(directorio, 'horario.json')
+            with open(horario, 'w') as archivo:
+                json.dump({'digitos': {'LUNES': [], 'MARTES': [], 'MIERCOLES': [], 'JUEVES': [],
+                                       'VIERNES': [], 'SABADO': [], 'DOMINGO': [0]}}, archivo)
+            try:
+                self.assertEqual(main([entrada, '-o', salida, '--horario', horario]), 0)
+            finally:
+                activar_horario(None)
+            with open(salida) as archivo:
+                self.assertEqual(archivo.read().splitlines()[1], '%s,2021/04/25,14:00,False,digito_restringido,,' % CEDULAS[0])
+
+
+class TestReglasFeriados(unittest.TestCase):
+    '''
+    Pruebas de la tabla de reglas de feriados.
+
+     METODOS
+     --------
+         test_traslados_losep(self):
+             Prueba feriados trasladados conocidos
+         test_rango_igual_a_anio(self):
+             Prueba que la pasada vectorizada coincide con la generación por año
+         test_precargar(self):
+             Prueba que la caché se llena con un rango de años de una vez
+    '''
+
+    def test_traslados_losep(self):
+        """
+        Prueba feriados trasladados conocidos
+        """
+        feriados = HolidayEcuador(prov='EC-P', years=[2019, 2020, 2021])
+        self.assertIn('2021/04/30', feriados)  # 1 de mayo, sábado
+        self.assertNotIn('2021/05/01', feriados)
+        self.assertIn('2019/08/09', feriados)  # 10 de agosto, sábado
+        self.assertIn('2020/12/07', feriados)  # 6 de diciembre, domingo
+        self.assertIn('2020/04/10', feriados)  # Viernes Santo
+        self.assertIn('2020/02/24', feriados)  # Lunes de carnaval
+        self.assertNotIn('2020/12/07', HolidayEcuador(prov='EC-G', years=2020))
+
+    def test_rango_igual_a_anio(self):
+        """
+        Prueba que la pasada vectorizada coincide con la generación por año
+        """
+        for prov in ('EC-P', 'ON'):
+            calendarios_rango = reglas_ecuador.calendarios(1900, 2100, prov)
+            for anio in range(1900, 2101):
+                self.assertEqual(calendarios_rango[anio], reglas_ecuador.anio(anio, prov))
+                self.assertEqual(calendarios_rango[anio], dict(HolidayEcuador(prov=prov, years=anio)))
+
+    def test_precargar(self):
+        """
+        Prueba que la caché se llena con un rango de años de una vez
+        """
+        cache = CacheCalendarios()
+        cache.precargar(2000, 2029)
+        self.assertTrue(cache.es_feriado(dt.date(2020, 12, 7)))
+        stats = cache.estadisticas()
+        self.assertEqual((stats['calendarios'], stats['fallos'], stats['aciertos']), (30, 0, 1))
+
+
+class TestMetricas(unittest.TestCase):
+    '''
+    Pruebas de la instrumentación por etapa de evaluar().
+
+     METODOS
+     --------
+         test_desactivado(self):
+             Prueba que sin activar no se registra nada
+         test_etapas_y_motivos(self):
+             Prueba los contadores por etapa, los motivos y el formato de Prometheus
+    '''
+
+    def setUp(self):
+        metricas.reiniciar()
+
+    def tearDown(self):
+        metricas.desactivar()
+        metricas.reiniciar()
+
+    def test_desactivado(self):
+        """
+        Prueba que sin activar no se registra nada
+        """
+        PersonaAcreditada(CEDULAS[3], '2021/04/27', '14:00').evaluar()
+        stats = metricas.estadisticas()
+        self.assertEqual(stats['motivos'], {})
+        self.assertTrue(all(e['total'] == 0 for e in stats['etapas'].values()))
+
+    def test_etapas_y_motivos(self):
+        """
+        Prueba los contadores por etapa, los motivos y el formato de Prometheus
+        """
+        metricas.activar()
+        for fecha, hora in (('2021/04/27', '14:00'), ('2021/04/27', '20:00'), ('2020/12/25', '14:00')):
+            PersonaAcreditada(CEDULAS[3], fecha, hora).evaluar()
+        with self.assertRaises(ValueError):
+            PersonaAcreditada('123', '2021/04/27', '14:00')
+        stats = metricas.estadisticas()
+        self.assertEqual(stats['motivos'], {'digito_restringido': 1, 'fuera_de_horario': 1,
+                                            'feriado': 1, 'entrada_invalida': 1})
+        etapas = {etapa: e['total'] for etapa, e in stats['etapas'].items()}
+        self.assertEqual(etapas, {'analisis': 4, 'feriado_offline': 3, 'feriado_online': 0,
+                                  'horario': 2, 'dia_semana': 2, 'restriccion': 1})
+        texto = metricas.prometheus()
+        self.assertIn('acreditate_etapa_segundos_bucket{etapa="horario",le="+Inf"} 2', texto)
+        self.assertIn('acreditate_etapa_segundos_count{etapa="analisis"} 4', texto)
+        self.assertIn('acreditate_evaluaciones_total{motivo="feriado"} 1', texto)
+
+
+class TestServicio(unittest.TestCase):
+    '''
+    Pruebas del servicio HTTP/JSON.
+
+     METODOS
+     --------
+         test_en_proceso(self):
+             Prueba las rutas del servicio atendido en el proceso actual
+         test_content_length_invalido(self):
+             Prueba que un Content-Length no numérico o negativo recibe 400
+         test_procesos(self):
+             Prueba que varios procesos de trabajo atienden el mismo puerto
+         test_metricas_procesos(self):
+             Prueba que /metricas suma las métricas de todos los procesos
+    '''
+
+    def test_en_proceso(self):
+        """
+        Prueba las rutas del servicio atendido en el proceso actual
+        """
+        servicio = Servicio(puerto=0, procesos=0)
+        servicio.iniciar()
+        try:
+            with requests.Session() as sesion:
+                r = sesion.post(servicio.url + '/evaluar',
+                                json={'cedula': CEDULAS[3], 'fecha': '2021/04/27', 'hora': '14:00'})
+                self.assertEqual(r.status_code, 200)
+                self.assertEqual((r.json()['resultado'], r.json()['motivo']), (False, 'digito_restringido'))
+                r = sesion.post(servicio.url + '/evaluar', json={'cedula': '1', 'fecha': '2021/04/27', 'hora': '14:00'})
+                self.assertEqual(r.status_code, 400)
+                r = sesion.post(servicio.url + '/lote', json={'filas': [
+                    {'cedula': CEDULAS[3], 'fecha': '2020/12/25', 'hora': '14:00'}, {'cedula': 5}]})
+                decisiones = r.json()['decisiones']
+                self.assertEqual(decisiones[0]['motivo'], 'feriado')
+                self.assertIsNotNone(decisiones[1]['error'])
+                salud = sesion.get(servicio.url + '/salud').json()
+                self.assertEqual(salud['estado'], 'ok')
+                self.assertGreaterEqual(salud['calendarios']['calendarios'], 3)
+                self.assertIn('acreditate_etapa_segundos', sesion.get(servicio.url + '/metricas').text)
+                r = sesion.post(servicio.url + '/turnos',
+                                json={'cedula': CEDULAS[3], 'fecha': '2021/04/27', 'hora': '12:30', 'cantidad': 2})
+                self.assertEqual(r.json()['turnos'], [{'fecha': '2021/04/27', 'inicio': '12:30', 'fin': '12:59'},
+                                                      {'fecha': '2021/04/27', 'inicio': '16:31', 'fin': '23:59'}])
+                r = sesion.post(servicio.url + '/turnos', json={'cedula': '1', 'fecha': '2021/04/27', 'hora': '14:00'})
+                self.assertEqual(r.status_code, 400)
+                r = sesion.post(servicio.url + '/turnos', json={'cedula': CEDULAS[3], 'fecha': '9999/12/31',
+                                                                 'hora': '14:00'})
+                self.assertEqual(r.status_code, 400)
+                self.assertEqual(sesion.post(servicio.url + '/otra', data=b'{}').status_code, 404)
+                self.assertEqual(sesion.post(servicio.url + '/evaluar', data=b'{').status_code, 400)
+        finally:
+            servicio.detener()
+
+    def test_content_length_invalido(self):
+        """
+        Prueba que un Content-Length no numérico o negativo recibe 400
+        """
+        import socket
+        servicio = Servicio(puerto=0, procesos=0)
+        servicio.iniciar()
+        try:
+            for valor in ('abc', '-5'):
+                with socket.create_connection((servicio.host, servicio.puerto), timeout=5) as conexion:
+                    conexion.sendall('POST /evaluar HTTP/1.1\r\nHost: x\r\nContent-Length: {}\r\n\r\n'
+                                     .format(valor).encode('ascii'))
+                    self.assertTrue(conexion.recv(1024).startswith(b'HTTP/1.1 400'))
+        finally:
+            servicio.detener()
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requiere fork')
+    def test_procesos(self):
+        """
+        Prueba que varios procesos de trabajo atienden el mismo puerto
+        """
+        servicio = Servicio(puerto=0, procesos=2)
+        servicio.iniciar()
+        try:
+            pids = set()
+            for _ in range(20):
+                with requests.Session() as sesion:
+                    pids.add(sesion.get(servicio.url + '/salud', timeout=5).json()['pid'])
+                    r = sesion.post(servicio.url + '/evaluar', timeout=5,
+                                    json={'cedula': CEDULAS[1], 'fecha': '2021/04/27', 'hora': '14:00'})
+                    self.assertTrue(r.json()['resultado'])
+            self.assertNotIn(os.getpid(), pids)
+            self.assertTrue(pids <= set(servicio._hijos))
+            # Sin métricas activas los procesos no copian nada al directorio compartido
+            time.sleep(INTERVALO_METRICAS + 0.5)
+            self.assertEqual(os.listdir(servicio._metricas), [])
+        finally:
+            servicio.detener()
+
+    @unittest.skipUnless(hasattr(os, 'fork'), 'requiere fork')
+    def test_metricas_procesos(self):
+        """
+        Prueba que /metricas suma las métricas de todos los procesos
+        """
+        metricas.activar()
+        servicio = Servicio(puerto=0, procesos=2)
+        try:
+            servicio.iniciar()
+            metricas.desactivar()
+            pids = set()
+            for _ in range(20):
+                with requests.Session() as sesion:
+                    r = sesion.post(servicio.url + '/evaluar', timeout=5,
+                                    json={'cedula': CEDULAS[1], 'fecha': '2021/04/27', 'hora': '14:00'})
+                    self.assertTrue(r.json()['resultado'])
+                    pids.add(sesion.get(servicio.url + '/salud', timeout=5).json()['pid'])
+            time.sleep(2 * INTERVALO_METRICAS + 0.5)
+            linea = 'acreditate_evaluaciones_total{motivo="digito_sin_restriccion"} 20'
+            for _ in range(6):
+                with requests.Session() as sesion:
+                    self.assertIn(linea, sesion.get(servicio.url + '/metricas', timeout=5).text.splitlines())
+        finally:
+            metricas.desactivar()
+            metricas.reiniciar()
+            servicio.detener()
+
+
+class TestParalelo(unittest.TestCase):
+    '''
+    Pruebas de la evaluación por fragmentos en varios procesos.
+
+     METODOS
+     --------
+         test_dividir(self):
+             Prueba que los fragmentos cubren el archivo y terminan en salto de línea
+         test_igual_a_secuencial(self):
+             Prueba que la salida coincide con el procesamiento secuencial
+         test_horario_en_procesos(self):
+             Prueba que los procesos de trabajo activan el horario indicado por ruta
+    '''
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        filas = []
+        for i in range(300):
+            fecha = (dt.date(2021, 1, 1) + dt.timedelta(days=i)).strftime('%Y/%m/%d')
+            cedula = CEDULAS[i % 10] if i % 37 else '12345'
+            filas.append((cedula, fecha, ('14:00', '20:00', '08:15')[i % 3]))
+        self.jsonl = os.path.join(self.directorio.name, 'entrada.jsonl')
+        with open(self.jsonl, 'w') as archivo:
+            for cedula, fecha, hora in filas:
+                archivo.write(json.dumps({'cedula': cedula, 'fecha': fecha, 'hora': hora}) + '\n')
+            archivo.write('no es json')  # última línea sin salto
+        self.csv = os.path.join(self.directorio.name, 'entrada.csv')
+        with open(self.csv, 'w') as archivo:
+            archivo.write('cedula,fecha,hora\n' + ''.join('%s,%s,%s\n' % fila for fila in filas))
+
+    def tearDown(self):
+        self.directorio.cleanup()
+
+    def test_dividir(self):
+        """
+        Prueba que los fragmentos cubren el archivo y terminan en salto de línea
+        """
+        rangos = dividir(self.jsonl, 500)
+        self.assertGreater(len(rangos), 10)
+        self.assertEqual(rangos[0][0], 0)
+        self.assertEqual(rangos[-1][1], os.path.getsize(self.jsonl))
+        with open(self.jsonl, 'rb') as archivo:
+            datos = archivo.read()
+        for (_, fin), (inicio, _) in zip(rangos, rangos[1:]):
+            self.assertEqual(fin, inicio)
+            self.assertEqual(datos[fin - 1:fin], b'\n')
+
+    def test_igual_a_secuencial(self):
+        """
+        Prueba que la salida coincide con el procesamiento secuencial
+        """
+        for ruta, formato in ((self.jsonl, 'jsonl'), (self.csv, 'csv')):
+            esperado = io.StringIO()
+            with open(ruta, newline='') as entrada:
+                conteo = procesar(entrada, esperado, formato)
+            salida = io.StringIO()
+            self.assertEqual(procesar_archivo(ruta, salida, formato, procesos=2, tamano_fragmento=700), conteo)
+            self.assertEqual(salida.getvalue(), esperado.getvalue())
+
+    def test_horario_en_procesos(self):
+        """
+        Prueba que los procesos de trabajo activan el horario indicado por ruta
+        """
+        ruta = os.path.join(self.directorio.name, 'horario.json')
+        with open(ruta, 'w') as archivo:
+            json.dump({'ventanas': [['00:00', '23:59']], 'digitos': [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]}, archivo)
+        esperado = io.StringIO()
+        activar_horario(ruta)
+        try:
+            with open(self.jsonl, newline='') as entrada:
+                conteo = procesar(entrada, esperado, 'jsonl')
+        finally:
+            activar_horario(None)
+        salida = io.StringIO()
+        self.assertEqual(procesar_archivo(self.jsonl, salida, 'jsonl', procesos=2, tamano_fragmento=700,
+                                          horario=ruta), conteo)
+        self.assertEqual(salida.getvalue(), esperado.getvalue())
+
+
+class TestHorario(unittest.TestCase):
+    '''
+    Pruebas del motor de horarios configurable.
+
+     METODOS
+     --------
+         test_por_defecto(self):
+             Prueba que el horario por defecto reproduce las ventanas y restricciones originales
+         test_archivo_con_excepciones(self):
+             Prueba un horario cargado de archivo con excepciones por fecha y provincia
+         test_evaluar_usa_horario_activo(self):
+             Prueba que evaluar() y evaluar_lote() usan el horario activo
+    '''
+
+    def tearDown(self):
+        activar_horario(None)
+
+    def test_por_defecto(self):
+        """
+        Prueba que el horario por defecto reproduce las ventanas y restricciones originales
+        """
+        horario = horario_activo()
+        for dia_semana, nombre in enumerate(PersonaAcreditada.days):
+            plan = horario.semana[dia_semana]
+            self.assertEqual(plan.ventanas(), [(450, 719), (780, 990)])
+            self.assertEqual([d for d in range(10) if plan.restringido(d)],
+                             sorted(PersonaAcreditada.restrictions[nombre]))
+        plan = horario.plan(dt.date(2021, 4, 27).toordinal())
+        self.assertEqual([m for m in (449, 450, 719, 720, 779, 780, 990, 991) if plan.laborable(m)],
+                         [450, 719, 780, 990])
+
+    def test_archivo_con_excepciones(self):
+        """
+        Prueba un horario cargado de archivo con excepciones por fecha y provincia
+        """
+        datos = {'ventanas': [['08:00', '12:00']],
+                 'digitos': {'LUNES': [1], 'MARTES': [2], 'MIERCOLES': [3], 'JUEVES': [4],
+                             'VIERNES': [5], 'SABADO': [6, 7], 'DOMINGO': [8, 9, 0]},
+                 'excepciones': [{'desde': '2021/04/26', 'hasta': '2021/04/30', 'provincias': ['EC-P'],
+                                  'digitos': {'MARTES': [3, 4]}},
+                                 {'desde': '2021/04/27', 'hasta': '2021/04/27',
+                                  'ventanas': {'MARTES': [['14:00', '14:59']]}}]}
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'horario.json')
+            with open(ruta, 'w') as archivo:
+                json.dump(datos, archivo)
+            horario = Horario.desde_archivo(ruta)
+        martes = dt.date(2021, 4, 27).toordinal()
+        self.assertEqual(horario.plan(martes).ventanas(), [(840, 899)])
+        self.assertTrue(horario.plan(martes).restringido(3))
+        self.assertFalse(horario.plan(martes, 'EC-G').restringido(3))
+        self.assertEqual(horario.plan(martes, 'EC-G').ventanas(), [(840, 899)])
+        self.assertEqual(horario.plan(martes + 7).ventanas(), [(480, 720)])
+        self.assertTrue(horario.plan(martes + 7).restringido(2))
+        with self.assertRaises(ValueError):
+            Horario.desde_dict({'digitos': {'LUNES': [1]}})
+
+    def test_evaluar_usa_horario_activo(self):
+        """
+        Prueba que evaluar() y evaluar_lote() usan el horario activo
+        """
+        persona = PersonaAcreditada(CEDULAS[3], '2021/04/27', '17:00')
+        self.assertTrue(persona.evaluar())
+        activar_horario(Horario(ventanas=[('07:00', '18:00')],
+                                excepciones=[{'desde': '2021/04/28', 'hasta': '2021/04/28',
+                                              'digitos': {'MIERCOLES': [3]}}]))
+        self.assertFalse(persona.evaluar())
+        filas = [(c, f, h) for c in CEDULAS for f in ('2021/04/27', '2021/04/28', '2021/04/29')
+                 for h in ('06:59', '07:00', '17:00', '18:01')]
+        esperado = [PersonaAcreditada(*fila).evaluar() for fila in filas]
+        self.assertEqual(evaluar_lote(*zip(*filas)).tolist(), esperado)
+        self.assertFalse(PersonaAcreditada(CEDULAS[3], '2021/04/28', '17:00').evaluar())
+
+
+class TestInstantanea(unittest.TestCase):
+    '''
+    Pruebas de las instantáneas binarias de feriados.
+
+     METODOS
+     --------
+         test_exportar_reglas(self):
+             Prueba que una instantánea de HolidayEcuador se guarda y se carga sin cambios
+         test_exportar_cache(self):
+             Prueba una instantánea de las respuestas de la API en caché
+         test_datos_invalidos(self):
+             Prueba que una instantánea dañada o de otra versión genera ValueError
+         test_instantanea_activa(self):
+             Prueba que evaluar() y evaluar_lote() usan la instantánea activa
+         test_carga_sin_dependencias(self):
+             Prueba que cargar una instantánea no importa holidays, dateutil ni numpy
+    '''
+
+    def setUp(self):
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.directorio.name, 'feriados.bin')
+
+    def tearDown(self):
+        activar_instantanea(None)
+        self.directorio.cleanup()
+
+    def test_exportar_reglas(self):
+        """
+        Prueba que una instantánea de HolidayEcuador se guarda y se carga sin cambios
+        """
+        exportar_reglas(2020, 2022, revision=7).guardar(self.ruta)
+        instantanea = Instantanea.cargar(self.ruta)
+        self.assertEqual((instantanea.inicio, instantanea.fin, instantanea.prov, instantanea.origen,
+                          instantanea.revision), (dt.date(2020, 1, 1), dt.date(2022, 12, 31), 'EC-P', 'reglas', 7))
+        esperado = dict(HolidayEcuador(prov='EC-P', years=[2020, 2021, 2022]))
+        self.assertEqual(instantanea.feriados(), esperado)
+        fecha = instantanea.inicio
+        while fecha <= instantanea.fin:
+            self.assertEqual(instantanea.es_feriado(fecha), fecha in esperado)
+            fecha += dt.timedelta(days=1)
+        self.assertNotIn(dt.date(2023, 1, 1), instantanea)
+        with self.assertRaises(KeyError):
+            instantanea.es_feriado(dt.date(2023, 1, 1))
+        self.assertLess(os.path.getsize(self.ruta), 4096)
+
+    def test_exportar_cache(self):
+        """
+        Prueba una instantánea de las respuestas de la API en caché
+        """
+        cache = CacheRespuestas(':memory:')
+        cache.guardar(dt.date(2021, 4, 1), [{'name': 'Maundy Thursday'}])
+        cache.guardar(dt.date(2021, 4, 2), [{'name': 'Good Friday'}])
+        cache.guardar(dt.date(2021, 4, 5), [])
+        instantanea = Instantanea.desde_bytes(exportar_cache(cache).a_bytes())
+        cache.cerrar()
+        self.assertEqual(instantanea.origen, 'api')
+        self.assertEqual(instantanea.feriados(), {dt.date(2021, 4, 2): 'Good Friday'})
+        self.assertFalse(instantanea.es_feriado(dt.date(2021, 4, 1)))
+        self.assertTrue(instantanea.es_feriado(dt.date(2021, 4, 2)))
+        self.assertFalse(instantanea.es_feriado(dt.date(2021, 4, 5)))
+        self.assertNotIn(dt.date(2021, 4, 3), instantanea)
+        with self.assertRaises(KeyError):
+            instantanea.es_feriado(dt.date(2021, 4, 3))
+        with self.assertRaises(ValueError):
+            exportar_cache(CacheRespuestas(':memory:'))
+
+    def test_datos_invalidos(self):
+        """
+        Prueba que una instantánea dañada o de otra versión genera ValueError
+        """
+        datos = bytearray(exportar_reglas(2021, 2021).a_bytes())
+        dañados = bytearray(datos)
+        dañados[-1] ^= 0xff
+        otra_version = bytearray(datos)
+        otra_version[4] = 2
+        for invalidos in (b'', b'ACRD' + bytes(40), bytes(dañados), bytes(otra_version), bytes(datos[:-1])):
+            with self.assertRaises(ValueError):
+                Instantanea.desde_bytes(invalidos)
+
+    def test_instantanea_activa(self):
+        """
+        Prueba que evaluar() y evaluar_lote() usan la instantánea activa
+        """
+        martes = dt.date(2021, 4, 27)
+        activar_instantanea(Instantanea.desde_feriados({martes: 'Feriado local'}, dt.date(2021, 1, 1),
+                                                       dt.date(2021, 12, 31)))
+        self.assertTrue(PersonaAcreditada(CEDULAS[3], '2021/04/27', '14:00').evaluar())
+        # 2021/11/02 no es feriado en la instantánea; 2022 queda fuera y se usan las reglas
+        self.assertFalse(PersonaAcreditada(CEDULAS[3], '2021/11/02', '14:00').evaluar())
+        self.assertTrue(PersonaAcreditada(CEDULAS[9], '2022/04/15', '14:00').evaluar())
+        lote = evaluar_lote([CEDULAS[3], CEDULAS[4]], ['2021/04/27', '2021/04/28'], ['14:00', '14:00'])
+        self.assertEqual(lote.tolist(), [True, True])
+        activar_instantanea(None)
+        self.assertFalse(PersonaAcreditada(CEDULAS[3], '2021/04/27', '14:00').evaluar())
+
+    def test_carga_sin_dependencias(self):
+        """
+        Prueba que cargar una instantánea no importa holidays, dateutil ni numpy
+        """
+        exportar_reglas(2021, 2021).guardar(self.ruta)
+        codigo = ('import sys, datetime\n'
+                  'from src.instantanea import Instantanea\n'
+                  'i = Instantanea.cargar(sys.argv[1])\n'
+                  'assert i.es_feriado(datetime.date(2021, 12, 25))\n'
+                  'print(sorted(m for m in ("holidays", "dateutil", "numpy") if m in sys.modules))\n')
+        salida = subprocess.run([sys.executable, '-c', codigo, self.ruta], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+        self.assertEqual(salida.strip(), '[]')
+
+
+class TestTurnos(unittest.TestCase):
+    '''
+    Pruebas de la consulta de las próximas ventanas en que una persona puede cobrar.
+
+     METODOS
+     --------
+         test_siguiente(self):
+             Prueba la primera ventana a partir de distintos momentos
+         test_igual_a_evaluar(self):
+             Prueba que las ventanas coinciden con los minutos en que evaluar() devuelve True
+         test_horario_y_horizonte(self):
+             Prueba que el índice sigue al horario activo y se detiene sin turnos
+         test_anios_acotados(self):
+             Prueba que solo se indexan los años consultados y se conservan a lo sumo max_anios
+    '''
+
+    def tearDown(self):
+        activar_horario(None)
+        activar_instantanea(None)
+
+    def test_siguiente(self):
+        """
+        Prueba la primera ventana a partir de distintos momentos
+        """
+        cedula = CEDULAS[3]  # restringida los martes
+        martes = dt.datetime(2021, 4, 27)
+        self.assertEqual(siguiente_turno(cedula, martes.replace(hour=6)),
+                         Ventana(martes.replace(hour=6), martes.replace(hour=7, minute=29)))
+        self.assertEqual(siguiente_turno(cedula, martes.replace(hour=9)),
+                         Ventana(martes.replace(hour=12), martes.replace(hour=12, minute=59)))
+        self.assertEqual(siguiente_turno(cedula, martes.replace(hour=14, minute=10)),
+                         Ventana(martes.replace(hour=16, minute=31), martes.replace(hour=23, minute=59)))
+        # El lunes no está restringida: todo el día es una ventana
+        self.assertEqual(siguiente_turno(cedula, martes.replace(day=26, hour=10)),
+                         Ventana(martes.replace(day=26, hour=10), martes.replace(day=26, hour=23, minute=59)))
+        # El martes 2 de noviembre es feriado: puede cobrar todo el día
+        self.assertEqual(siguiente_turno(cedula, dt.datetime(2021, 11, 2, 9)),
+                         Ventana(dt.datetime(2021, 11, 2, 9), dt.datetime(2021, 11, 2, 23, 59)))
+        # Cruce de año
+        ventanas = proximos_turnos(cedula, dt.datetime(2021, 12, 31, 23, 30), 3)
+        self.assertEqual([(v.inicio, v.fin) for v in ventanas],
+                         [(dt.datetime(2021, 12, 31, 23, 30), dt.datetime(2021, 12, 31, 23, 59)),
+                          (dt.datetime(2022, 1, 1), dt.datetime(2022, 1, 1, 23, 59)),
+                          (dt.datetime(2022, 1, 2), dt.datetime(2022, 1, 2, 23, 59))])
+        with self.assertRaises(ValueError):
+            siguiente_turno('1713375144', martes)
+
+    def test_igual_a_evaluar(self):
+        """
+        Prueba que las ventanas coinciden con los minutos en que evaluar() devuelve True
+        """
+        indice = IndiceTurnos()
+        for cedula in (CEDULAS[0], CEDULAS[3], CEDULAS[6]):
+            desde = dt.datetime(2021, 3, 29, 5, 3)
+            minutos = set()
+            ventanas = indice.proximas(cedula, desde, 25)
+            for ventana in ventanas:
+                momento = ventana.inicio
+                while momento <= ventana.fin:
+                    self.assertTrue(PersonaAcreditada(cedula, momento.strftime('%Y/%m/%d'),
+                                                      momento.strftime('%H:%M')).evaluar(), momento)
+                    minutos.add(momento)
+                    momento += dt.timedelta(minutes=7)
+                minutos.add(ventana.fin)
+            momento = desde
+            while momento <= ventanas[-1].fin:
+                persona = PersonaAcreditada(cedula, momento.strftime('%Y/%m/%d'), momento.strftime('%H:%M'))
+                self.assertEqual(persona.evaluar(), any(v.inicio <= momento <= v.fin for v in ventanas), momento)
+                momento += dt.timedelta(minutes=11)
+
+    def test_horario_y_horizonte(self):
+        """
+        Prueba que el índice sigue al horario activo y se detiene sin turnos
+        """
+        indice = IndiceTurnos()
+        desde = dt.datetime(2021, 4, 27, 8)
+        self.assertEqual(indice.siguiente(CEDULAS[3], desde).inicio, dt.datetime(2021, 4, 27, 12))
+        activar_horario(Horario(digitos={dia: [] for dia in PersonaAcreditada.days}))
+        self.assertEqual(indice.siguiente(CEDULAS[3], desde),
+                         Ventana(desde, dt.datetime(2021, 4, 27, 23, 59)))
+        # Restringida todo el día, todos los días: solo los feriados son ventanas
+        activar_horario(Horario(ventanas=[('00:00', '23:59')], digitos=[3]))
+        self.assertEqual(indice.siguiente(CEDULAS[3], desde),
+                         Ventana(dt.datetime(2021, 4, 30), dt.datetime(2021, 4, 30, 23, 59)))
+        # Y sin feriados en varios años la búsqueda se detiene en el horizonte
+        activar_instantanea(Instantanea.desde_feriados({}, dt.date(2021, 1, 1), dt.date(2030, 12, 31)))
+        self.assertIsNone(indice.siguiente(CEDULAS[3], desde))
+        self.assertEqual(indice.proximas(CEDULAS[3], desde, 5), [])
+        self.assertEqual(indice.anios, [2021, 2022, 2023])
+
+    def test_anios_acotados(self):
+        """
+        Prueba que solo se indexan los años consultados y se conservan a lo sumo max_anios
+        """
+        indice = IndiceTurnos(max_anios=3)
+        self.assertEqual(indice.siguiente(CEDULAS[3], dt.datetime(2021, 4, 27, 9)).inicio, dt.datetime(2021, 4, 27, 12))
+        self.assertEqual(indice.anios, [2021])
+        self.assertEqual(indice.siguiente(CEDULAS[3], dt.datetime(9999, 12, 31, 23, 59)),
+                         Ventana(dt.datetime(9999, 12, 31, 23, 59), dt.datetime(9999, 12, 31, 23, 59)))
+        self.assertEqual(indice.siguiente(CEDULAS[3], dt.datetime(1, 1, 1)).inicio, dt.datetime(1, 1, 1))
+        self.assertEqual(indice.anios, [1, 2021, 9999])
+        indice.siguiente(CEDULAS[3], dt.datetime(2500, 1, 1))
+        self.assertEqual(indice.anios, [1, 2500, 9999])
+        with self.assertRaises(ValueError):
+            IndiceTurnos(max_anios=0)
+
+
+class TestCapacidad(unittest.TestCase):
+    '''
+    Pruebas de la matriz de capacidad por día, franja y dígito.
+
+     METODOS
+     --------
+         test_igual_a_evaluar(self):
+             Prueba que cada celda cuenta los minutos en que evaluar() devuelve True
+         test_exportar(self):
+             Prueba la exportación a CSV y a un archivo de numpy
+    '''
+
+    def test_igual_a_evaluar(self):
+        """
+        Prueba que cada celda cuenta los minutos en que evaluar() devuelve True
+        """
+        matriz = matriz_capacidad(dt.date(2021, 10, 28), dt.date(2021, 11, 3), intervalo=90)
+        self.assertEqual(matriz.minutos.shape, (7, 16, 10))
+        self.assertEqual(matriz.fechas[0], dt.date(2021, 10, 28))
+        self.assertEqual(matriz.franjas.tolist()[:3], [0, 90, 180])
+        for d, fecha in enumerate(matriz.fechas.astype(dt.date).tolist()):
+            for f, inicio in enumerate(matriz.franjas.tolist()):
+                for digito in (0, 3, 7):
+                    permitidos = sum(
+                        PersonaAcreditada(CEDULAS[digito], fecha.strftime('%Y/%m/%d'),
+                                          '{:02d}:{:02d}'.format(m // 60, m % 60)).evaluar()
+                        for m in range(inicio, inicio + 90))
+                    self.assertEqual(int(matriz.minutos[d, f, digito]), permitidos, (fecha, inicio, digito))
+        # El martes 2 de noviembre es feriado: todos los dígitos pueden cobrar todo el día
+        self.assertTrue((matriz.minutos[5] == 90).all())
+        # Viernes 12:00-13:29: el 9 está restringido desde las 13:00, el 3 no
+        self.assertEqual(int(matriz.minutos[1, 8, 9]), 60)
+        self.assertEqual(int(matriz.minutos[1, 8, 3]), 90)
+        with self.assertRaises(ValueError):
+            matriz_capacidad(dt.date(2021, 1, 1), dt.date(2021, 1, 2), intervalo=7)
+        with self.assertRaises(ValueError):
+            matriz_capacidad(dt.date(2021, 1, 2), dt.date(2021, 1, 1))
+
+    def test_exportar(self):
+        """
+        Prueba la exportación a CSV y a un archivo de numpy
+        """
+        matriz = matriz_capacidad(dt.date(2021, 4, 26), dt.date(2021, 4, 27), intervalo=720)
+        salida = io.StringIO()
+        matriz.a_csv(salida)
+        lineas = salida.getvalue().splitlines()
+        self.assertEqual(lineas[0], 'fecha,inicio,fin,' + ','.join('digito_%d' % d for d in range(10)))
+        self.assertEqual(lineas[1:], ['2021/04/26,00:00,11:59,720,450,450,720,720,720,720,720,720,720',
+                                      '2021/04/26,12:00,23:59,720,509,509,720,720,720,720,720,720,720',
+                                      '2021/04/27,00:00,11:59,720,720,720,450,450,720,720,720,720,720',
+                                      '2021/04/27,12:00,23:59,720,720,720,509,509,720,720,720,720,720'])
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'capacidad.npz')
+            matriz.guardar(ruta)
+            copia = MatrizCapacidad.cargar(ruta)
+        self.assertEqual(copia.intervalo, 720)
+        self.assertEqual(copia.fechas.tolist(), matriz.fechas.tolist())
+        self.assertEqual(copia.minutos.tolist(), matriz.minutos.tolist())
+
+
+class TestMemoDecisiones(unittest.TestCase):
+    '''
+    Pruebas de la caché de decisiones de evaluar().
+
+     METODOS
+     --------
+         test_lru(self):
+             Prueba la clave empaquetada, el desalojo LRU y las estadísticas
+         test_evaluar_usa_memo(self):
+             Prueba que evaluar() reutiliza decisiones y se invalida al cambiar feriados u horario
+         test_no_guarda_desactualizadas(self):
+             Prueba que no se guarda una decisión calculada antes de un cambio de horario
+    '''
+
+    def tearDown(self):
+        activar_horario(None)
+        activar_instantanea(None)
+
+    def test_lru(self):
+        """
+        Prueba la clave empaquetada, el desalojo LRU y las estadísticas
+        """
+        self.assertEqual(clave(3, 1, True), 0b110011)
+        self.assertNotEqual(clave(3, 737907, True), clave(3, 737907, False))
+        memo = MemoDecisiones(max_decisiones=2)
+        memo.guardar(1, (True, 'feriado'))
+        memo.guardar(2, (False, 'digito_restringido'))
+        self.assertEqual(memo.obtener(1), (True, 'feriado'))
+        memo.guardar(3, (True, 'fuera_de_horario'))  # desaloja la clave 2
+        self.assertIsNone(memo.obtener(2))
+        self.assertEqual(memo.obtener(3), (True, 'fuera_de_horario'))
+        memo.invalidar()
+        self.assertIsNone(memo.obtener(1))
+        estadisticas = memo.estadisticas()
+        self.assertEqual((estadisticas['aciertos'], estadisticas['fallos'], estadisticas['desalojos'],
+                          estadisticas['invalidaciones']), (2, 2, 1, 1))
+        self.assertEqual(estadisticas['tasa_aciertos'], 0.5)
+        with self.assertRaises(ValueError):
+            MemoDecisiones(0)
+
+    def test_evaluar_usa_memo(self):
+        """
+        Prueba que evaluar() reutiliza decisiones y se invalida al cambiar feriados u horario
+        """
+        memo_decisiones.limpiar()
+        for hora in ('14:00', '14:05', '15:30'):
+            self.assertFalse(PersonaAcreditada(CEDULAS[3], '2021/04/27', hora).evaluar())
+        # Cédulas distintas con el mismo último dígito comparten la decisión
+        self.assertFalse(PersonaAcreditada('0900000043', '2021/04/27', '08:00').evaluar())
+        self.assertEqual(memo_decisiones.estadisticas()['aciertos'], 3)
+        self.assertEqual(memo_decisiones.estadisticas()['decisiones'], 1)
+
+        activar_instantanea(Instantanea.desde_feriados({dt.date(2021, 4, 27): 'Feriado local'},
+                                                       dt.date(2021, 1, 1), dt.date(2021, 12, 31)))
+        self.assertEqual(PersonaAcreditada(CEDULAS[3], '2021/04/27', '14:00').evaluar_con_motivo(),
+                         (True, 'feriado'))
+        activar_instantanea(None)
+        self.assertFalse(PersonaAcreditada(CEDULAS[3], '2021/04/27', '14:00').evaluar())
+        activar_horario(Horario(digitos={dia: [] for dia in PersonaAcreditada.days}))
+        self.assertEqual(PersonaAcreditada(CEDULAS[3], '2021/04/27', '14:00').evaluar_con_motivo(),
+                         (True, 'digito_sin_restriccion'))
+        self.assertGreaterEqual(memo_decisiones.estadisticas()['invalidaciones'], 3)
+
+    def test_no_guarda_desactualizadas(self):
+        """
+        Prueba que no se guarda una decisión calculada antes de un cambio de horario
+        """
+        memo = MemoDecisiones()
+        versiones = versiones_vigentes()
+        activar_horario(Horario(digitos={dia: [] for dia in PersonaAcreditada.days}))
+        memo.obtener(1)  # otro hilo ya vació la caché con el horario nuevo
+        memo.guardar(1, (False, 'digito_restringido'), versiones)
+        self.assertIsNone(memo.obtener(1))
+        memo.guardar(1, (True, 'digito_sin_restriccion'), versiones_vigentes())
+        self.assertEqual(memo.obtener(1), (True, 'digito_sin_restriccion'))
+
+
+class TestConciliacion(unittest.TestCase):
+    '''
+    Pruebas de la conciliación de feriados de la API con HolidayEcuador.
+
+     METODOS
+     --------
+         test_conciliar(self):
+             Prueba la comparación por año y el calendario fusionado
+         test_trabajo(self):
+             Prueba que el trabajo versiona, guarda y activa el calendario, y que evaluar() online no usa la red
+    '''
+
+    def setUp(self):
+        # La API reporta un feriado local que las reglas no tienen, omite el 2 de
+        # noviembre y marca el Jueves Santo, que se ignora
+        feriados = dict(HolidayEcuador(prov='EC-P', years=2021))
+        del feriados[dt.date(2021, 11, 2)]
+        self.feriados = {fecha: [nombre] for fecha, nombre in feriados.items()}
+        self.feriados[dt.date(2021, 3, 10)] = ['Feriado local']
+        self.feriados[dt.date(2021, 4, 1)] = ['Maundy Thursday']
+        self.servidor = ServidorFeriadosPrueba(self.feriados)
+        self.cliente = ClienteFeriados('clave', self.servidor.url, limitador=limitador_libre())
+        self.directorio = tempfile.TemporaryDirectory()
+        self.ruta = os.path.join(self.directorio.name, 'conciliado.bin')
+
+    def tearDown(self):
+        activar_instantanea(None)
+        self.cliente.cerrar()
+        self.servidor.cerrar()
+        self.directorio.cleanup()
+
+    def test_conciliar(self):
+        """
+        Prueba la comparación por año y el calendario fusionado
+        """
+        instantanea, (diferencias,) = conciliar([2021], self.cliente, revision=3)
+        self.assertEqual(diferencias.anio, 2021)
+        self.assertEqual(diferencias.solo_api, {dt.date(2021, 3, 10): 'Feriado local'})
+        self.assertEqual(list(diferencias.solo_reglas), [dt.date(2021, 11, 2)])
+        self.assertIn(dt.date(2021, 12, 25), diferencias.coinciden)
+        self.assertEqual((instantanea.origen, instantanea.revision, instantanea.inicio, instantanea.fin),
+                         ('conciliado', 3, dt.date(2021, 1, 1), dt.date(2021, 12, 31)))
+        self.assertTrue(instantanea.es_feriado(dt.date(2021, 3, 10)))
+        self.assertTrue(instantanea.es_feriado(dt.date(2021, 11, 2)))
+        self.assertFalse(instantanea.es_feriado(dt.date(2021, 4, 1)))
+        reglas = dict(HolidayEcuador(prov='EC-P', years=2021))
+        self.assertEqual(instantanea.feriados()[dt.date(2021, 12, 25)], reglas[dt.date(2021, 12, 25)])
+        self.assertEqual(self.servidor.peticiones, 1)
+        with self.assertRaises(ValueError):
+            conciliar([2021, 2023], self.cliente)
+
+    def test_trabajo(self):
+        """
+        Prueba que el trabajo versiona, guarda y activa el calendario, y que evaluar() online no usa la red
+        """
+        hoy = lambda: dt.date(2021, 6, 1)
+        trabajo = TrabajoConciliacion(self.cliente, self.ruta, anios_adelante=0, hoy=hoy)
+        activa = trabajo.ejecutar()
+        self.assertIsNone(trabajo.error)
+        self.assertEqual((activa.origen, activa.revision), ('conciliado', 0))
+        self.assertEqual(Instantanea.cargar(self.ruta), activa)
+        # Las evaluaciones online se resuelven con el calendario conciliado
+        self.assertEqual(PersonaAcreditada(CEDULAS[5], '2021/03/10', '10:00', online=True).evaluar_con_motivo(),
+                         (True, 'feriado'))
+        self.assertFalse(PersonaAcreditada(CEDULAS[7], '2021/03/11', '10:00', online=True).evaluar())
+        self.assertTrue(asyncio.run(
+            PersonaAcreditada(CEDULAS[5], '2021/03/10', '10:00', online=True).evaluar_async()))
+        self.assertEqual(self.servidor.peticiones, 1)
+        # Sin cambios la revisión se mantiene; con cambios aumenta
+        self.assertIs(trabajo.ejecutar(), activa)
+        self.servidor.feriados[dt.date(2021, 3, 11)] = ['Otro feriado']
+        trabajo.cliente = ClienteFeriados('clave', self.servidor.url, limitador=limitador_libre())
+        nueva = trabajo.ejecutar()
+        self.assertEqual(nueva.revision, 1)
+        self.assertTrue(PersonaAcreditada(CEDULAS[7], '2021/03/11', '10:00', online=True).evaluar())
+        trabajo.cliente.cerrar()
+        # Un fallo de la API conserva el calendario anterior
+        trabajo.cliente = ClienteFeriados('', self.servidor.url, limitador=limitador_libre())
+        self.assertIs(trabajo.ejecutar(), nueva)
+        self.assertIsInstance(trabajo.error, requests.HTTPError)
+        trabajo.cliente.cerrar()
+        # Un trabajo nuevo activa al arrancar el calendario guardado
+        activar_instantanea(None)
+        TrabajoConciliacion(self.cliente, self.ruta, hoy=hoy)
+        self.assertEqual(PersonaAcreditada(CEDULAS[7], '2021/03/11', '10:00', online=True).evaluar_con_motivo(),
+                         (True, 'feriado'))
+        # En segundo plano
+        activar_instantanea(None)
+        trabajo = TrabajoConciliacion(self.cliente, anios_adelante=0, hoy=hoy).iniciar()
+        for _ in range(200):
+            if trabajo.diferencias:
+                break
+            time.sleep(0.01)
+        trabajo.detener(1)
+        self.assertEqual(trabajo.diferencias[0].anio, 2021)
+
+
+class TestEvaluador(unittest.TestCase):
+    '''
+    Pruebas del motor de evaluación reutilizable.
+
+     METODOS
+     --------
+         test_equivalente(self):
+             Prueba que comprobar() da el mismo resultado y los mismos errores que PersonaAcreditada
+         test_hilos(self):
+             Prueba que una misma instancia evalúa correctamente desde varios hilos
+         test_cambios_concurrentes(self):
+             Prueba evaluaciones en varios hilos mientras se cambian la tabla de días y la instantánea
+    '''
+
+    def tearDown(self):
+        activar_horario(None)
+        activar_instantanea(None)
+        activar_tabla(None)
+
+    def test_equivalente(self):
+        """
+        Prueba que comprobar() da el mismo resultado y los mismos errores que PersonaAcreditada
+        """
+        motor = Evaluador(max_entradas=3)
+        fechas = ['2021/04/{:02d}'.format(dia) for dia in range(26, 31)] + ['2021/05/01', '2021/12/06']
+        horas = ['07:29', '07:30', '11:59', '12:30', '13:00', '16:30', '16:31']
+        for _ in range(2):
+            for cedula in CEDULAS:
+                for fecha in fechas:
+                    for hora in horas:
+                        esperado = PersonaAcreditada(cedula, fecha, hora).evaluar_con_motivo()
+                        self.assertEqual(motor.comprobar_con_motivo(cedula, fecha, hora), esperado)
+                        self.assertEqual(motor.comprobar(cedula, fecha, hora), esperado[0])
+        for cedula, fecha, hora in [('1713375144', '2021/04/27', '14:00'), ('2513375143', '2021/04/27', '14:00'),
+                                    (1713375143, '2021/04/27', '14:00'), (CEDULAS[3], '2021/02/30', '14:00'),
+                                    (CEDULAS[3], '2021/04/27', '24:00'), (CEDULAS[3], '2021-04-27', ['14:00'])]:
+            with self.assertRaises(ValueError) as esperado:
+                PersonaAcreditada(cedula, fecha, hora)
+            with self.assertRaises(ValueError) as obtenido:
+                motor.comprobar(cedula, fecha, hora)
+            self.assertEqual(str(obtenido.exception), str(esperado.exception))
+        # Sigue los cambios de horario y de feriados como evaluar()
+        self.assertFalse(evaluador.comprobar(CEDULAS[3], '2021/04/27', '14:00'))
+        activar_instantanea(Instantanea.desde_feriados({dt.date(2021, 4, 27): 'Feriado local'},
+                                                       dt.date(2021, 1, 1), dt.date(2021, 12, 31)))
+        self.assertEqual(evaluador.comprobar_con_motivo(CEDULAS[3], '2021/04/27', '14:00'), (True, 'feriado'))
+        activar_instantanea(None)
+        activar_horario(Horario(digitos={dia: [] for dia in PersonaAcreditada.days}))
+        self.assertEqual(evaluador.comprobar_con_motivo(CEDULAS[3], '2021/04/27', '14:00'),
+                         (True, 'digito_sin_restriccion'))
+        with self.assertRaises(ValueError):
+            Evaluador(max_entradas=0)
+
+    def test_hilos(self):
+        """
+        Prueba que una misma instancia evalúa correctamente desde varios hilos
+        """
+        motor = Evaluador(max_entradas=16)
+        filas = [(cedula, '2021/04/{:02d}'.format(dia), hora) for cedula in CEDULAS for dia in range(19, 31)
+                 for hora in ('07:45', '12:30', '14:00', '17:00')]
+        esperado = [PersonaAcreditada(*fila).evaluar() for fila in filas]
+        errores = []
+
+        def trabajo():
+            for _ in range(3):
+                if [motor.comprobar(*fila) for fila in filas] != esperado:
+                    errores.append('resultado distinto')
+
+        hilos = [threading.Thread(target=trabajo) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(errores, [])
+
+    def test_cambios_concurrentes(self):
+        """
+        Prueba evaluaciones en varios hilos mientras se cambian la tabla de días y la instantánea
+        """
+        # La tabla y la instantánea tienen los mismos feriados que las reglas, así
+        # que el resultado no depende de cuál esté activa en cada momento
+        instantanea = exportar_reglas(2021, 2021)
+        motor = Evaluador(max_entradas=8)
+        filas = [(cedula, fecha, hora) for cedula in CEDULAS
+                 for fecha in ('2021/04/26', '2021/04/27', '2021/04/30', '2021/05/01', '2021/12/06')
+                 for hora in ('07:45', '12:30', '14:00')]
+        esperado = [PersonaAcreditada(*fila).evaluar_con_motivo() for fila in filas]
+        errores = []
+        terminar = threading.Event()
+
+        def trabajo():
+            try:
+                while not terminar.is_set():
+                    if [motor.comprobar_con_motivo(*fila) for fila in filas] != esperado:
+                        errores.append('comprobar')
+                    if [PersonaAcreditada(*fila).evaluar_con_motivo() for fila in filas] != esperado:
+                        errores.append('evaluar')
+            except Exception as error:
+                errores.append(repr(error))
+
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'dias.bin')
+            construir_tabla(ruta, 2021, 2021)
+            hilos = [threading.Thread(target=trabajo) for _ in range(4)]
+            for hilo in hilos:
+                hilo.start()
+            try:
+                for i in range(200):
+                    activar_tabla(ruta if i % 2 else None)
+                    activar_instantanea(instantanea if i % 3 else None)
+            finally:
+                terminar.set()
+                for hilo in hilos:
+                    hilo.join()
+                activar_tabla(None)
+        self.assertEqual(errores, [])
+
+
+class TestBench(unittest.TestCase):
+    '''
+    Pruebas del banco de pruebas de rendimiento.
+
+     METODOS
+     --------
+         test_json_y_umbral(self):
+             Prueba que los resultados se guardan en JSON y se comparan con la base
+         test_arranque(self):
+             Prueba que importar src.Acreditate no carga los módulos diferidos y respeta el presupuesto
+         test_hilos(self):
+             Prueba que los casos en varios hilos reportan el tiempo por evaluación
+         test_memo(self):
+             Prueba que los casos evaluar* y comprobar* no responden desde la caché de decisiones y los *_memo sí
+    '''
+
+    def test_json_y_umbral(self):
+        """
+        Prueba que los resultados se guardan en JSON y se comparan con la base
+        """
+        with tempfile.TemporaryDirectory() as directorio:
+            ruta = os.path.join(directorio, 'base.json')
+            args = ['construccion', 'evaluar_feriado', '--escala', '0.01', '--repeticiones', '2']
+            self.assertEqual(bench.main(args + ['--json', ruta]), 0)
+            with open(ruta) as archivo:
+                base = json.load(archivo)
+            self.assertEqual(set(base['resultados']), {'construccion', 'evaluar_feriado'})
+        actual = {'construccion': {'min_ns': 130.0}, 'evaluar_feriado': {'min_ns': 100.0}}
+        base = {'construccion': {'min_ns': 100.0}, 'evaluar_feriado': {'min_ns': 100.0}}
+        self.assertEqual(bench.comparar(actual, base, 0.2), [('construccion', 1.3)])
+
+    def test_arranque(self):
+        """
+        Prueba que importar src.Acreditate no carga los módulos diferidos y respeta el presupuesto
+        """
+        resultados = bench.ejecutar(['arranque'], repeticiones=1)
+        self.assertEqual(resultados['arranque']['modulos'], [])
+        self.assertEqual(bench.presupuesto_arranque(resultados, float('inf')), [])
+        self.assertEqual(len(bench.presupuesto_arranque(resultados, 0)), 1)
+        lento = {'arranque': {'min_ns': 2e6, 'modulos': ['numpy']}}
+        self.assertEqual(len(bench.presupuesto_arranque(lento, 1)), 2)
+
+    def test_memo(self):
+        """
+        Prueba que los casos evaluar* y comprobar* no responden desde la caché de decisiones y los *_memo sí
+        """
+        memo_decisiones.limpiar()
+        bench.ejecutar(['evaluar_laborable', 'comprobar'], repeticiones=1, escala=0.005)
+        self.assertEqual(memo_decisiones.estadisticas()['aciertos'], 0)
+        bench.ejecutar(['evaluar_laborable_memo'], repeticiones=1, escala=0.005)
+        self.assertGreater(memo_decisiones.estadisticas()['aciertos'], 0)
+        memo_decisiones.limpiar()
+
+    def test_hilos(self):
+        """
+        Prueba que los casos en varios hilos reportan el tiempo por evaluación
+        """
+        resultados = bench.ejecutar(['comprobar', 'comprobar_hilos'], repeticiones=1, escala=0.05)
+        self.assertEqual(resultados['comprobar_hilos']['iteraciones'], bench.LOTE_HILOS)
+        self.assertLess(resultados['comprobar_hilos']['min_ns'], 1e6)
+
+
 if __name__ == '__main__':
     unittest.main()